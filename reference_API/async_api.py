@@ -0,0 +1,221 @@
+"""The To-Do API with async handlers over an AsyncStore.
+
+Same endpoints and responses as api_skeleton, whose sync handlers each
+occupy one of anyio's threadpool slots for the whole request. Here a
+request waiting on storage holds no thread, so thousands of slow
+connections can be in flight at once:
+
+    uvicorn reference_API.async_api:app
+"""
+from datetime import datetime
+from functools import partial
+from typing import List, Literal, Optional, Union
+
+from fastapi import Depends, FastAPI, HTTPException, Query, Request
+from fastapi.responses import StreamingResponse
+
+from .async_store import AsyncStore
+from .models import (
+    BatchItemResult, BatchUpdate, BulkItemResult, DeleteResult, ListCountOut, ListCreate, ListOut, Occurrence,
+    TaskCreate, TaskOut, TaskUpdate, UpdateResult,
+)
+from .occurrences import expand, window_tasks
+from .records import due_key
+from .responses import (
+    BULK_REQUEST_BODY, EVENT_STREAM_HEADERS, MAX_PAGE_SIZE, SEARCH_LIMIT, batch_response, batch_target,
+    bulk_results, cache_from_env, cached_response, change_event, configure_app, delta_response, feed_from_env,
+    lists_body, ndjson_lines, occurrence_lines, page_body, parse_bulk_body, require_admin, require_filters,
+    search_cache_key, task_list_body, task_response, tasks_cache_key, validate_bulk,
+)
+from .store import decode_cursor, open_store, parse_tags
+
+app = FastAPI()
+configure_app(app)
+
+cache = cache_from_env()
+feed = feed_from_env()
+
+def use_store(new_store):
+    """Swap the storage backend, e.g. to give an in-process test fresh state"""
+    global store
+    store = AsyncStore(new_store)
+    cache.clear()
+    store.add_listener(cache)
+    # Clients following the old store have to reload
+    feed.bulk_changed()
+    store.add_listener(feed)
+
+use_store(open_store())
+
+async def stream_lines(lines):
+    """Drain a sync line iterator that reads the store, a chunk at a time on the reader threads"""
+    async for batch in store.iterate(lines):
+        for line in batch:
+            yield line
+
+async def cached(key):
+    """The cache entry for `key`, once writes by other workers sharing the store have been evicted"""
+    await store.poll_changes()
+    return cache.get(key)
+
+# --- TASK ENDPOINTS ---
+
+@app.post("/tasks", response_model=TaskOut, status_code=201)
+async def create_task(task: TaskCreate):
+    return task_response(store, await store.create_task(task.model_dump()), status_code=201)
+
+@app.post("/tasks/bulk", response_model=List[BulkItemResult], openapi_extra=BULK_REQUEST_BODY)
+async def create_tasks_bulk(request: Request):
+    items = parse_bulk_body(await request.body(), request.headers.get("content-type", ""))
+    results, valid, positions = validate_bulk(items)
+    return bulk_results(results, positions, await store.create_tasks(valid))
+
+@app.patch("/tasks", response_model=Union[List[BatchItemResult], UpdateResult])
+async def update_tasks(batch: BatchUpdate,
+                       count_only: bool = Query(default=False, description='Return only {"updated": n}')):
+    """Apply one update to the tasks in `ids`, or to every task matching `filter`, in one transaction"""
+    results = await store.update_tasks(batch.update.model_dump(exclude_unset=True), **batch_target(batch, count_only))
+    return batch_response(store, batch.ids, results, count_only)
+
+@app.get("/tasks", response_model=List[TaskOut])
+async def list_tasks(
+    request: Request,
+    completed: Optional[bool] = None,
+    tags: Optional[str] = Query(default=None, description="Comma-separated tags"),
+    list_name: Optional[str] = Query(default=None, alias="list", description="Filter by list name"),
+    due_after: Optional[datetime] = Query(default=None, description="Only tasks due at or after this time"),
+    due_before: Optional[datetime] = Query(default=None, description="Only tasks due before this time"),
+    sort: Literal["created_at", "due_date"] = Query(
+        default="created_at", description="Order by creation time, or by due date with undated tasks last"),
+    limit: Optional[int] = Query(default=None, ge=1, le=MAX_PAGE_SIZE, description="Page size"),
+    cursor: Optional[str] = Query(default=None, description="X-Next-Cursor value of the previous page"),
+    stream: bool = Query(default=False, description="Stream matching tasks as NDJSON"),
+    since: Optional[int] = Query(default=None, ge=0, description=(
+        "Instead of tasks, return what changed after this version (0 for everything): "
+        "{version, more, tasks, deleted, lists, deleted_lists}")),
+):
+    if since is not None:
+        if stream or cursor or sort != "created_at" or any(
+                value is not None for value in (completed, tags, list_name, due_after, due_before)):
+            raise HTTPException(status_code=400, detail="since cannot be combined with filters, sort or cursor")
+        return delta_response(store, await store.changes_since(since, limit))
+
+    after = decode_cursor(cursor, sort) if cursor else None
+    filters = dict(completed=completed, tags=parse_tags(tags), list_name=list_name,
+                   due_after=due_after, due_before=due_before, sort=sort, after=after)
+    if stream:
+        lines = ndjson_lines(store, store.store.query(**filters, limit=limit))
+        return StreamingResponse(stream_lines(lines), media_type="application/x-ndjson")
+
+    key = tasks_cache_key(filters, limit)
+    entry = await cached(key)
+    if entry is None:
+        generation = cache.generation
+        # Fetch one extra task to learn whether another page follows
+        tasks = await store.query(**filters, limit=limit + 1 if limit else None)
+        body, headers = page_body(store, tasks, limit, sort)
+        entry = cache.put(key, body, generation, headers, list_name=list_name, tags=filters["tags"])
+    return cached_response(request, entry)
+
+@app.get("/tasks/search", response_model=List[TaskOut])
+async def search_tasks(
+    request: Request,
+    q: str = Query(min_length=1, description="Words to find in titles and descriptions; the last may be a prefix"),
+    completed: Optional[bool] = None,
+    tags: Optional[str] = Query(default=None, description="Comma-separated tags"),
+    list_name: Optional[str] = Query(default=None, alias="list", description="Filter by list name"),
+    limit: int = Query(default=SEARCH_LIMIT, ge=1, le=MAX_PAGE_SIZE, description="Number of results"),
+):
+    """Tasks containing every word of `q`, best matches first"""
+    tag_list = parse_tags(tags)
+    key = search_cache_key(q, completed, tag_list, list_name, limit)
+    entry = await cached(key)
+    if entry is None:
+        generation = cache.generation
+        tasks = await store.search(q, completed=completed, tags=tag_list, list_name=list_name, limit=limit)
+        entry = cache.put(key, task_list_body(store, tasks), generation, list_name=list_name, tags=tag_list)
+    return cached_response(request, entry)
+
+@app.get("/tasks/{task_id}", response_model=TaskOut)
+async def get_task(task_id: str):
+    return task_response(store, await store.get_task(task_id))
+
+@app.put("/tasks/{task_id}", response_model=TaskOut)
+async def update_task(task_id: str, update: TaskUpdate):
+    return task_response(store, await store.update_task(task_id, update.model_dump(exclude_unset=True)))
+
+@app.delete("/tasks/{task_id}", status_code=204)
+async def delete_task(task_id: str):
+    await store.delete_task(task_id)
+
+# --- OCCURRENCE ENDPOINTS ---
+
+@app.get("/occurrences", response_model=List[Occurrence])
+async def list_occurrences(
+    start: datetime = Query(description="Window start (inclusive)"),
+    end: datetime = Query(description="Window end (exclusive)"),
+    completed: Optional[bool] = None,
+    tags: Optional[str] = Query(default=None, description="Comma-separated tags"),
+    list_name: Optional[str] = Query(default=None, alias="list", description="Filter by list name"),
+):
+    """Every occurrence of the matching tasks in [start, end), streamed as NDJSON in time order"""
+    if due_key(end) <= due_key(start):
+        raise HTTPException(status_code=400, detail="end must be after start")
+    tasks = window_tasks(store.store.query, start, end,
+                         completed=completed, tags=parse_tags(tags), list_name=list_name)
+    lines = occurrence_lines(expand(tasks, start, end))
+    return StreamingResponse(stream_lines(lines), media_type="application/x-ndjson")
+
+# --- LIST ENDPOINTS ---
+
+@app.get("/lists", response_model=Union[List[ListOut], List[ListCountOut]])
+async def get_lists(request: Request,
+                    with_counts: bool = Query(default=False, description="Include each list's task count")):
+    key = ("lists", with_counts)
+    entry = await cached(key)
+    if entry is None:
+        generation = cache.generation
+        body = lists_body(await (store.list_counts() if with_counts else store.get_lists()))
+        entry = cache.put(key, body, generation, watch_lists=True, watch_counts=with_counts)
+    return cached_response(request, entry)
+
+@app.post("/lists", response_model=ListOut, status_code=201)
+async def create_list(list_data: ListCreate):
+    return {"name": await store.create_list(list_data.name)}
+
+@app.delete("/lists/{name}", status_code=204)
+async def delete_list(name: str):
+    await store.delete_list(name)
+
+# --- CHANGE FEED ---
+
+@app.get("/changes", response_class=StreamingResponse)
+async def changes(
+    request: Request,
+    tags: Optional[str] = Query(default=None, description="Comma-separated tags"),
+    list_name: Optional[str] = Query(default=None, alias="list", description="Filter by list name"),
+    after: Optional[str] = Query(default=None, description="Resume after this event id (default: Last-Event-ID)"),
+):
+    """Server-sent events for every task and list change matching the filters, in commit order"""
+    events = feed.stream(list_name, parse_tags(tags), after or request.headers.get("last-event-id"),
+                         partial(change_event, store, feed), store.poll_changes)
+    return StreamingResponse(events, media_type="text/event-stream", headers=EVENT_STREAM_HEADERS)
+
+# --- ADMIN ENDPOINTS ---
+
+@app.delete("/admin/tasks", response_model=DeleteResult, dependencies=[Depends(require_admin)])
+async def delete_tasks(
+    completed: Optional[bool] = None,
+    tags: Optional[str] = Query(default=None, description="Comma-separated tags"),
+    list_name: Optional[str] = Query(default=None, alias="list", description="Filter by list name"),
+    all_tasks: bool = Query(default=False, alias="all", description="Required to delete every task"),
+):
+    """Delete every task matching the GET /tasks filters (all tasks with all=true and no filters)"""
+    tag_list = parse_tags(tags)
+    require_filters(completed, tag_list, list_name, all_tasks)
+    return {"deleted": await store.delete_tasks(completed=completed, tags=tag_list, list_name=list_name)}
+
+@app.post("/admin/reset", status_code=204, dependencies=[Depends(require_admin)])
+async def reset():
+    """Delete all tasks and restore the default lists"""
+    await store.reset()
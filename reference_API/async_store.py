@@ -0,0 +1,129 @@
+"""Awaitable access to a store for the async app.
+
+With SQLite, every write goes to one dedicated writer thread, so writers
+queue in order instead of contending for the database lock, and reads run
+on a separate pool of reader threads, each with its own WAL connection.
+Neither pool is anyio's threadpool, so the number of requests in flight is
+not capped by its size: a request waiting on the database holds no thread,
+only a future.
+
+The in-memory store's operations are short CPU work, so they run inline on
+the event loop rather than paying for a thread handoff. Its writes are the
+exception once it has a Journal: they wait for an fsync, so they go to a
+pool of writer threads, where writes arriving during one fsync share the
+next (group commit) while reads carry on inline.
+"""
+import asyncio
+import itertools
+import os
+from concurrent.futures import ThreadPoolExecutor
+from functools import partial
+from typing import AsyncIterator, Callable, Iterator, List, Optional
+
+from .journal import Journal
+from .store import SCAN_CHUNK, StoreListener, TaskStore
+
+READER_THREADS = int(os.getenv("TODO_READER_THREADS", 8))
+
+
+class AsyncStore:
+    def __init__(self, store, readers: int = READER_THREADS):
+        self.store = store
+        if isinstance(store, TaskStore):
+            self._readers = None
+            self._writer = None
+            if isinstance(store.journal, Journal):
+                self._writer = ThreadPoolExecutor(readers, thread_name_prefix="todo-writer")
+        else:
+            self._readers = ThreadPoolExecutor(readers, thread_name_prefix="todo-reader")
+            self._writer = ThreadPoolExecutor(1, thread_name_prefix="todo-writer")
+
+    async def _run(self, executor: Optional[ThreadPoolExecutor], func: Callable, *args, **kwargs):
+        if executor is None:
+            return func(*args, **kwargs)
+        return await asyncio.get_running_loop().run_in_executor(executor, partial(func, *args, **kwargs))
+
+    def _read(self, func: Callable, *args, **kwargs):
+        return self._run(self._readers, func, *args, **kwargs)
+
+    def _write(self, func: Callable, *args, **kwargs):
+        return self._run(self._writer, func, *args, **kwargs)
+
+    def close(self):
+        for executor in (self._readers, self._writer):
+            if executor is not None:
+                executor.shutdown(wait=True)
+        if hasattr(self.store, "close"):
+            self.store.close()
+
+    # --- PASS-THROUGH ---
+
+    def add_listener(self, listener: StoreListener):
+        self.store.add_listener(listener)
+
+    def task_json(self, task: dict) -> bytes:
+        return self.store.task_json(task)
+
+    def poll_changes(self):
+        return self._read(self.store.poll_changes)
+
+    # --- TASKS ---
+
+    def create_task(self, data: dict):
+        return self._write(self.store.create_task, data)
+
+    def create_tasks(self, items: List[dict]):
+        return self._write(self.store.create_tasks, items)
+
+    def get_task(self, task_id: str):
+        return self._read(self.store.get_task, task_id)
+
+    def update_task(self, task_id: str, changes: dict):
+        return self._write(self.store.update_task, task_id, changes)
+
+    def update_tasks(self, changes: dict, **target):
+        return self._write(self.store.update_tasks, changes, **target)
+
+    def delete_task(self, task_id: str):
+        return self._write(self.store.delete_task, task_id)
+
+    def query(self, **filters):
+        """store.query() results as a list"""
+        return self._read(lambda: list(self.store.query(**filters)))
+
+    async def iterate(self, items: Iterator, chunk: int = SCAN_CHUNK) -> AsyncIterator[list]:
+        """Pull a lazy store iterator in chunks on the reader threads"""
+        def take() -> list:
+            return list(itertools.islice(items, chunk))
+
+        while True:
+            batch = await self._read(take)
+            if not batch:
+                return
+            yield batch
+
+    def changes_since(self, since: int, limit: Optional[int] = None):
+        return self._read(self.store.changes_since, since, limit)
+
+    def search(self, q: str, **filters):
+        return self._read(self.store.search, q, **filters)
+
+    def delete_tasks(self, **filters):
+        return self._write(self.store.delete_tasks, **filters)
+
+    def reset(self):
+        return self._write(self.store.reset)
+
+    # --- LISTS ---
+
+    def get_lists(self):
+        return self._read(self.store.get_lists)
+
+    def list_counts(self):
+        return self._read(self.store.list_counts)
+
+    def create_list(self, name: str):
+        return self._write(self.store.create_list, name)
+
+    def delete_list(self, name: str):
+        return self._write(self.store.delete_list, name)
@@ -0,0 +1,141 @@
+"""Response cache for the read endpoints, with ETags and precise invalidation.
+
+Entries hold the serialized response body keyed on the normalized query. A
+cache entry remembers which list and tags its query filtered on, so a task
+write only evicts entries whose result that task could appear in, before or
+after the change. The cache listens to the store, so every write path
+(including bulk ones) invalidates it.
+"""
+import hashlib
+import threading
+from collections import OrderedDict
+from typing import Dict, FrozenSet, Hashable, Iterable, Optional, Set
+
+from .store import StoreListener
+
+# Per-entry bookkeeping added to the body size when enforcing max_bytes
+ENTRY_OVERHEAD = 256
+
+
+class CacheEntry:
+    __slots__ = ("body", "etag", "headers", "list_name", "tags", "watch_lists", "watch_counts", "size")
+
+    def __init__(self, body: bytes, headers: Dict[str, str], list_name: Optional[str],
+                 tags: FrozenSet[str], watch_lists: bool, watch_counts: bool = False):
+        self.body = body
+        self.etag = '"' + hashlib.blake2b(body, digest_size=16).hexdigest() + '"'
+        self.headers = headers
+        self.list_name = list_name
+        self.tags = tags
+        self.watch_lists = watch_lists
+        self.watch_counts = watch_counts
+        self.size = len(body) + ENTRY_OVERHEAD
+
+
+def etag_matches(if_none_match: Optional[str], etag: str) -> bool:
+    """If-None-Match check (weak comparison, as RFC 9110 requires for it)"""
+    if not if_none_match:
+        return False
+    if if_none_match.strip() == "*":
+        return True
+    candidates = (tag.strip() for tag in if_none_match.split(","))
+    return any(tag.removeprefix("W/") == etag for tag in candidates)
+
+
+class ResponseCache(StoreListener):
+    """LRU cache of response bodies bounded by total size in bytes"""
+
+    def __init__(self, max_bytes: int):
+        self.max_bytes = max_bytes
+        # Bumped on every invalidation. A response computed while a write
+        # landed is not stored, as it may predate that write.
+        self.generation = 0
+        self._entries: "OrderedDict[Hashable, CacheEntry]" = OrderedDict()
+        self._by_list: Dict[Optional[str], Set[Hashable]] = {}
+        self._count_keys: Set[Hashable] = set()
+        self._size = 0
+        self._lock = threading.Lock()
+
+    def get(self, key: Hashable) -> Optional[CacheEntry]:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                self._entries.move_to_end(key)
+            return entry
+
+    def put(self, key: Hashable, body: bytes, generation: int, headers: Optional[Dict[str, str]] = None,
+            list_name: Optional[str] = None, tags: Iterable[str] = (),
+            watch_lists: bool = False, watch_counts: bool = False) -> CacheEntry:
+        """Cache a response computed at `generation`, unless a write has happened since.
+
+        Task writes evict the entry when they touch `list_name` (any list if
+        None) and share a tag with `tags` (any tags if empty). `watch_lists`
+        entries are evicted by list creation and deletion instead, and with
+        `watch_counts` also by task writes that change a list's task count.
+        """
+        entry = CacheEntry(body, headers or {}, list_name, frozenset(tags), watch_lists, watch_counts)
+        if entry.size > self.max_bytes // 4:
+            return entry
+        with self._lock:
+            if generation != self.generation:
+                return entry
+            self._remove(key)
+            self._entries[key] = entry
+            if not watch_lists:
+                self._by_list.setdefault(list_name, set()).add(key)
+            if watch_counts:
+                self._count_keys.add(key)
+            self._size += entry.size
+            while self._size > self.max_bytes:
+                self._remove(next(iter(self._entries)))
+        return entry
+
+    def clear(self):
+        with self._lock:
+            self.generation += 1
+            self._entries.clear()
+            self._by_list.clear()
+            self._count_keys.clear()
+            self._size = 0
+
+    def _remove(self, key: Hashable):
+        entry = self._entries.pop(key, None)
+        if entry is None:
+            return
+        self._size -= entry.size
+        if entry.watch_counts:
+            self._count_keys.discard(key)
+        if not entry.watch_lists:
+            keys = self._by_list[entry.list_name]
+            keys.discard(key)
+            if not keys:
+                del self._by_list[entry.list_name]
+
+    # --- INVALIDATION ---
+
+    def task_changed(self, old: Optional[dict], new: Optional[dict]):
+        versions = [task for task in (old, new) if task is not None]
+        lists = {task["list"] for task in versions}
+        tags = {tag for task in versions for tag in task["tags"]}
+        with self._lock:
+            self.generation += 1
+            keys = set(self._by_list.get(None, ()))
+            for name in lists:
+                keys.update(self._by_list.get(name, ()))
+            for key in keys:
+                entry = self._entries[key]
+                if not entry.tags or not entry.tags.isdisjoint(tags):
+                    self._remove(key)
+            # Counts move on create, delete and a change of list
+            if len(versions) == 1 or len(lists) == 2:
+                for key in list(self._count_keys):
+                    self._remove(key)
+
+    def list_changed(self, name: str):
+        with self._lock:
+            self.generation += 1
+            for key in [key for key, entry in self._entries.items() if entry.watch_lists]:
+                self._remove(key)
+
+    def bulk_changed(self):
+        self.clear()
@@ -0,0 +1,163 @@
+"""Columnar filter engine for the in-memory store (optional, needs NumPy).
+
+Every task occupies one row of parallel NumPy arrays: completion as bool,
+the list as an int32 id, creation and due dates as int64 microseconds and
+the tags as a uint64 bitset over a tag dictionary. A GET /tasks filter
+becomes a few vectorized boolean masks over those arrays, and a page of
+results is picked with a partial sort of the creation column, instead of
+intersecting id sets and sorting every match in Python.
+
+Deleted rows are only marked dead; the arrays are compacted once more than
+half of them are.
+"""
+from typing import Dict, Iterable, List, Optional, Set, Tuple
+
+try:
+    import numpy as np
+except ImportError:  # pragma: no cover - optional dependency
+    np = None
+
+from .records import UNDATED, RecordKey, TaskRecord
+
+INITIAL_CAPACITY = 1024
+
+
+class ColumnarIndex:
+    def __init__(self, capacity: int = INITIAL_CAPACITY):
+        if np is None:
+            raise RuntimeError("The numpy filter engine requires NumPy: pip install numpy")
+        self._uids: List[Optional[bytes]] = []
+        self._rows: Dict[bytes, int] = {}
+        self._list_ids: Dict[str, int] = {}
+        self._tag_bits: Dict[str, int] = {}
+        self._dead = 0
+        self._allocate(capacity, 1)
+
+    def _allocate(self, capacity: int, words: int):
+        self.alive = np.zeros(capacity, dtype=bool)
+        self.completed = np.zeros(capacity, dtype=bool)
+        self.list_id = np.zeros(capacity, dtype=np.int32)
+        self.created = np.zeros(capacity, dtype=np.int64)
+        self.due = np.full(capacity, UNDATED, dtype=np.int64)
+        self.tags = np.zeros((capacity, words), dtype=np.uint64)
+
+    def _columns(self):
+        return self.alive, self.completed, self.list_id, self.created, self.due, self.tags
+
+    def _resize(self, capacity: int, words: int):
+        n = len(self._uids)
+        old = self._columns()
+        self._allocate(capacity, words)
+        for new, column in zip(self._columns(), old):
+            if column.ndim == 2:
+                new[:n, :column.shape[1]] = column[:n]
+            else:
+                new[:n] = column[:n]
+
+    def _tag_bit(self, tag: str) -> int:
+        bit = self._tag_bits.get(tag)
+        if bit is None:
+            bit = self._tag_bits[tag] = len(self._tag_bits)
+            if bit >= 64 * self.tags.shape[1]:
+                self._resize(len(self.alive), self.tags.shape[1] * 2)
+        return bit
+
+    # --- MAINTENANCE ---
+
+    def add(self, task: TaskRecord):
+        row = len(self._uids)
+        if row == len(self.alive):
+            self._resize(2 * row, self.tags.shape[1])
+        self._uids.append(task.uid)
+        self._rows[task.uid] = row
+        self.alive[row] = True
+        self.completed[row] = task.completed
+        self.list_id[row] = self._list_ids.setdefault(task.list_name, len(self._list_ids))
+        self.created[row] = task.created
+        self.due[row] = task.due_micros
+        for tag in task.tags:
+            bit = self._tag_bit(tag)
+            self.tags[row, bit // 64] |= np.uint64(1 << (bit % 64))
+
+    def remove(self, task: TaskRecord):
+        row = self._rows.pop(task.uid)
+        self._uids[row] = None
+        self.alive[row] = False
+        self.tags[row] = 0
+        self._dead += 1
+        if self._dead * 2 > len(self._uids):
+            self._compact()
+
+    def clear(self):
+        self._uids, self._rows = [], {}
+        self._list_ids, self._tag_bits = {}, {}
+        self._dead = 0
+        self._allocate(INITIAL_CAPACITY, 1)
+
+    def _compact(self):
+        keep = np.flatnonzero(self.alive[:len(self._uids)])
+        for column in self._columns():
+            column[:len(keep)] = column[keep]
+            column[len(keep):] = UNDATED if column is self.due else 0
+        self._uids = [self._uids[row] for row in keep.tolist()]
+        self._rows = {uid: row for row, uid in enumerate(self._uids)}
+        self._dead = 0
+
+    # --- QUERIES ---
+
+    def _mask(self, completed: Optional[bool], tags: List[str], list_name: Optional[str]):
+        n = len(self._uids)
+        mask = self.alive[:n].copy()
+        if list_name is not None:
+            list_id = self._list_ids.get(list_name)
+            if list_id is None:
+                return mask & False
+            mask &= self.list_id[:n] == list_id
+        if completed is not None:
+            mask &= self.completed[:n] == completed
+        if tags:
+            wanted = np.zeros(self.tags.shape[1], dtype=np.uint64)
+            for tag in tags:
+                bit = self._tag_bits.get(tag)
+                if bit is not None:
+                    wanted[bit // 64] |= np.uint64(1 << (bit % 64))
+            mask &= (self.tags[:n] & wanted).any(axis=1)
+        return mask
+
+    def matching(self, completed: Optional[bool], tags: Iterable[str],
+                 list_name: Optional[str]) -> Optional[Set[bytes]]:
+        """Ids matching the filters (as TaskStore._matching_ids); None means no filter"""
+        tags = list(tags)
+        if completed is None and not tags and list_name is None:
+            return None
+        uids = self._uids
+        return {uids[row] for row in np.flatnonzero(self._mask(completed, tags, list_name)).tolist()}
+
+    def keys(self, completed: Optional[bool], tags: Iterable[str], list_name: Optional[str],
+             due: Optional[Tuple[int, int]], after: Optional[RecordKey], limit: Optional[int]) -> List[RecordKey]:
+        """Sorted keys of the tasks matching the filters and `due` range, behind `after`, at most `limit`"""
+        mask = self._mask(completed, list(tags), list_name)
+        n = len(mask)
+        if due is not None:
+            mask &= (self.due[:n] >= due[0]) & (self.due[:n] < due[1])
+        created = self.created[:n]
+        if after is not None:
+            mask &= created >= after[0]
+        rows = np.flatnonzero(mask)
+        stamps = created[rows]
+        if limit is not None and len(rows) > limit:
+            # Rows up to the limit-th smallest timestamp, ties included; the
+            # exact (created, id) order and `after` are settled in Python below.
+            extra = 0 if after is None else int(np.count_nonzero(stamps == after[0]))
+            if len(rows) > limit + extra:
+                kth = np.partition(stamps, limit + extra - 1)[limit + extra - 1]
+                keep = stamps <= kth
+                rows, stamps = rows[keep], stamps[keep]
+        order = np.argsort(stamps, kind="stable")
+        uids = self._uids
+        keys = list(zip(stamps[order].tolist(), (uids[row] for row in rows[order].tolist())))
+        # Already ordered by timestamp, so this only breaks ties by id
+        keys.sort()
+        if after is not None:
+            keys = [key for key in keys if key > after]
+        return keys if limit is None else keys[:limit]
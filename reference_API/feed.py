@@ -0,0 +1,221 @@
+"""Change feed: every task and list write as an ordered, resumable event stream.
+
+ChangeFeed listens to the store like the response cache does. Each change
+gets the next sequence number and is appended to one history shared by all
+subscribers, so publishing costs the same however many clients listen, and
+the writer (which may hold the store's lock) never renders or filters
+anything. A subscriber is only a cursor into that history plus its filters;
+it renders the tasks it is sent when it sends them, which is safe because
+stores never modify a task object they have handed out.
+
+Event ids are "<feed>:<seq>" with a random feed id per process. A client
+that reconnects with the last id it saw resumes right after it. When that is
+not possible (the id comes from another process or a restart, the history
+no longer reaches back that far, or the client fell more than `queue_size`
+changes behind) it gets a `resync` event instead, telling it to reload what
+it shows, and continues from the present. Bulk writes and changes made by
+other processes (see poll_changes) are published as a `resync` too.
+"""
+import asyncio
+import secrets
+import threading
+from typing import AsyncIterator, Awaitable, Callable, Dict, FrozenSet, Iterable, List, Optional, Set
+
+from .store import StoreListener
+
+TASK_CREATED = "task.created"
+TASK_UPDATED = "task.updated"
+TASK_DELETED = "task.deleted"
+LIST_CREATED = "list.created"
+LIST_DELETED = "list.deleted"
+RESYNC = "resync"
+# Sent first on every stream, with the id to resume from
+READY = "ready"
+
+# Idle streams get a comment line this often, so proxies keep them open
+HEARTBEAT_SECONDS = 15.0
+
+
+class Change:
+    __slots__ = ("seq", "kind", "old", "new", "name")
+
+    def __init__(self, seq: int, kind: str, old=None, new=None, name: Optional[str] = None):
+        self.seq = seq
+        self.kind = kind
+        self.old = old
+        self.new = new
+        self.name = name
+
+    @property
+    def task(self):
+        """The task as it is after the change (before it, for a deletion)"""
+        return self.old if self.new is None else self.new
+
+
+class Subscription:
+    def __init__(self, list_name: Optional[str], tags: Iterable[str], cursor: int, resync: bool):
+        self.list_name = list_name
+        self.tags: FrozenSet[str] = frozenset(tags)
+        # Sequence number of the last change this subscriber has been given
+        self.cursor = cursor
+        self.resync = resync
+        self.event = asyncio.Event()
+        self.loop = asyncio.get_running_loop()
+
+    def _shows(self, task) -> bool:
+        """Whether `task` passes the filters, as in GET /tasks"""
+        if task is None:
+            return False
+        if self.list_name is not None and task["list"] != self.list_name:
+            return False
+        return not self.tags or not self.tags.isdisjoint(task["tags"])
+
+    def matches(self, change: Change) -> bool:
+        """Task changes match if the task passed the filters before or after; list changes if no list
+        filter excludes them"""
+        if change.kind in (LIST_CREATED, LIST_DELETED):
+            return self.list_name is None or change.name == self.list_name
+        if change.kind == RESYNC:
+            return True
+        return self._shows(change.old) or self._shows(change.new)
+
+
+class ChangeFeed(StoreListener):
+    def __init__(self, history: int = 10000, queue_size: int = 1000):
+        self.history = history
+        self.queue_size = queue_size
+        self.feed_id = secrets.token_hex(4)
+        self.seq = 0
+        # The most recent changes, oldest first; trimmed to `history` once it doubles
+        self._changes: List[Change] = []
+        # Subscribers waiting for a change, by the event loop serving them,
+        # and the loops already sent a wake-up that has not run yet
+        self._waiting: Dict[asyncio.AbstractEventLoop, Set[Subscription]] = {}
+        self._waking: Set[asyncio.AbstractEventLoop] = set()
+        self._lock = threading.Lock()
+
+    def event_id(self, seq: int) -> str:
+        return f"{self.feed_id}:{seq}"
+
+    # --- PUBLISHING ---
+
+    def _publish(self, kind: str, old=None, new=None, name: Optional[str] = None):
+        with self._lock:
+            self.seq += 1
+            self._changes.append(Change(self.seq, kind, old, new, name))
+            if len(self._changes) > 2 * self.history:
+                del self._changes[:-self.history]
+            loops = [loop for loop in self._waiting if loop not in self._waking]
+            self._waking.update(loops)
+        # One wake-up per event loop, however many of its subscribers wait
+        for loop in loops:
+            try:
+                loop.call_soon_threadsafe(self._wake, loop)
+            except RuntimeError:
+                # The loop has been closed, and its subscribers with it
+                with self._lock:
+                    self._waiting.pop(loop, None)
+                    self._waking.discard(loop)
+
+    def _wake(self, loop: asyncio.AbstractEventLoop):
+        with self._lock:
+            self._waking.discard(loop)
+            subscriptions = self._waiting.pop(loop, ())
+        for subscription in subscriptions:
+            subscription.event.set()
+
+    def task_changed(self, old: Optional[dict], new: Optional[dict]):
+        kind = TASK_CREATED if old is None else TASK_DELETED if new is None else TASK_UPDATED
+        self._publish(kind, old, new)
+
+    def list_created(self, name: str):
+        self._publish(LIST_CREATED, name=name)
+
+    def list_deleted(self, name: str):
+        self._publish(LIST_DELETED, name=name)
+
+    def bulk_changed(self):
+        self._publish(RESYNC)
+
+    # --- SUBSCRIBING ---
+
+    def subscribe(self, list_name: Optional[str] = None, tags: Iterable[str] = (),
+                  after: Optional[str] = None) -> Subscription:
+        """Follow the changes after event id `after` (from now on if None) that match the filters.
+
+        Must be called on the event loop that will wait for the changes.
+        """
+        with self._lock:
+            cursor = self.seq
+        resync = False
+        if after is not None:
+            feed_id, _, seq = after.partition(":")
+            if feed_id == self.feed_id and seq.isdigit() and int(seq) <= cursor:
+                cursor = int(seq)
+            else:
+                resync = True
+        return Subscription(list_name, tags, cursor, resync)
+
+    def unsubscribe(self, subscription: Subscription):
+        with self._lock:
+            waiting = self._waiting.get(subscription.loop)
+            if waiting is not None:
+                waiting.discard(subscription)
+
+    def _take(self, subscription: Subscription) -> Optional[List[Change]]:
+        """The changes after the subscriber's cursor, moving it past them, or None after
+        registering it as waiting when there are none"""
+        with self._lock:
+            first = self.seq - len(self._changes) + 1
+            if subscription.resync or subscription.cursor < first - 1 \
+                    or self.seq - subscription.cursor > self.queue_size:
+                subscription.resync = False
+                subscription.cursor = self.seq
+                return [Change(self.seq, RESYNC)]
+            if subscription.cursor == self.seq:
+                subscription.event.clear()
+                self._waiting.setdefault(subscription.loop, set()).add(subscription)
+                return None
+            changes = self._changes[subscription.cursor - first + 1:]
+        subscription.cursor = changes[-1].seq
+        return changes
+
+    async def wait(self, subscription: Subscription, timeout: float) -> List[Change]:
+        """The next matching changes, waiting up to `timeout` seconds for one; [] if none came"""
+        loop = asyncio.get_running_loop()
+        deadline = loop.time() + timeout
+        try:
+            while True:
+                changes = self._take(subscription)
+                if changes is None:
+                    remaining = deadline - loop.time()
+                    if remaining <= 0:
+                        return []
+                    try:
+                        await asyncio.wait_for(subscription.event.wait(), remaining)
+                    except asyncio.TimeoutError:
+                        return []
+                    continue
+                changes = [change for change in changes if subscription.matches(change)]
+                if changes:
+                    return changes
+        finally:
+            self.unsubscribe(subscription)
+
+    async def stream(self, list_name: Optional[str], tags: Iterable[str], after: Optional[str],
+                     render: Callable[[Change], bytes], poll: Callable[[], Awaitable]) -> AsyncIterator[bytes]:
+        """A server-sent event stream for `subscribe(list_name, tags, after)`.
+
+        Starts with a `ready` event, then sends every matching change through
+        `render`. While idle it sends a heartbeat and calls `poll` to pick up
+        writes by other processes.
+        """
+        subscription = self.subscribe(list_name, tags, after)
+        yield render(Change(subscription.cursor, READY))
+        while True:
+            changes = await self.wait(subscription, HEARTBEAT_SECONDS)
+            if changes:
+                yield b"".join(render(change) for change in changes)
+            else:
+                yield b": keep-alive\n\n"
+                await poll()
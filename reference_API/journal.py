@@ -0,0 +1,420 @@
+"""Write-ahead log and snapshots that make the in-memory store durable.
+
+With TODO_DATA_DIR set, open_store() attaches a Journal to the TaskStore.
+Every write is appended to a log segment and fsynced before it returns
+(readers may see it slightly earlier, while the fsync is in flight). Writers that
+arrive while a flush is under way are written and fsynced together by the
+next one (group commit), so one fsync covers a whole burst of writes.
+
+Once a segment grows past TODO_SNAPSHOT_BYTES the store is checkpointed in
+the background: the log moves on to a new segment, and the state as of
+that point is written as a compact binary snapshot. Recovery memory-maps
+the newest snapshot and replays only the segments after it, so restart
+time is bounded by the snapshot size plus at most one segment's worth of
+log. The directory holds:
+
+    snapshot-<n>.bin   the state before log-<n>.bin
+    log-<n>.bin        writes since snapshot <n> or since a restart, in order
+
+Log entries are framed with their length and CRC32; replay of a segment
+stops at the first torn or corrupt frame, which can only be a write that
+was never acknowledged.
+
+The store logs a write before applying it, so a write that cannot be
+encoded is rejected without changing anything. If writing or fsyncing the
+log fails, the journal refuses every later write (JournalError) instead of
+retrying: what reached the disk is unknown, and the process has to be
+restarted to recover from the log.
+"""
+import json
+import mmap
+import os
+import re
+import struct
+import sys
+import threading
+import uuid
+import zlib
+from datetime import timedelta, timezone
+from typing import Iterator, List, Optional, Tuple
+
+from .records import TaskRecord, due_key, from_micros
+from .store import ChangeLog, TaskStore
+
+try:
+    import fcntl
+except ImportError:  # pragma: no cover - Windows
+    fcntl = None
+
+SNAPSHOT_MAGIC = b"TODOSNP2"
+# magic, number of lists, number of tasks
+SNAPSHOT_HEAD = struct.Struct("<8sIQ")
+CRC = struct.Struct("<I")
+# Log frame: payload length, CRC32 of the payload
+FRAME = struct.Struct("<II")
+# uid, created, due, due offset (seconds), flags, recurrence, recurrence end,
+# then the lengths of the list name, title, description and the tag count
+TASK_HEAD = struct.Struct("<16sqqiBbiIIII")
+STRING_LENGTH = struct.Struct("<I")
+
+COMPLETED, HAS_DUE, AWARE_DUE, HAS_DESCRIPTION = 1, 2, 4, 8
+
+# Log entry kinds, the first byte of each payload. Task entries were b"T" while
+# TASK_HEAD had 16-bit lengths, so such a log fails to replay instead of misreading
+PUT_TASK, DELETE_TASK, DELETE_TASKS, RESET, CREATE_LIST, DELETE_LIST = b"PDWRLU"
+
+# Tasks encoded per write() while taking a snapshot
+SNAPSHOT_BATCH = 4096
+
+FILE_NAME = re.compile(r"(snapshot|log)-(\d+)\.bin$")
+
+
+# --- ENCODING ---
+
+def encode_task(task: TaskRecord) -> bytes:
+    flags = COMPLETED if task.completed else 0
+    due, offset = 0, 0
+    if task.due is not None:
+        flags |= HAS_DUE
+        if isinstance(task.due, int):
+            due = task.due
+        else:
+            flags |= AWARE_DUE
+            due = due_key(task.due)
+            offset = int(task.due.utcoffset().total_seconds())
+    description = b""
+    if task.description is not None:
+        flags |= HAS_DESCRIPTION
+        description = task.description.encode()
+    list_name, title = task.list_name.encode(), task.title.encode()
+    tags = [tag.encode() for tag in task.tags]
+    head = TASK_HEAD.pack(
+        task.uid, task.created, due, offset, flags,
+        -1 if task.recurrence is None else task.recurrence, task.recurrence_end or 0,
+        len(list_name), len(title), len(description), len(tags),
+    )
+    return b"".join([head, list_name, title, description] + [STRING_LENGTH.pack(len(tag)) + tag for tag in tags])
+
+
+def decode_task(buffer, offset: int) -> Tuple[TaskRecord, int]:
+    """The task encoded at `offset`, and the offset just past it"""
+    (uid, created, due, due_offset, flags, recurrence, recurrence_end,
+     list_length, title_length, description_length, tag_count) = TASK_HEAD.unpack_from(buffer, offset)
+    offset += TASK_HEAD.size
+    task = TaskRecord()
+    task.uid = uid
+    task.created = created
+    task.completed = bool(flags & COMPLETED)
+    if not flags & HAS_DUE:
+        task.due = None
+    elif flags & AWARE_DUE:
+        # The local time is always in range, even where the UTC time is not
+        local = from_micros(due + due_offset * 1000000)
+        task.due = local.replace(tzinfo=timezone(timedelta(seconds=due_offset)))
+    else:
+        task.due = due
+    task.recurrence = None if recurrence < 0 else recurrence
+    task.recurrence_end = recurrence_end or None
+    task.list_name = sys.intern(str(buffer[offset:offset + list_length], "utf-8"))
+    offset += list_length
+    task.title = str(buffer[offset:offset + title_length], "utf-8")
+    offset += title_length
+    task.description = str(buffer[offset:offset + description_length], "utf-8") if flags & HAS_DESCRIPTION else None
+    offset += description_length
+    tags = []
+    for _ in range(tag_count):
+        (length,) = STRING_LENGTH.unpack_from(buffer, offset)
+        offset += STRING_LENGTH.size
+        tags.append(sys.intern(str(buffer[offset:offset + length], "utf-8")))
+        offset += length
+    task.tags = tuple(tags)
+    return task, offset
+
+
+def _frames(buffer) -> Iterator[memoryview]:
+    """Payloads of the intact frames at the start of a log segment"""
+    view = memoryview(buffer)
+    offset = 0
+    while offset + FRAME.size <= len(view):
+        length, crc = FRAME.unpack_from(view, offset)
+        payload = view[offset + FRAME.size:offset + FRAME.size + length]
+        if len(payload) < length or zlib.crc32(payload) != crc:
+            return
+        yield payload
+        offset += FRAME.size + length
+
+
+def _apply(store: TaskStore, payload: memoryview):
+    kind, body = payload[0], payload[1:]
+    if kind == PUT_TASK:
+        store.restore_task(decode_task(body, 0)[0])
+    elif kind == DELETE_TASK:
+        store.delete_task(str(uuid.UUID(bytes=bytes(body))))
+    elif kind == DELETE_TASKS:
+        store.delete_tasks(**json.loads(bytes(body)))
+    elif kind == RESET:
+        store.reset()
+    elif kind == CREATE_LIST:
+        store.create_list(str(body, "utf-8"))
+    elif kind == DELETE_LIST:
+        store.delete_list(str(body, "utf-8"))
+    else:
+        raise ValueError(f"Unknown log entry {kind!r}")
+
+
+def read_snapshot(path: str) -> Tuple[List[str], List[TaskRecord]]:
+    """Lists and tasks (in (created_at, id) order) of a snapshot file, read through a memory map"""
+    with open(path, "rb") as f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as data:
+        view = memoryview(data)
+        try:
+            (crc,) = CRC.unpack_from(view, len(view) - CRC.size)
+            if zlib.crc32(view[:-CRC.size]) != crc:
+                raise ValueError(f"Snapshot {path} is corrupt")
+            magic, list_count, task_count = SNAPSHOT_HEAD.unpack_from(view, 0)
+            if magic != SNAPSHOT_MAGIC:
+                raise ValueError(f"{path} is not a snapshot")
+            offset = SNAPSHOT_HEAD.size
+            lists = []
+            for _ in range(list_count):
+                (length,) = STRING_LENGTH.unpack_from(view, offset)
+                offset += STRING_LENGTH.size
+                lists.append(str(view[offset:offset + length], "utf-8"))
+                offset += length
+            tasks = []
+            for _ in range(task_count):
+                task, offset = decode_task(view, offset)
+                tasks.append(task)
+            return lists, tasks
+        finally:
+            view.release()
+
+
+class JournalError(RuntimeError):
+    """The log could not be written, so the store accepts no more writes"""
+
+
+def _write_all(fd: int, data: bytes):
+    view = memoryview(data)
+    while view:
+        view = view[os.write(fd, view):]
+
+
+def _fsync_directory(path: str):
+    fd = os.open(path, os.O_RDONLY)
+    try:
+        os.fsync(fd)
+    finally:
+        os.close(fd)
+
+
+class Journal(ChangeLog):
+    """Log segments and snapshots in `directory`, owned by one process at a time"""
+
+    def __init__(self, directory: str, snapshot_bytes: int = 64 * 1024 * 1024):
+        self.directory = directory
+        self.snapshot_bytes = snapshot_bytes
+        self._cond = threading.Condition(threading.Lock())
+        self._buffer = bytearray()
+        self._appended = 0
+        self._durable = 0
+        self._flushing = False
+        self._snapshotting = False
+        # The I/O error that stopped the log, if any
+        self._error: Optional[OSError] = None
+        self._fd: Optional[int] = None
+        self._segment = 0
+        self._segment_bytes = 0
+        self._store: Optional[TaskStore] = None
+        os.makedirs(directory, exist_ok=True)
+        self._lock_file = open(os.path.join(directory, "LOCK"), "a")
+        if fcntl is not None:
+            try:
+                fcntl.flock(self._lock_file, fcntl.LOCK_EX | fcntl.LOCK_NB)
+            except OSError:
+                self._lock_file.close()
+                raise RuntimeError(f"{directory} is in use by another process")
+
+    def _files(self, kind: str) -> List[int]:
+        numbers = []
+        for name in os.listdir(self.directory):
+            match = FILE_NAME.match(name)
+            if match and match.group(1) == kind:
+                numbers.append(int(match.group(2)))
+        return sorted(numbers)
+
+    def _path(self, kind: str, number: int) -> str:
+        return os.path.join(self.directory, f"{kind}-{number:010d}.bin")
+
+    def recover(self, store: TaskStore):
+        """Load the newest snapshot and replay the log after it into `store`, then start logging its writes"""
+        for name in os.listdir(self.directory):
+            if name.endswith(".tmp"):
+                os.remove(os.path.join(self.directory, name))
+        snapshots = self._files("snapshot")
+        start = snapshots[-1] if snapshots else 0
+        if snapshots:
+            store.load(*read_snapshot(self._path("snapshot", start)))
+        logs = [number for number in self._files("log") if number >= start]
+        replayed = 0
+        for number in logs:
+            with open(self._path("log", number), "rb") as f:
+                data = f.read()
+            replayed += len(data)
+            for payload in _frames(data):
+                _apply(store, payload)
+        # A torn tail stays behind in its old segment; new writes start a fresh one
+        self._open_segment(max(logs + [start]) + 1)
+        self._store = store
+        store.journal = self
+        # Restarts each leave a segment behind, so keep the next recovery short
+        if replayed >= self.snapshot_bytes:
+            store.checkpoint()
+
+    def _open_segment(self, number: int):
+        self._fd = os.open(self._path("log", number), os.O_WRONLY | os.O_CREAT | os.O_APPEND, 0o644)
+        _fsync_directory(self.directory)
+        self._segment = number
+        self._segment_bytes = 0
+
+    # --- APPENDING ---
+
+    def _check(self):
+        if self._error is not None:
+            raise JournalError(f"Writing the log in {self.directory} failed; restart to recover") from self._error
+
+    def _append(self, *payloads: bytes) -> int:
+        frames = b"".join(FRAME.pack(len(payload), zlib.crc32(payload)) + payload for payload in payloads)
+        with self._cond:
+            self._check()
+            self._buffer += frames
+            self._appended += len(payloads)
+            return self._appended
+
+    def put_task(self, task: TaskRecord) -> int:
+        return self._append(bytes([PUT_TASK]) + encode_task(task))
+
+    def put_tasks(self, tasks: List[TaskRecord]) -> int:
+        if not tasks:
+            return 0
+        return self._append(*(bytes([PUT_TASK]) + encode_task(task) for task in tasks))
+
+    def delete_task(self, uid: bytes) -> int:
+        return self._append(bytes([DELETE_TASK]) + uid)
+
+    def delete_tasks(self, completed: Optional[bool], tags: List[str], list_name: Optional[str]) -> int:
+        filters = {"completed": completed, "tags": tags, "list_name": list_name}
+        return self._append(bytes([DELETE_TASKS]) + json.dumps(filters).encode())
+
+    def reset(self) -> int:
+        return self._append(bytes([RESET]))
+
+    def create_list(self, name: str) -> int:
+        return self._append(bytes([CREATE_LIST]) + name.encode())
+
+    def delete_list(self, name: str) -> int:
+        return self._append(bytes([DELETE_LIST]) + name.encode())
+
+    # --- GROUP COMMIT ---
+
+    def sync(self, seq: int):
+        """Block until entry `seq` is on disk, flushing everything appended so far if no one else is"""
+        with self._cond:
+            while self._durable < seq:
+                self._check()
+                if self._flushing:
+                    self._cond.wait()
+                    continue
+                self._flush_locked()
+            snapshot = self._store is not None and self._segment_bytes >= self.snapshot_bytes and not self._snapshotting
+            if snapshot:
+                self._snapshotting = True
+        if snapshot:
+            threading.Thread(target=self._checkpoint, name="todo-snapshot", daemon=True).start()
+
+    def _flush_locked(self):
+        """Write and fsync the buffer; called holding _cond, which is released during the I/O.
+
+        The buffer is only dropped once the fsync succeeds. On failure the
+        journal is stopped and the error raised here and by every later
+        write or sync.
+        """
+        data, upto, fd = bytes(self._buffer), self._appended, self._fd
+        self._flushing = True
+        self._cond.release()
+        error = None
+        try:
+            _write_all(fd, data)
+            os.fsync(fd)
+        except OSError as e:
+            error = e
+        finally:
+            self._cond.acquire()
+            self._flushing = False
+            self._cond.notify_all()
+        if error is not None:
+            self._error = error
+            self._check()
+        del self._buffer[:len(data)]
+        self._durable = upto
+        self._segment_bytes += len(data)
+
+    # --- SNAPSHOTS ---
+
+    def _checkpoint(self):
+        try:
+            self._store.checkpoint()
+        finally:
+            with self._cond:
+                self._snapshotting = False
+
+    def rotate(self) -> int:
+        with self._cond:
+            while self._flushing:
+                self._cond.wait()
+            self._check()
+            if self._buffer:
+                self._flush_locked()
+            os.close(self._fd)
+            self._open_segment(self._segment + 1)
+            return self._segment
+
+    def write_snapshot(self, number: int, lists: List[str], tasks: List[TaskRecord]):
+        path = self._path("snapshot", number)
+        temporary = path + ".tmp"
+        crc = 0
+        with open(temporary, "wb") as f:
+            def write(chunk: bytes):
+                nonlocal crc
+                crc = zlib.crc32(chunk, crc)
+                f.write(chunk)
+
+            write(SNAPSHOT_HEAD.pack(SNAPSHOT_MAGIC, len(lists), len(tasks)))
+            write(b"".join(STRING_LENGTH.pack(len(name)) + name for name in (n.encode() for n in lists)))
+            for start in range(0, len(tasks), SNAPSHOT_BATCH):
+                write(b"".join(map(encode_task, tasks[start:start + SNAPSHOT_BATCH])))
+            f.write(CRC.pack(crc))
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(temporary, path)
+        _fsync_directory(self.directory)
+        for older in self._files("snapshot"):
+            if older < number:
+                os.remove(self._path("snapshot", older))
+        for older in self._files("log"):
+            if older < number:
+                os.remove(self._path("log", older))
+
+    def close(self):
+        try:
+            with self._cond:
+                while self._flushing:
+                    self._cond.wait()
+                if self._fd is not None:
+                    try:
+                        if self._buffer and self._error is None:
+                            self._flush_locked()
+                    finally:
+                        os.close(self._fd)
+                        self._fd = None
+        finally:
+            self._lock_file.close()
@@ -0,0 +1,47 @@
+"""Readers-writer lock for the in-memory store."""
+import threading
+from contextlib import contextmanager
+
+
+class RWLock:
+    """Any number of readers at once, or a single writer.
+
+    Writers take priority over readers that arrive after them, so a steady
+    stream of reads cannot starve writes. Not reentrant: a thread holding
+    either side must not acquire the lock again.
+    """
+
+    def __init__(self):
+        self._cond = threading.Condition(threading.Lock())
+        self._readers = 0
+        self._writing = False
+        self._waiting_writers = 0
+
+    @contextmanager
+    def read(self):
+        with self._cond:
+            while self._writing or self._waiting_writers:
+                self._cond.wait()
+            self._readers += 1
+        try:
+            yield
+        finally:
+            with self._cond:
+                self._readers -= 1
+                if not self._readers:
+                    self._cond.notify_all()
+
+    @contextmanager
+    def write(self):
+        with self._cond:
+            self._waiting_writers += 1
+            while self._writing or self._readers:
+                self._cond.wait()
+            self._waiting_writers -= 1
+            self._writing = True
+        try:
+            yield
+        finally:
+            with self._cond:
+                self._writing = False
+                self._cond.notify_all()
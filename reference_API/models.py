@@ -0,0 +1,99 @@
+"""Pydantic models of the To-Do API"""
+from pydantic import BaseModel, TypeAdapter, model_validator
+from typing import Any, List, Optional
+from datetime import datetime, date
+from enum import Enum
+
+# ENUM for recurrence
+class Recurrence(str, Enum):
+    daily = "daily"
+    weekly = "weekly"
+    monthly = "monthly"
+
+# BASE models
+class TaskBase(BaseModel):
+    title: str
+    description: Optional[str] = ""
+    tags: List[str] = []
+    due_date: Optional[datetime] = None
+    recurrence: Optional[Recurrence] = None
+    recurrence_end_date: Optional[date] = None
+    list: Optional[str] = "Personal"
+
+class TaskCreate(TaskBase):
+    completed: bool = False
+
+class TaskUpdate(BaseModel):
+    title: Optional[str] = None
+    description: Optional[str] = None
+    tags: Optional[List[str]] = None
+    completed: Optional[bool] = None
+    due_date: Optional[datetime] = None
+    recurrence: Optional[Recurrence] = None
+    recurrence_end_date: Optional[date] = None
+    list: Optional[str] = None
+
+class TaskFilter(BaseModel):
+    completed: Optional[bool] = None
+    tags: List[str] = []
+    list: Optional[str] = None
+    # Required to match every task with an otherwise empty filter
+    all: bool = False
+
+class BatchUpdate(BaseModel):
+    """One update applied to the tasks in `ids`, or to every task matching `filter`"""
+    ids: Optional[List[str]] = None
+    filter: Optional[TaskFilter] = None
+    update: TaskUpdate
+
+    @model_validator(mode="after")
+    def one_target(self):
+        if (self.ids is None) == (self.filter is None):
+            raise ValueError("Give either ids or filter")
+        return self
+
+class TaskOut(TaskBase):
+    id: str
+    completed: bool
+    created_at: datetime
+
+class Occurrence(BaseModel):
+    task_id: str
+    title: str
+    list: str
+    completed: bool
+    occurs_at: datetime
+
+class ListCreate(BaseModel):
+    name: str
+
+class ListOut(BaseModel):
+    name: str
+
+class ListCountOut(ListOut):
+    count: int
+
+class DeleteResult(BaseModel):
+    deleted: int
+
+class UpdateResult(BaseModel):
+    updated: int
+
+class BatchItemResult(BaseModel):
+    id: str
+    status: int
+    task: Optional[TaskOut] = None
+    detail: Optional[Any] = None
+
+class BulkItemResult(BaseModel):
+    index: int
+    status: int
+    task: Optional[TaskOut] = None
+    detail: Optional[Any] = None
+
+TASK_OUT = TypeAdapter(TaskOut)
+OCCURRENCE = TypeAdapter(Occurrence)
+
+def task_json(task: dict) -> bytes:
+    """A task record serialized exactly as the API returns it"""
+    return TASK_OUT.dump_json(TASK_OUT.validate_python(task))
@@ -0,0 +1,128 @@
+"""Lazy expansion of recurring tasks into occurrences within a time window.
+
+Each task becomes a generator of its occurrence times that starts at the
+first one inside the window (skipping ahead arithmetically rather than
+stepping through the past) and stops at the window end or the day after
+`recurrence_end_date`, whichever comes first. The generators are merged on
+a heap into one time-ordered stream. Tasks are read in due-date order and
+admitted to the heap only once the merge reaches their due date, so the
+heap holds the series already running plus the next task, never the whole
+store, and no window is ever materialized. window_tasks() reads only the
+tasks that can occur in the window, so tasks that ended before it are
+never read.
+"""
+import calendar
+import heapq
+import itertools
+from datetime import date, datetime, timedelta, timezone
+from typing import Callable, Iterable, Iterator, Mapping, Optional, Tuple
+
+from .models import Recurrence
+from .records import due_key, from_micros, to_micros
+
+STEPS = {Recurrence.daily: timedelta(days=1), Recurrence.weekly: timedelta(weeks=1)}
+NAIVE_MIN, NAIVE_MAX = to_micros(datetime.min), to_micros(datetime.max)
+
+
+def add_months(value: datetime, months: int) -> datetime:
+    """`value` moved by whole months, clamping the day to the target month's length"""
+    month_index = value.month - 1 + months
+    year, month = value.year + month_index // 12, month_index % 12 + 1
+    day = min(value.day, calendar.monthrange(year, month)[1])
+    return value.replace(year=year, month=month, day=day)
+
+
+def occurrence_times(due: datetime, recurrence: Optional[Recurrence], end_date: Optional[date],
+                     start: datetime, end: datetime) -> Iterator[datetime]:
+    """Occurrences of a task due at `due` within [start, end), in order.
+
+    `start` and `end` must be comparable with `due` (both naive or both
+    aware). A recurring task repeats until the end of `end_date`, if set;
+    monthly repeats keep the original day, clamped in shorter months.
+    """
+    if recurrence is None:
+        if start <= due < end:
+            yield due
+        return
+    recurrence = Recurrence(recurrence)
+    if recurrence is Recurrence.monthly:
+        # Months elapsed before the window, less one so clamped days can't overshoot
+        months = max(0, (start.year - due.year) * 12 + start.month - due.month - 1)
+        times = (add_months(due, n) for n in itertools.count(months))
+    else:
+        step = STEPS[recurrence]
+        skipped = max(0, -((due - start) // step))
+        times = (due + n * step for n in itertools.count(skipped))
+    try:
+        for time in times:
+            if time >= end or (end_date is not None and time.date() > end_date):
+                return
+            if time >= start:
+                yield time
+    except (OverflowError, ValueError):
+        # The next occurrence would fall after year 9999
+        return
+
+
+def window_tasks(query: Callable[..., Iterator[Mapping]], start: datetime, end: datetime,
+                 **filters) -> Iterator[Mapping]:
+    """The tasks matching `filters` that can occur in [start, end), in due-date order, from a store's
+    query(): the recurring tasks due before the window, then every task due in it.
+
+    Only repeating tasks can occur after their due date, so the store's
+    index of them spares reading the tasks due before the window that don't.
+    """
+    return itertools.chain(
+        query(**filters, due_before=start, sort="due_date", recurring=True),
+        query(**filters, due_after=start, due_before=end, sort="due_date"),
+    )
+
+
+def expand(tasks: Iterable[Mapping], start: datetime, end: datetime) -> Iterator[Tuple[datetime, Mapping]]:
+    """(time, task) for every occurrence of `tasks` in [start, end), in time order.
+
+    `tasks` must be ordered by due date (undated tasks are ignored) and end
+    before `end`, as window_tasks() returns them. Times compare across
+    time zones as in records.due_key.
+    """
+    heap = []
+    sequence = 0  # tie-breaker so the heap never compares tasks
+    tasks = iter(tasks)
+    pending = next(tasks, None)
+    while True:
+        # Admit every task whose first occurrence could precede the heap's earliest
+        while pending is not None and (not heap or due_key(pending["due_date"]) <= heap[0][0]):
+            times = _task_times(pending, start, end)
+            first = next(times, None)
+            if first is not None:
+                heapq.heappush(heap, (due_key(first), sequence, first, times, pending))
+                sequence += 1
+            pending = next(tasks, None)
+        if not heap:
+            return
+        _, order, time, times, task = heap[0]
+        yield time, task
+        following = next(times, None)
+        if following is None:
+            heapq.heappop(heap)
+        else:
+            heapq.heapreplace(heap, (due_key(following), order, following, times, task))
+
+
+def _task_times(task: Mapping, start: datetime, end: datetime) -> Iterator[datetime]:
+    due = task["due_date"]
+    if due is None:
+        return iter(())
+    # Naive and aware datetimes don't compare; express the window in the
+    # task's own terms, taking naive times as UTC as due_key does
+    start, end = (_like(due, bound) for bound in (start, end))
+    return occurrence_times(due, task["recurrence"], task["recurrence_end_date"], start, end)
+
+
+def _like(reference: datetime, value: datetime) -> datetime:
+    if (reference.tzinfo is None) == (value.tzinfo is None):
+        return value
+    if reference.tzinfo is None:
+        # Clamped, as the UTC time of an aware bound may fall outside datetime's range
+        return from_micros(min(max(due_key(value), NAIVE_MIN), NAIVE_MAX))
+    return value.replace(tzinfo=timezone.utc)
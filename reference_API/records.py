@@ -0,0 +1,131 @@
+"""Compact in-memory representation of a task.
+
+A TaskRecord stores the task in slots instead of a per-instance dict: the id
+as 16 UUID bytes, timestamps as integer microseconds since the epoch, the
+recurrence end as a date ordinal, the recurrence as its Recurrence ordinal,
+and list and tag names interned so every task shares one copy of each.
+
+Records are read-only Mappings that decode fields on access, so they can be
+handed to pydantic (or anything expecting a task dict) at the API boundary.
+"""
+import sys
+import uuid
+from collections.abc import Mapping
+from datetime import date, datetime, timedelta, timezone
+from typing import Optional, Tuple
+
+from .models import Recurrence
+
+EPOCH = datetime(1970, 1, 1)
+MICROSECOND = timedelta(microseconds=1)
+
+RECURRENCES = list(Recurrence)
+RECURRENCE_ORDINALS = {recurrence: ordinal for ordinal, recurrence in enumerate(RECURRENCES)}
+
+FIELDS = (
+    "id", "title", "description", "tags", "completed", "due_date", "recurrence",
+    "recurrence_end_date", "list", "created_at",
+)
+
+# Due-date key of tasks without a due date, so they sort after every dated task
+UNDATED = 2 ** 63 - 1
+
+RecordKey = Tuple[int, bytes]
+DueRecordKey = Tuple[int, int, bytes]
+
+
+def to_micros(value: datetime) -> int:
+    return (value - EPOCH) // MICROSECOND
+
+
+def from_micros(micros: int) -> datetime:
+    return EPOCH + timedelta(microseconds=micros)
+
+
+def due_key(value: Optional[datetime]) -> int:
+    """Integer sort key of a due date: naive microseconds, aware dates taken in UTC.
+
+    The offset is subtracted as an integer rather than with astimezone(), so
+    aware dates whose UTC time falls outside datetime's range (such as
+    0001-01-01T00:00:00+05:00) still get a key instead of an OverflowError.
+    """
+    if value is None:
+        return UNDATED
+    if value.tzinfo is None:
+        return to_micros(value)
+    return to_micros(value.replace(tzinfo=None)) - value.utcoffset() // MICROSECOND
+
+
+def uid_of(task_id: str) -> Optional[bytes]:
+    """16-byte form of a task id, or None if it is not a UUID"""
+    try:
+        return uuid.UUID(task_id).bytes
+    except ValueError:
+        return None
+
+
+class TaskRecord(Mapping):
+    __slots__ = (
+        "uid", "title", "description", "tags", "completed", "due", "recurrence",
+        "recurrence_end", "list_name", "created",
+    )
+
+    @classmethod
+    def from_task(cls, task: Mapping) -> "TaskRecord":
+        record = cls()
+        record.uid = uuid.UUID(task["id"]).bytes
+        record.title = task["title"]
+        record.description = task["description"]
+        record.tags = tuple(sys.intern(tag) for tag in task["tags"])
+        record.completed = bool(task["completed"])
+        due = task["due_date"]
+        # Timezone-aware due dates keep their offset by staying datetimes
+        record.due = to_micros(due) if due is not None and due.tzinfo is None else due
+        recurrence = task["recurrence"]
+        record.recurrence = None if recurrence is None else RECURRENCE_ORDINALS[recurrence]
+        end = task["recurrence_end_date"]
+        record.recurrence_end = None if end is None else end.toordinal()
+        record.list_name = sys.intern(task["list"])
+        record.created = to_micros(task["created_at"])
+        return record
+
+    @property
+    def key(self) -> RecordKey:
+        """Sort key ordering records like (created_at, id)"""
+        return (self.created, self.uid)
+
+    @property
+    def due_micros(self) -> int:
+        """due_key() of the due date"""
+        return self.due if isinstance(self.due, int) else due_key(self.due)
+
+    @property
+    def due_sort_key(self) -> DueRecordKey:
+        """Sort key ordering records like (due_date, created_at, id), undated last"""
+        return (self.due_micros, self.created, self.uid)
+
+    def __getitem__(self, field: str):
+        return _DECODERS[field](self)
+
+    def __iter__(self):
+        return iter(FIELDS)
+
+    def __len__(self) -> int:
+        return len(FIELDS)
+
+    def __repr__(self) -> str:
+        return f"TaskRecord({dict(self)!r})"
+
+
+_DECODERS = {
+    "id": lambda r: str(uuid.UUID(bytes=r.uid)),
+    "title": lambda r: r.title,
+    "description": lambda r: r.description,
+    "tags": lambda r: list(r.tags),
+    "completed": lambda r: r.completed,
+    "due_date": lambda r: from_micros(r.due) if isinstance(r.due, int) else r.due,
+    "recurrence": lambda r: None if r.recurrence is None else RECURRENCES[r.recurrence],
+    "recurrence_end_date": lambda r: None if r.recurrence_end is None else date.fromordinal(r.recurrence_end),
+    "list": lambda r: r.list_name,
+    "created_at": lambda r: from_micros(r.created),
+}
@@ -0,0 +1,254 @@
+"""HTTP plumbing shared by the threadpool app (api_skeleton) and the async app (async_api).
+
+Everything here is free of I/O: request body parsing, response rendering,
+cache keys and the app-wide settings, so both apps behave identically and
+differ only in how they reach the store.
+"""
+import json
+import os
+import secrets
+from typing import Dict, Iterable, List, Optional, Tuple, Union
+
+from fastapi import FastAPI, Header, HTTPException, Request, Response
+from fastapi.encoders import jsonable_encoder
+from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import JSONResponse
+from pydantic import TypeAdapter, ValidationError
+
+from .cache import CacheEntry, ResponseCache, etag_matches
+from .feed import LIST_CREATED, LIST_DELETED, TASK_DELETED, Change, ChangeFeed
+from .models import OCCURRENCE, BatchUpdate, BulkItemResult, ListCountOut, ListOut, Occurrence, TaskCreate
+from .search import tokenize
+from .store import Delta, StoreError, encode_cursor
+
+MAX_PAGE_SIZE = 1000
+SEARCH_LIMIT = 20
+MAX_BULK_SIZE = 10000
+
+
+def configure_app(app: FastAPI):
+    """CORS and the StoreError handler every app needs"""
+    app.add_middleware(
+        CORSMiddleware,
+        allow_origins=["*"],
+        allow_credentials=True,
+        allow_methods=["*"],
+        allow_headers=["*"],
+        expose_headers=["X-Next-Cursor", "ETag"],
+    )
+
+    @app.exception_handler(StoreError)
+    def store_error_handler(request: Request, exc: StoreError):
+        return JSONResponse(status_code=exc.status_code, content={"detail": str(exc)})
+
+
+def cache_from_env() -> ResponseCache:
+    """Cache of serialized GET /tasks and GET /lists responses; TODO_CACHE_BYTES=0 disables it"""
+    return ResponseCache(max_bytes=int(os.getenv("TODO_CACHE_BYTES", 64 * 1024 * 1024)))
+
+
+def feed_from_env() -> ChangeFeed:
+    """Change feed keeping the last TODO_FEED_HISTORY changes and letting a client fall TODO_FEED_QUEUE behind"""
+    return ChangeFeed(history=int(os.getenv("TODO_FEED_HISTORY", 10000)),
+                      queue_size=int(os.getenv("TODO_FEED_QUEUE", 1000)))
+
+
+BULK_REQUEST_BODY = {
+    "requestBody": {
+        "required": True,
+        "content": {
+            "application/json": {
+                "schema": {"type": "array", "items": {"$ref": "#/components/schemas/TaskCreate"}}
+            },
+            "application/x-ndjson": {"schema": {"type": "string", "description": "One TaskCreate per line"}},
+        },
+    }
+}
+
+
+def parse_bulk_body(body: bytes, content_type: str) -> list:
+    """Raw task payloads from a JSON array or NDJSON body"""
+    if content_type.startswith("application/x-ndjson"):
+        items = []
+        for line in body.splitlines():
+            if line.strip():
+                try:
+                    items.append(json.loads(line.decode()))
+                except ValueError:
+                    # Not UTF-8 or not JSON: left as a string so it fails
+                    # TaskCreate validation for this item only
+                    items.append(line.decode(errors="replace"))
+        return items
+    try:
+        items = json.loads(body)
+    except ValueError:
+        items = None
+    if not isinstance(items, list):
+        raise HTTPException(status_code=400, detail="Body must be a JSON array of tasks")
+    return items
+
+
+def validate_bulk(items: list) -> Tuple[List[Optional[BulkItemResult]], List[dict], List[int]]:
+    """Per-item results with validation failures filled in, the valid payloads and their positions"""
+    if len(items) > MAX_BULK_SIZE:
+        raise HTTPException(status_code=413, detail=f"At most {MAX_BULK_SIZE} tasks per request")
+    results: List[Optional[BulkItemResult]] = [None] * len(items)
+    valid, positions = [], []
+    for index, item in enumerate(items):
+        try:
+            valid.append(TaskCreate.model_validate(item).model_dump())
+            positions.append(index)
+        except ValidationError as e:
+            results[index] = BulkItemResult(index=index, status=422, detail=jsonable_encoder(e.errors()))
+    return results, valid, positions
+
+
+def bulk_results(results: List[Optional[BulkItemResult]], positions: List[int],
+                 created: list) -> List[BulkItemResult]:
+    """`results` completed with the store's outcome for each valid item"""
+    for index, outcome in zip(positions, created):
+        if isinstance(outcome, StoreError):
+            results[index] = BulkItemResult(index=index, status=outcome.status_code, detail=str(outcome))
+        else:
+            results[index] = BulkItemResult(index=index, status=201, task=outcome)
+    return results
+
+
+def require_admin(x_admin_token: Optional[str] = Header(default=None, description="TODO_ADMIN_TOKEN")):
+    """Dependency of the /admin routes: they only exist when TODO_ADMIN_TOKEN is set, and need it in
+    the X-Admin-Token header"""
+    token = os.getenv("TODO_ADMIN_TOKEN")
+    if not token:
+        raise HTTPException(status_code=404, detail="Not Found")
+    if x_admin_token is None or not secrets.compare_digest(x_admin_token.encode(), token.encode()):
+        raise HTTPException(status_code=403, detail="Invalid admin token")
+
+
+def require_filters(completed: Optional[bool], tags: List[str], list_name: Optional[str], all_tasks: bool):
+    """Refuse a write to every task (DELETE /admin/tasks, PATCH /tasks by filter) without filters unless
+    all=true says that is meant"""
+    if completed is None and not tags and list_name is None and not all_tasks:
+        raise HTTPException(status_code=400, detail="Give a filter, or all=true to change every task")
+
+
+def batch_target(batch: BatchUpdate, count_only: bool) -> dict:
+    """store.update_tasks() arguments selecting the tasks of a PATCH /tasks body.
+
+    A filter may match any number of tasks, but only up to MAX_BULK_SIZE
+    are listed in the response; above that the store refuses (413) unless
+    the response is only the count. An empty filter needs "all": true.
+    """
+    if batch.ids is not None:
+        if len(batch.ids) > MAX_BULK_SIZE:
+            raise HTTPException(status_code=413, detail=f"At most {MAX_BULK_SIZE} ids per request")
+        return {"ids": batch.ids}
+    require_filters(batch.filter.completed, batch.filter.tags, batch.filter.list, batch.filter.all)
+    return {"completed": batch.filter.completed, "tags": batch.filter.tags, "list_name": batch.filter.list,
+            "limit": None if count_only else MAX_BULK_SIZE}
+
+
+def batch_response(store, ids: Optional[List[str]], results: list, count_only: bool) -> Response:
+    """PATCH /tasks body: a result per id (per updated task for a filter), or {"updated": n}"""
+    if count_only:
+        return JSONResponse({"updated": sum(not isinstance(result, StoreError) for result in results)})
+    if ids is None:
+        ids = [task["id"] for task in results]
+    items = []
+    for task_id, result in zip(ids, results):
+        if isinstance(result, StoreError):
+            items.append(json.dumps({"id": task_id, "status": result.status_code, "detail": str(result)}).encode())
+        else:
+            items.append(b'{"id": %s, "status": 200, "task": %s}' % (json.dumps(task_id).encode(), store.task_json(result)))
+    return Response(b"[" + b",".join(items) + b"]", media_type="application/json")
+
+
+LIST_LIST = TypeAdapter(List[ListOut])
+LIST_COUNT_LIST = TypeAdapter(List[ListCountOut])
+
+
+def lists_body(lists: Union[List[str], Dict[str, int]]) -> bytes:
+    """GET /lists body from list names, or from a name -> task count mapping"""
+    if isinstance(lists, dict):
+        return LIST_COUNT_LIST.dump_json([ListCountOut(name=name, count=count) for name, count in lists.items()])
+    return LIST_LIST.dump_json([ListOut(name=name) for name in lists])
+
+
+def cached_response(request: Request, entry: CacheEntry) -> Response:
+    """The cached body, or 304 Not Modified if the client already has it"""
+    headers = {**entry.headers, "ETag": entry.etag, "Cache-Control": "no-cache"}
+    if etag_matches(request.headers.get("if-none-match"), entry.etag):
+        return Response(status_code=304, headers=headers)
+    return Response(entry.body, media_type="application/json", headers=headers)
+
+
+def task_response(store, task: dict, status_code: int = 200) -> Response:
+    return Response(store.task_json(task), status_code=status_code, media_type="application/json")
+
+
+def tasks_cache_key(filters: dict, limit: Optional[int]) -> tuple:
+    """Cache key of a GET /tasks page; tags are matched as a set, so "b, a" and "a,b" share one"""
+    return ("tasks", filters["completed"], tuple(sorted(set(filters["tags"]))), filters["list_name"],
+            filters["due_after"], filters["due_before"], filters["sort"], filters["after"], limit)
+
+
+def search_cache_key(q: str, completed: Optional[bool], tags: List[str], list_name: Optional[str],
+                     limit: int) -> tuple:
+    """Cache key of a GET /tasks/search; queries with the same words share one"""
+    return ("search", tuple(tokenize(q)), completed, tuple(sorted(set(tags))), list_name, limit)
+
+
+def page_body(store, tasks: List[dict], limit: Optional[int], sort: str) -> Tuple[bytes, dict]:
+    """Body and headers of a GET /tasks page fetched with limit + 1 tasks.
+
+    The extra task only signals that another page follows, so it is dropped
+    and the cursor points at the last task kept.
+    """
+    headers = {}
+    if limit and len(tasks) > limit:
+        tasks = tasks[:limit]
+        headers["X-Next-Cursor"] = encode_cursor(tasks[-1], sort)
+    return task_list_body(store, tasks), headers
+
+
+def task_list_body(store, tasks: Iterable[dict]) -> bytes:
+    """JSON array joined from each task's serialized bytes"""
+    return b"[" + b",".join(map(store.task_json, tasks)) + b"]"
+
+
+def delta_response(store, delta: Delta) -> Response:
+    """GET /tasks?since= body, with the tasks joined from their serialized bytes"""
+    head = json.dumps({"version": delta.version, "more": delta.more, "deleted": delta.deleted,
+                       "lists": delta.lists, "deleted_lists": delta.deleted_lists})
+    body = head[:-1].encode() + b', "tasks": ' + task_list_body(store, delta.tasks) + b"}"
+    return Response(body, media_type="application/json")
+
+
+def ndjson_lines(store, tasks: Iterable[dict]):
+    """Serialize tasks one line at a time so a stream never holds the full result"""
+    for task in tasks:
+        yield store.task_json(task) + b"\n"
+
+
+def occurrence_lines(occurrences: Iterable[tuple]):
+    """NDJSON lines of (time, task) pairs from occurrences.expand"""
+    for time, task in occurrences:
+        occurrence = Occurrence(task_id=task["id"], title=task["title"], list=task["list"],
+                                completed=task["completed"], occurs_at=time)
+        yield OCCURRENCE.dump_json(occurrence) + b"\n"
+
+
+# Stop proxies from buffering or caching the stream
+EVENT_STREAM_HEADERS = {"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+
+
+def change_event(store, feed: ChangeFeed, change: Change) -> bytes:
+    """A change as a server-sent event: the task's JSON, its id for a deletion, a list's name, or {}"""
+    if change.kind in (LIST_CREATED, LIST_DELETED):
+        data = json.dumps({"name": change.name}).encode()
+    elif change.kind == TASK_DELETED:
+        data = json.dumps({"id": change.task["id"]}).encode()
+    elif change.task is not None:
+        data = store.task_json(change.task)
+    else:
+        data = b"{}"
+    return b"id: %s\nevent: %s\ndata: %s\n\n" % (feed.event_id(change.seq).encode(), change.kind.encode(), data)
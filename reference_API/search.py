@@ -0,0 +1,132 @@
+"""Full-text search over task titles and descriptions for the in-memory store.
+
+Text is split into lowercase words with accents stripped, the same folding
+SQLite's FTS5 unicode61 tokenizer applies, so both backends match the same
+tasks. Every word of a query must occur in a task's title or description;
+the last word also matches as a prefix ("pla" finds "plan" and "plant"), so
+results update as the user types. Matches are ranked by BM25, with title
+words counting twice.
+
+The inverted index maps each word to the tasks containing it and how often,
+and keeps its words sorted so a prefix expands with a bisect. The store adds
+and removes tasks as they change, so it never needs rebuilding.
+"""
+import heapq
+import math
+import re
+import unicodedata
+from bisect import bisect_left, insort
+from collections import Counter
+from typing import Callable, Dict, List, Optional, Set
+
+from .records import TaskRecord
+
+WORD = re.compile(r"[^\W_]+")
+
+TITLE_WEIGHT = 2
+# BM25 term-frequency saturation and length normalization
+K1 = 1.2
+B = 0.75
+
+
+def tokenize(text: Optional[str]) -> List[str]:
+    """Lowercase, accent-free words of `text`"""
+    if not text:
+        return []
+    text = text.lower()
+    if not text.isascii():
+        text = "".join(c for c in unicodedata.normalize("NFKD", text) if not unicodedata.combining(c))
+    return WORD.findall(text)
+
+
+def _term_counts(task: TaskRecord) -> Counter:
+    counts = Counter(tokenize(task.description))
+    for word in tokenize(task.title):
+        counts[word] += TITLE_WEIGHT
+    return counts
+
+
+class SearchIndex:
+    def __init__(self):
+        # word -> {task uid: weighted occurrences}
+        self._postings: Dict[str, Dict[bytes, int]] = {}
+        self._words: List[str] = []
+        self._lengths: Dict[bytes, int] = {}
+        self._total_length = 0
+
+    def add(self, task: TaskRecord):
+        counts = _term_counts(task)
+        for word, count in counts.items():
+            postings = self._postings.get(word)
+            if postings is None:
+                postings = self._postings[word] = {}
+                insort(self._words, word)
+            postings[task.uid] = count
+        length = sum(counts.values())
+        self._lengths[task.uid] = length
+        self._total_length += length
+
+    def remove(self, task: TaskRecord):
+        for word in _term_counts(task):
+            postings = self._postings[word]
+            del postings[task.uid]
+            if not postings:
+                del self._postings[word]
+                del self._words[bisect_left(self._words, word)]
+        self._total_length -= self._lengths.pop(task.uid)
+
+    def _matches(self, word: str, prefix: bool) -> Dict[bytes, int]:
+        """Occurrences per task of `word`, or of every indexed word starting with it"""
+        if not prefix:
+            return self._postings.get(word, {})
+        start = bisect_left(self._words, word)
+        end = start
+        while end < len(self._words) and self._words[end].startswith(word):
+            end += 1
+        if end - start == 1:
+            return self._postings[self._words[start]]
+        merged: Dict[bytes, int] = {}
+        for expansion in self._words[start:end]:
+            for uid, count in self._postings[expansion].items():
+                merged[uid] = merged.get(uid, 0) + count
+        return merged
+
+    def search(self, words: List[str], candidates: Optional[Set[bytes]], limit: int,
+               tiebreak: Callable[[bytes], tuple]) -> List[bytes]:
+        """Ids of the `limit` best matches for `words` among `candidates` (all if None), best first.
+
+        Equal scores are ordered by `tiebreak(uid)`.
+        """
+        matches = [self._matches(word, i == len(words) - 1) for i, word in enumerate(words)]
+        if not all(matches) or candidates is not None and not candidates:
+            return []
+        matches.sort(key=len)
+        ids = matches[0].keys() & candidates if candidates is not None else set(matches[0])
+        for postings in matches[1:]:
+            ids = ids & postings.keys()
+        count = len(self._lengths)
+        average = self._total_length / count
+        weights = [math.log((count - len(postings) + 0.5) / (len(postings) + 0.5) + 1) for postings in matches]
+        lengths = self._lengths
+        # A score depends only on the task's length and its occurrence
+        # counts, which take few distinct values, so each is computed once
+        memo: Dict[tuple, float] = {}
+        scores: Dict[bytes, float] = {}
+        for uid in ids:
+            key = (lengths[uid], *(postings[uid] for postings in matches))
+            score = memo.get(key)
+            if score is None:
+                norm = K1 * (1 - B + B * key[0] / average)
+                score = memo[key] = sum(
+                    weight * occurrences * (K1 + 1) / (occurrences + norm)
+                    for weight, occurrences in zip(weights, key[1:])
+                )
+            scores[uid] = score
+        if not scores:
+            return []
+        # Only tasks tied with the last score that makes the cut need the tiebreak
+        cutoff = heapq.nlargest(limit, scores.values())[-1]
+        above = sorted((uid for uid, score in scores.items() if score > cutoff),
+                       key=lambda uid: (-scores[uid], tiebreak(uid)))
+        tied = (uid for uid, score in scores.items() if score == cutoff)
+        return above + heapq.nsmallest(limit - len(above), tied, key=tiebreak)
@@ -0,0 +1,695 @@
+"""SQLite task storage for the To-Do API.
+
+The database runs in WAL mode so readers never block behind the writer.
+Each thread gets its own connection (FastAPI runs sync handlers on a
+threadpool) and every statement is a fixed SQL string, so sqlite3's
+per-connection statement cache keeps them prepared. Tags live in a
+normalized `task_tags` table whose index serves tag filters. Due dates are
+also stored as an integer `due_key` (see records.due_key) so that range
+filters and due-date ordering are index scans even across time zones.
+Triggers keep a per-list `task_count`, so list deletion checks and list
+counts never scan tasks, and an FTS5 index of titles and descriptions in
+step with the tasks for search().
+
+Several processes (e.g. `uvicorn --workers N`) can share one database file.
+Every check a write depends on runs inside its BEGIN IMMEDIATE transaction,
+so the list rules hold across processes, and each write also bumps a commit
+counter in the `meta` table, which lets a process notice commits made by
+the others (see poll_changes).
+
+The commit counter doubles as the version for changes_since(): each write
+stamps the rows it touches with the number its commit will get, triggers
+record a tombstone for every deleted task and list, and both are indexed by
+version.
+"""
+import json
+import sqlite3
+import threading
+from datetime import date, datetime
+from functools import partial
+from typing import Callable, Dict, Iterable, Iterator, List, Optional, Tuple, Union
+
+from .records import UNDATED, due_key
+from .search import tokenize
+from .store import (
+    DEFAULT_LISTS, PROTECTED_LIST, SCAN_CHUNK, TOMBSTONE_LIMIT, BaseStore, Delta, DueRange, ExpiredError,
+    NotFoundError, SortKey, StoreError, TooLargeError, apply_update, due_range, new_task,
+)
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS lists (
+    id INTEGER PRIMARY KEY,
+    name TEXT NOT NULL UNIQUE,
+    task_count INTEGER NOT NULL DEFAULT 0,
+    version INTEGER NOT NULL DEFAULT 0
+);
+CREATE TABLE IF NOT EXISTS tasks (
+    id TEXT PRIMARY KEY,
+    title TEXT NOT NULL,
+    description TEXT,
+    completed INTEGER NOT NULL DEFAULT 0,
+    due_date TEXT,
+    recurrence TEXT,
+    recurrence_end_date TEXT,
+    created_at TEXT NOT NULL,
+    list TEXT NOT NULL DEFAULT 'Personal' REFERENCES lists(name),
+    due_key INTEGER NOT NULL DEFAULT 9223372036854775807,
+    version INTEGER NOT NULL DEFAULT 0
+);
+CREATE TABLE IF NOT EXISTS task_tags (
+    task_id TEXT NOT NULL REFERENCES tasks(id) ON DELETE CASCADE,
+    position INTEGER NOT NULL,
+    tag TEXT NOT NULL,
+    PRIMARY KEY (task_id, position)
+) WITHOUT ROWID;
+CREATE INDEX IF NOT EXISTS idx_task_tags_tag ON task_tags(tag, task_id);
+CREATE INDEX IF NOT EXISTS idx_tasks_order ON tasks(created_at, id);
+CREATE INDEX IF NOT EXISTS idx_tasks_list ON tasks(list, created_at, id);
+CREATE INDEX IF NOT EXISTS idx_tasks_completed ON tasks(completed, created_at, id);
+CREATE TABLE IF NOT EXISTS meta (
+    id INTEGER PRIMARY KEY CHECK (id = 1),
+    commits INTEGER NOT NULL,
+    horizon INTEGER NOT NULL DEFAULT 0,
+    tombstones INTEGER NOT NULL DEFAULT 0
+);
+INSERT OR IGNORE INTO meta (id, commits) VALUES (1, 0);
+CREATE TABLE IF NOT EXISTS tombstones (
+    kind TEXT NOT NULL,
+    id TEXT NOT NULL,
+    version INTEGER NOT NULL,
+    PRIMARY KEY (kind, id)
+) WITHOUT ROWID;
+CREATE INDEX IF NOT EXISTS idx_tombstones_version ON tombstones(version);
+"""
+
+# The version the current write transaction will commit as (see BUMP_COMMITS)
+NEXT_VERSION = "(SELECT commits + 1 FROM meta)"
+
+# Indexes and triggers on columns that databases from older releases lack until _migrate()
+DERIVED_SCHEMA = """
+CREATE INDEX IF NOT EXISTS idx_tasks_due ON tasks(due_key, created_at, id);
+CREATE INDEX IF NOT EXISTS idx_tasks_recurring ON tasks(due_key, created_at, id) WHERE recurrence IS NOT NULL;
+CREATE TRIGGER IF NOT EXISTS tasks_count_insert AFTER INSERT ON tasks BEGIN
+    UPDATE lists SET task_count = task_count + 1 WHERE name = NEW.list;
+END;
+CREATE TRIGGER IF NOT EXISTS tasks_count_delete AFTER DELETE ON tasks BEGIN
+    UPDATE lists SET task_count = task_count - 1 WHERE name = OLD.list;
+END;
+CREATE TRIGGER IF NOT EXISTS tasks_count_move AFTER UPDATE OF list ON tasks
+WHEN OLD.list != NEW.list BEGIN
+    UPDATE lists SET task_count = task_count - 1 WHERE name = OLD.list;
+    UPDATE lists SET task_count = task_count + 1 WHERE name = NEW.list;
+END;
+CREATE TRIGGER IF NOT EXISTS tasks_fts_insert AFTER INSERT ON tasks BEGIN
+    INSERT INTO tasks_fts (rowid, title, description) VALUES (NEW.rowid, NEW.title, NEW.description);
+END;
+CREATE TRIGGER IF NOT EXISTS tasks_fts_delete AFTER DELETE ON tasks BEGIN
+    INSERT INTO tasks_fts (tasks_fts, rowid, title, description)
+    VALUES ('delete', OLD.rowid, OLD.title, OLD.description);
+END;
+CREATE TRIGGER IF NOT EXISTS tasks_fts_update AFTER UPDATE OF title, description ON tasks
+WHEN OLD.title != NEW.title OR OLD.description IS NOT NEW.description BEGIN
+    INSERT INTO tasks_fts (tasks_fts, rowid, title, description)
+    VALUES ('delete', OLD.rowid, OLD.title, OLD.description);
+    INSERT INTO tasks_fts (rowid, title, description) VALUES (NEW.rowid, NEW.title, NEW.description);
+END;
+CREATE INDEX IF NOT EXISTS idx_tasks_version ON tasks(version);
+CREATE INDEX IF NOT EXISTS idx_lists_version ON lists(version);
+CREATE TRIGGER IF NOT EXISTS tasks_tombstone AFTER DELETE ON tasks BEGIN
+    INSERT INTO tombstones (kind, id, version) VALUES ('task', OLD.id, (SELECT commits + 1 FROM meta));
+END;
+CREATE TRIGGER IF NOT EXISTS lists_tombstone AFTER DELETE ON lists BEGIN
+    INSERT INTO tombstones (kind, id, version) VALUES ('list', OLD.name, (SELECT commits + 1 FROM meta));
+END;
+CREATE TRIGGER IF NOT EXISTS lists_revive AFTER INSERT ON lists BEGIN
+    DELETE FROM tombstones WHERE kind = 'list' AND id = NEW.name;
+END;
+CREATE TRIGGER IF NOT EXISTS tombstones_count_insert AFTER INSERT ON tombstones BEGIN
+    UPDATE meta SET tombstones = tombstones + 1;
+END;
+CREATE TRIGGER IF NOT EXISTS tombstones_count_delete AFTER DELETE ON tombstones BEGIN
+    UPDATE meta SET tombstones = tombstones - 1;
+END;
+"""
+
+# External-content FTS5 index over tasks; unicode61 folds case and accents like search.tokenize
+CREATE_FTS = (
+    "CREATE VIRTUAL TABLE tasks_fts USING fts5(title, description, content='tasks', "
+    "content_rowid='rowid', tokenize='unicode61 remove_diacritics 2')"
+)
+# bm25() weights per column, matching search.TITLE_WEIGHT
+SEARCH_RANK = "bm25(tasks_fts, 2.0, 1.0)"
+
+# Columns of each listing order, matching TaskRecord.key and TaskRecord.due_sort_key
+ORDER_COLUMNS = {"created_at": "created_at, id", "due_date": "due_key, created_at, id"}
+
+# Statement cache size per connection; all SQL below is built from a small,
+# fixed set of fragments so it fits comfortably.
+STATEMENT_CACHE_SIZE = 256
+
+TASK_COLUMNS = (
+    "id, title, description, completed, due_date, recurrence, "
+    "recurrence_end_date, created_at, list, due_key"
+)
+SELECT_TASK = (
+    f"SELECT {TASK_COLUMNS}, "
+    "(SELECT json_group_array(tag) FROM "
+    "(SELECT tag FROM task_tags WHERE task_id = tasks.id ORDER BY position)) AS tags "
+    "FROM tasks"
+)
+INSERT_TASK = (
+    "INSERT INTO tasks (title, description, completed, due_date, recurrence, "
+    f"recurrence_end_date, list, due_key, id, created_at, version) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, {NEXT_VERSION})"
+)
+UPDATE_TASK = (
+    "UPDATE tasks SET title = ?, description = ?, completed = ?, due_date = ?, "
+    f"recurrence = ?, recurrence_end_date = ?, list = ?, due_key = ?, version = {NEXT_VERSION} WHERE id = ?"
+)
+INSERT_LIST = f"INSERT INTO lists (name, version) VALUES (?, {NEXT_VERSION})"
+# Versions of the task changes after a version, for paging changes_since()
+TASK_CHANGE_VERSIONS = (
+    "SELECT version FROM tasks WHERE version > ? UNION ALL "
+    "SELECT version FROM tombstones WHERE kind = 'task' AND version > ? ORDER BY version"
+)
+INSERT_TAG = "INSERT INTO task_tags (task_id, position, tag) VALUES (?, ?, ?)"
+BUMP_COMMITS = "UPDATE meta SET commits = commits + 1 RETURNING commits"
+
+
+def _to_text(value) -> Optional[str]:
+    if value is None:
+        return None
+    if isinstance(value, datetime):
+        return value.isoformat(timespec="microseconds")
+    if isinstance(value, date):
+        return value.isoformat()
+    return str(value.value if hasattr(value, "value") else value)
+
+
+def _row_to_task(row: sqlite3.Row) -> dict:
+    return {
+        "id": row["id"],
+        "title": row["title"],
+        "description": row["description"],
+        "tags": json.loads(row["tags"]),
+        "completed": bool(row["completed"]),
+        "due_date": datetime.fromisoformat(row["due_date"]) if row["due_date"] else None,
+        "recurrence": row["recurrence"],
+        "recurrence_end_date": (
+            date.fromisoformat(row["recurrence_end_date"]) if row["recurrence_end_date"] else None
+        ),
+        "list": row["list"],
+        "created_at": datetime.fromisoformat(row["created_at"]),
+    }
+
+
+def _filter_clauses(completed: Optional[bool], tags: Iterable[str], list_name: Optional[str],
+                    due: Optional[DueRange] = None, recurring: bool = False) -> Tuple[List[str], list]:
+    """WHERE clauses and parameters for the GET /tasks filters"""
+    # Spelled as in idx_tasks_recurring, so the planner can use that partial index
+    clauses, params = ["recurrence IS NOT NULL"] if recurring else [], []
+    if due is not None:
+        clauses.append("due_key >= ? AND due_key < ?")
+        params.extend(due)
+    if list_name is not None:
+        clauses.append("list = ?")
+        params.append(list_name)
+    if completed is not None:
+        clauses.append("completed = ?")
+        params.append(int(completed))
+    tags = list(tags)
+    if tags:
+        # One JSON parameter keeps the SQL text constant for any number of tags
+        clauses.append(
+            "id IN (SELECT task_id FROM task_tags WHERE tag IN (SELECT value FROM json_each(?)))"
+        )
+        params.append(json.dumps(tags))
+    return clauses, params
+
+
+def _task_params(task: dict) -> tuple:
+    return (
+        task["title"], task["description"], int(task["completed"]), _to_text(task["due_date"]),
+        _to_text(task["recurrence"]), _to_text(task["recurrence_end_date"]), task["list"],
+        due_key(task["due_date"]),
+    )
+
+
+class SQLiteTaskStore(BaseStore):
+    def __init__(self, path: str, tombstone_limit: int = TOMBSTONE_LIMIT):
+        super().__init__()
+        self.path = path
+        self.tombstone_limit = tombstone_limit
+        self._local = threading.local()
+        self._connections: List[sqlite3.Connection] = []
+        self._connections_lock = threading.Lock()
+        # The last value of the commit counter this process has accounted for,
+        # and how many commits before it came from other processes and have
+        # not been reported by poll_changes() yet. Own commits settle the
+        # values up to theirs as they happen, so this stays two integers
+        # however long the process writes without polling
+        self._commits_lock = threading.Lock()
+        self._seen_commits = 0
+        self._external_commits = 0
+        # Held through each write transaction of this process, so listeners
+        # hear about the writes in the order they commit
+        self._writer = threading.Lock()
+        self._notifications: List[Callable[[], None]] = []
+        # executescript() commits as it goes, so SCHEMA and DERIVED_SCHEMA only
+        # hold idempotent statements; the migration's check-then-alter runs in
+        # one transaction, so workers starting together apply it once
+        self._conn().executescript(SCHEMA)
+        with self._write() as conn:
+            self._migrate(conn)
+            conn.executemany(
+                f"INSERT OR IGNORE INTO lists (name, version) VALUES (?, {NEXT_VERSION})",
+                [(name,) for name in DEFAULT_LISTS],
+            )
+        self._conn().executescript(DERIVED_SCHEMA)
+        self._seen_commits = self._commits()
+
+    # --- CONNECTIONS ---
+
+    def _conn(self) -> sqlite3.Connection:
+        """This thread's connection, opened on first use"""
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(
+                self.path,
+                isolation_level=None,
+                cached_statements=STATEMENT_CACHE_SIZE,
+                check_same_thread=False,
+            )
+            conn.row_factory = sqlite3.Row
+            # First, so that switching a new database to WAL waits out other workers doing the same
+            conn.execute("PRAGMA busy_timeout=5000")
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            conn.execute("PRAGMA foreign_keys=ON")
+            self._local.conn = conn
+            with self._connections_lock:
+                self._connections.append(conn)
+        return conn
+
+    def _migrate(self, conn: sqlite3.Connection):
+        """Add the columns introduced since a database was created (inside the caller's transaction)"""
+        list_columns = {row["name"] for row in conn.execute("PRAGMA table_info(lists)")}
+        if "task_count" not in list_columns:
+            conn.execute("ALTER TABLE lists ADD COLUMN task_count INTEGER NOT NULL DEFAULT 0")
+            conn.execute("UPDATE lists SET task_count = (SELECT COUNT(*) FROM tasks WHERE list = lists.name)")
+        columns = {row["name"] for row in conn.execute("PRAGMA table_info(tasks)")}
+        if "due_key" not in columns:
+            conn.execute(f"ALTER TABLE tasks ADD COLUMN due_key INTEGER NOT NULL DEFAULT {UNDATED}")
+            rows = conn.execute("SELECT id, due_date FROM tasks WHERE due_date IS NOT NULL").fetchall()
+            conn.executemany(
+                "UPDATE tasks SET due_key = ? WHERE id = ?",
+                [(due_key(datetime.fromisoformat(row["due_date"])), row["id"]) for row in rows],
+            )
+        for table in ("tasks", "lists"):
+            if "version" not in {row["name"] for row in conn.execute(f"PRAGMA table_info({table})")}:
+                conn.execute(f"ALTER TABLE {table} ADD COLUMN version INTEGER NOT NULL DEFAULT 0")
+                conn.execute(f"UPDATE {table} SET version = {NEXT_VERSION}")
+        meta_columns = {row["name"] for row in conn.execute("PRAGMA table_info(meta)")}
+        for column in ("horizon", "tombstones"):
+            if column not in meta_columns:
+                conn.execute(f"ALTER TABLE meta ADD COLUMN {column} INTEGER NOT NULL DEFAULT 0")
+        if conn.execute("SELECT 1 FROM sqlite_master WHERE name = 'tasks_fts'").fetchone() is None:
+            conn.execute(CREATE_FTS)
+            conn.execute("INSERT INTO tasks_fts (tasks_fts) VALUES ('rebuild')")
+
+    def _write(self):
+        return _WriteTransaction(self._conn(), self._writer, self._notifications, self._committed)
+
+    def _after_commit(self, notify: Callable, *args):
+        """Call `notify(*args)` once the current write transaction commits (never if it rolls back)"""
+        self._notifications.append(partial(notify, *args))
+
+    def close(self):
+        with self._connections_lock:
+            for conn in self._connections:
+                conn.close()
+            self._connections.clear()
+        self._local = threading.local()
+
+    # --- CHANGES FROM OTHER PROCESSES ---
+
+    def _commits(self) -> int:
+        return self._conn().execute("SELECT commits FROM meta").fetchone()[0]
+
+    def _committed(self, commit: int):
+        # Called in commit order under the writer lock, so the values skipped
+        # since the last one accounted for were committed by other processes
+        with self._commits_lock:
+            if commit > self._seen_commits:
+                self._external_commits += commit - self._seen_commits - 1
+                self._seen_commits = commit
+
+    def poll_changes(self):
+        """Tell the listeners about writes other processes committed since the last poll.
+
+        Their changes are not known in detail, so they are reported as one
+        bulk change. Costs a single-row read, so handlers call it before
+        serving anything from a cache.
+        """
+        commits = self._commits()
+        with self._commits_lock:
+            external = self._external_commits + max(commits - self._seen_commits, 0)
+            self._external_commits = 0
+            self._seen_commits = max(commits, self._seen_commits)
+        if external:
+            self._bulk_changed()
+
+    # --- TASKS ---
+
+    def _require_list(self, conn: sqlite3.Connection, name: str):
+        if conn.execute("SELECT 1 FROM lists WHERE name = ?", (name,)).fetchone() is None:
+            raise StoreError(f"List '{name}' does not exist")
+
+    def _insert_tags(self, conn: sqlite3.Connection, task: dict):
+        conn.executemany(
+            INSERT_TAG, [(task["id"], position, tag) for position, tag in enumerate(task["tags"])]
+        )
+
+    def create_task(self, data: dict) -> dict:
+        task = new_task(data)
+        with self._write() as conn:
+            self._require_list(conn, task["list"])
+            conn.execute(INSERT_TASK, _task_params(task) + (task["id"], _to_text(task["created_at"])))
+            self._insert_tags(conn, task)
+            self._after_commit(self._task_changed, None, task)
+        return task
+
+    def create_tasks(self, items: List[dict]) -> List[Union[dict, StoreError]]:
+        """Create many tasks in one transaction, checking each target list once"""
+        tasks = [new_task(data) for data in items]
+        with self._write() as conn:
+            names = json.dumps(sorted({task["list"] for task in tasks}))
+            known = {
+                row["name"] for row in
+                conn.execute("SELECT name FROM lists WHERE name IN (SELECT value FROM json_each(?))", (names,))
+            }
+            created = [task for task in tasks if task["list"] in known]
+            conn.executemany(
+                INSERT_TASK,
+                [_task_params(task) + (task["id"], _to_text(task["created_at"])) for task in created],
+            )
+            conn.executemany(
+                INSERT_TAG,
+                [(task["id"], position, tag) for task in created for position, tag in enumerate(task["tags"])],
+            )
+            for task in created:
+                self._after_commit(self._task_changed, None, task)
+        return [
+            task if task["list"] in known else StoreError(f"List '{task['list']}' does not exist")
+            for task in tasks
+        ]
+
+    def _fetch_task(self, conn: sqlite3.Connection, task_id: str) -> dict:
+        row = conn.execute(f"{SELECT_TASK} WHERE id = ?", (task_id,)).fetchone()
+        if row is None:
+            raise NotFoundError(f"Task '{task_id}' not found")
+        return _row_to_task(row)
+
+    def get_task(self, task_id: str) -> dict:
+        return self._fetch_task(self._conn(), task_id)
+
+    def update_task(self, task_id: str, changes: dict) -> dict:
+        with self._write() as conn:
+            old = self._fetch_task(conn, task_id)
+            task = apply_update(old, changes)
+            if task["list"] != old["list"]:
+                self._require_list(conn, task["list"])
+            conn.execute(UPDATE_TASK, _task_params(task) + (task_id,))
+            if task["tags"] != old["tags"]:
+                conn.execute("DELETE FROM task_tags WHERE task_id = ?", (task_id,))
+                self._insert_tags(conn, task)
+            self._after_commit(self._task_changed, old, task)
+        return task
+
+    def update_tasks(
+        self,
+        changes: dict,
+        ids: Optional[List[str]] = None,
+        completed: Optional[bool] = None,
+        tags: Iterable[str] = (),
+        list_name: Optional[str] = None,
+        limit: Optional[int] = None,
+    ) -> List[Union[dict, StoreError]]:
+        """As TaskStore.update_tasks, in one transaction"""
+        with self._write() as conn:
+            if changes.get("list") is not None:
+                self._require_list(conn, changes["list"])
+            if ids is None:
+                clauses, params = _filter_clauses(completed, tags, list_name)
+                where = " AND ".join(clauses) or "1"
+                # One row past the limit is enough to refuse
+                cap = "" if limit is None else f" LIMIT {limit + 1}"
+                rows = conn.execute(f"{SELECT_TASK} WHERE {where} ORDER BY created_at, id{cap}", params)
+            else:
+                rows = conn.execute(f"{SELECT_TASK} WHERE id IN (SELECT value FROM json_each(?))", (json.dumps(ids),))
+            old = {row["id"]: _row_to_task(row) for row in rows}
+            if ids is None and limit is not None and len(old) > limit:
+                raise TooLargeError(f"More than {limit} tasks match")
+            updated = {task_id: apply_update(task, changes) for task_id, task in old.items()}
+            conn.executemany(UPDATE_TASK, [_task_params(task) + (task_id,) for task_id, task in updated.items()])
+            retagged = [task for task_id, task in updated.items() if task["tags"] != old[task_id]["tags"]]
+            conn.executemany("DELETE FROM task_tags WHERE task_id = ?", [(task["id"],) for task in retagged])
+            conn.executemany(
+                INSERT_TAG,
+                [(task["id"], position, tag) for task in retagged for position, tag in enumerate(task["tags"])],
+            )
+            for task_id, task in updated.items():
+                self._after_commit(self._task_changed, old[task_id], task)
+        if ids is None:
+            return list(updated.values())
+        return [updated.get(task_id) or NotFoundError(f"Task '{task_id}' not found") for task_id in ids]
+
+    def delete_task(self, task_id: str):
+        with self._write() as conn:
+            task = self._fetch_task(conn, task_id)
+            conn.execute("DELETE FROM tasks WHERE id = ?", (task_id,))
+            self._compact(conn)
+            self._after_commit(self._task_changed, task, None)
+
+    def query(
+        self,
+        completed: Optional[bool] = None,
+        tags: Iterable[str] = (),
+        list_name: Optional[str] = None,
+        due_after: Optional[datetime] = None,
+        due_before: Optional[datetime] = None,
+        sort: str = "created_at",
+        after: Optional[SortKey] = None,
+        limit: Optional[int] = None,
+        recurring: bool = False,
+    ) -> Iterator[dict]:
+        """Tasks matching every given filter, in `sort` order (see TaskStore.query).
+
+        Results are fetched in keyset-paginated chunks, each on the calling
+        thread's connection, so a streamed response can be consumed across
+        threadpool workers.
+        """
+        due = None if due_after is None and due_before is None else due_range(due_after, due_before)
+        clauses, params = _filter_clauses(completed, tags, list_name, due, recurring)
+        return self._paginate(clauses, params, sort, after, limit)
+
+    def search(
+        self,
+        q: str,
+        completed: Optional[bool] = None,
+        tags: Iterable[str] = (),
+        list_name: Optional[str] = None,
+        limit: int = 20,
+    ) -> List[dict]:
+        """The `limit` tasks best matching the words of `q`, filtered as in query (see TaskStore.search)"""
+        words = tokenize(q)
+        if not words:
+            raise StoreError("Search query has no words")
+        # Words are letters and digits only, so quoting them is enough to keep FTS5 syntax out
+        match = " ".join(f'"{word}"' for word in words) + "*"
+        clauses, params = _filter_clauses(completed, tags, list_name)
+        where = " AND ".join(clauses) or "1"
+        sql = (
+            f"WITH hits AS (SELECT rowid AS hit, {SEARCH_RANK} AS rank FROM tasks_fts WHERE tasks_fts MATCH ?) "
+            f"{SELECT_TASK} JOIN hits ON hits.hit = tasks.rowid WHERE {where} ORDER BY rank, created_at, id LIMIT ?"
+        )
+        return [_row_to_task(row) for row in self._conn().execute(sql, (match, *params, limit))]
+
+    def delete_tasks(
+        self,
+        completed: Optional[bool] = None,
+        tags: Iterable[str] = (),
+        list_name: Optional[str] = None,
+    ) -> int:
+        """Delete every task matching the filters (as in query) in one statement"""
+        clauses, params = _filter_clauses(completed, tags, list_name)
+        where = " AND ".join(clauses) or "1"
+        with self._write() as conn:
+            count = conn.execute(f"DELETE FROM tasks WHERE {where}", params).rowcount
+            self._compact(conn)
+            self._after_commit(self._bulk_changed)
+        return count
+
+    def reset(self):
+        """Delete all tasks and restore the default lists"""
+        with self._write() as conn:
+            conn.execute("DELETE FROM task_tags")
+            conn.execute("DELETE FROM tasks")
+            conn.execute("DELETE FROM lists")
+            # Clients that synced before the reset have to reload
+            conn.execute("DELETE FROM tombstones")
+            conn.execute(f"UPDATE meta SET horizon = {NEXT_VERSION}")
+            conn.executemany(INSERT_LIST, [(name,) for name in DEFAULT_LISTS])
+            self._after_commit(self._bulk_changed)
+
+    # --- VERSIONS ---
+
+    def _compact(self, conn: sqlite3.Connection):
+        """Drop the oldest half of the tombstones once there are more than tombstone_limit"""
+        if conn.execute("SELECT tombstones FROM meta").fetchone()[0] <= self.tombstone_limit:
+            return
+        cut = conn.execute(
+            "SELECT version FROM tombstones ORDER BY version DESC LIMIT 1 OFFSET ?", (self.tombstone_limit // 2,)
+        ).fetchone()[0]
+        conn.execute("DELETE FROM tombstones WHERE version <= ?", (cut,))
+        conn.execute("UPDATE meta SET horizon = max(horizon, ?)", (cut,))
+
+    def changes_since(self, since: int, limit: Optional[int] = None) -> Delta:
+        """As TaskStore.changes_since, read in one transaction so the parts agree"""
+        conn = self._conn()
+        conn.execute("BEGIN")
+        try:
+            version, horizon = conn.execute("SELECT commits, horizon FROM meta").fetchone()
+            if since and not horizon <= since <= version:
+                raise ExpiredError(f"Changes since version {since} are no longer known; reload all tasks")
+            more = False
+            if limit is not None:
+                row = conn.execute(f"{TASK_CHANGE_VERSIONS} LIMIT 1 OFFSET ?", (since, since, limit - 1)).fetchone()
+                if row is not None and conn.execute(
+                        f"{TASK_CHANGE_VERSIONS} LIMIT 1", (row[0], row[0])).fetchone() is not None:
+                    version, more = row[0], True
+            window = (since, version)
+            tasks = [
+                _row_to_task(row) for row in
+                conn.execute(f"{SELECT_TASK} WHERE version > ? AND version <= ? ORDER BY version", window)
+            ]
+            deleted, deleted_lists = [], []
+            for row in conn.execute(
+                    "SELECT kind, id FROM tombstones WHERE version > ? AND version <= ? ORDER BY version", window):
+                (deleted if row["kind"] == "task" else deleted_lists).append(row["id"])
+            lists = [row["name"] for row in conn.execute(
+                "SELECT name FROM lists WHERE version > ? AND version <= ? ORDER BY version", window)]
+        finally:
+            conn.execute("COMMIT")
+        return Delta(version, more, tasks, deleted, lists, deleted_lists)
+
+    def _paginate(self, clauses: List[str], params: list, sort: str, after: Optional[SortKey],
+                  limit: Optional[int]) -> Iterator[dict]:
+        by_due = sort == "due_date"
+        order = ORDER_COLUMNS[sort if by_due else "created_at"]
+        placeholders = "?, ?, ?" if by_due else "?, ?"
+        where = " AND ".join(clauses + [f"({order}) > ({placeholders})"])
+        sql = f"{SELECT_TASK} WHERE {where} ORDER BY {order} LIMIT ?"
+        if after is None:
+            last = (-UNDATED, "", "") if by_due else ("", "")
+        elif by_due:
+            last = (due_key(after[0]), _to_text(after[1]), after[2])
+        else:
+            last = (_to_text(after[0]), after[1])
+        remaining = limit
+        while remaining is None or remaining > 0:
+            step = SCAN_CHUNK if remaining is None else min(SCAN_CHUNK, remaining)
+            rows = self._conn().execute(sql, (*params, *last, step)).fetchall()
+            for row in rows:
+                yield _row_to_task(row)
+            if len(rows) < step:
+                return
+            if remaining is not None:
+                remaining -= len(rows)
+            last = (rows[-1]["created_at"], rows[-1]["id"])
+            if by_due:
+                last = (rows[-1]["due_key"],) + last
+
+    # --- LISTS ---
+
+    def get_lists(self) -> List[str]:
+        return [row["name"] for row in self._conn().execute("SELECT name FROM lists ORDER BY id")]
+
+    def list_counts(self) -> Dict[str, int]:
+        """Number of tasks in each list, in list order"""
+        rows = self._conn().execute("SELECT name, task_count FROM lists ORDER BY id")
+        return {row["name"]: row["task_count"] for row in rows}
+
+    def create_list(self, name: str) -> str:
+        name = name.strip()
+        if not name:
+            raise StoreError("List name cannot be empty")
+        with self._write() as conn:
+            try:
+                conn.execute(INSERT_LIST, (name,))
+            except sqlite3.IntegrityError:
+                raise StoreError(f"List '{name}' already exists")
+            self._after_commit(self._list_created, name)
+        return name
+
+    def delete_list(self, name: str):
+        if name == PROTECTED_LIST:
+            raise StoreError(f"The '{PROTECTED_LIST}' list cannot be deleted")
+        with self._write() as conn:
+            row = conn.execute("SELECT task_count FROM lists WHERE name = ?", (name,)).fetchone()
+            if row is None:
+                raise NotFoundError(f"List '{name}' not found")
+            if row["task_count"]:
+                raise StoreError(f"List '{name}' still has tasks")
+            conn.execute("DELETE FROM lists WHERE name = ?", (name,))
+            self._compact(conn)
+            self._after_commit(self._list_deleted, name)
+
+
+class _WriteTransaction:
+    """BEGIN IMMEDIATE ... COMMIT, rolled back if the block raises.
+
+    Taking the write lock up front means the checks made inside the block
+    (list exists, list is empty) still hold when the change commits, even
+    against writers in other processes. A committed block bumps the commit
+    counter and reports the new value to `on_commit`.
+
+    Writers of one process also queue on `lock` for the whole block, and the
+    `notifications` the block queued run after COMMIT but before the lock is
+    released, so listeners see the changes in commit order and never before
+    other connections can read them.
+    """
+
+    def __init__(self, conn: sqlite3.Connection, lock: threading.Lock,
+                 notifications: List[Callable[[], None]], on_commit: Callable[[int], None]):
+        self.conn = conn
+        self.lock = lock
+        self.notifications = notifications
+        self.on_commit = on_commit
+
+    def __enter__(self) -> sqlite3.Connection:
+        self.lock.acquire()
+        try:
+            self.conn.execute("BEGIN IMMEDIATE")
+        except BaseException:
+            self.lock.release()
+            raise
+        return self.conn
+
+    def __exit__(self, exc_type, exc, tb):
+        try:
+            if exc_type:
+                self.conn.execute("ROLLBACK")
+                return False
+            try:
+                commit = self.conn.execute(BUMP_COMMITS).fetchone()[0]
+                self.conn.execute("COMMIT")
+            except BaseException:
+                self.conn.execute("ROLLBACK")
+                raise
+            self.on_commit(commit)
+            for notify in self.notifications:
+                notify()
+            return False
+        finally:
+            self.notifications.clear()
+            self.lock.release()
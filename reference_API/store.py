@@ -0,0 +1,903 @@
+"""In-memory task storage for the To-Do API.
+
+Tasks are kept as compact TaskRecords (see records.py) in a dict keyed by
+id. Secondary indexes map each tag, list name and completion state to the set
+of task ids carrying it, so filtered queries intersect id sets instead of
+scanning every task. A sorted list of (created_at, id) keys gives listings a
+stable order that cursors can resume.
+
+Every write also gets the next store version, and the store remembers which
+version last touched each task and list and keeps tombstones of deleted ones,
+both ordered by version, so changes_since() costs the number of changes.
+"""
+import base64
+import heapq
+import itertools
+import os
+import time
+import uuid
+from bisect import bisect_left, bisect_right, insort
+from collections.abc import Mapping
+from datetime import datetime
+from typing import Dict, Iterable, Iterator, List, Optional, Set, Tuple, Union
+
+from .locks import RWLock
+from .models import task_json
+from .records import UNDATED, DueRecordKey, RecordKey, TaskRecord, due_key, to_micros, uid_of
+from .search import SearchIndex, tokenize
+
+DEFAULT_LISTS = ["Personal", "Work"]
+PROTECTED_LIST = "Personal"
+
+# Fields of TaskUpdate that cannot be cleared, only changed
+NON_NULLABLE_FIELDS = ("title", "tags", "completed", "list")
+
+# Keys copied per step when walking the ordered index, bounding the work done
+# between checks for concurrent writes
+SCAN_CHUNK = 512
+
+SORTS = ("created_at", "due_date")
+
+# Tombstones of deleted tasks and lists kept for changes_since(); past this,
+# the oldest half is dropped and clients that synced before them must reload
+TOMBSTONE_LIMIT = 100000
+
+# (created_at, id), or (due_date, created_at, id) for sort="due_date"
+SortKey = Union[Tuple[datetime, str], Tuple[Optional[datetime], datetime, str]]
+DueRange = Tuple[int, int]
+
+
+class StoreError(Exception):
+    """A request the store refuses to apply (HTTP 400)"""
+    status_code = 400
+
+
+class NotFoundError(StoreError):
+    """The requested task or list does not exist (HTTP 404)"""
+    status_code = 404
+
+
+class TooLargeError(StoreError):
+    """A write would touch more tasks than the caller allowed (HTTP 413)"""
+    status_code = 413
+
+
+class ExpiredError(StoreError):
+    """The changes since a version are no longer known, so the client must reload everything (HTTP 410)"""
+    status_code = 410
+
+
+def parse_tags(tags: Optional[str]) -> List[str]:
+    """Split a comma-separated tags query value, dropping blanks"""
+    if not tags:
+        return []
+    return [tag.strip() for tag in tags.split(",") if tag.strip()]
+
+
+def encode_cursor(task: dict, sort: str = "created_at") -> str:
+    """Opaque cursor that resumes a listing in `sort` order right after `task`"""
+    raw = f"{task['created_at'].isoformat()}|{task['id']}"
+    if sort == "due_date":
+        due = task["due_date"]
+        raw = f"{due.isoformat() if due else ''}|{raw}"
+    return base64.urlsafe_b64encode(raw.encode()).decode()
+
+
+def decode_cursor(cursor: str, sort: str = "created_at") -> SortKey:
+    """Inverse of encode_cursor; a cursor from a listing in another order is invalid"""
+    try:
+        parts = base64.urlsafe_b64decode(cursor.encode()).decode().split("|")
+        if sort == "due_date":
+            due, created_at, task_id = parts
+            return (datetime.fromisoformat(due) if due else None, datetime.fromisoformat(created_at), task_id)
+        created_at, task_id = parts
+        return (datetime.fromisoformat(created_at), task_id)
+    except ValueError:
+        raise StoreError("Invalid cursor")
+
+
+def due_range(due_after: Optional[datetime], due_before: Optional[datetime]) -> DueRange:
+    """[low, high) due_key bounds of a due_after/due_before filter.
+
+    due_after is inclusive and due_before exclusive; tasks without a due
+    date fall outside any range.
+    """
+    low = -UNDATED if due_after is None else due_key(due_after)
+    high = UNDATED if due_before is None else due_key(due_before)
+    return (low, high)
+
+
+def new_task(data: dict) -> dict:
+    """Complete a TaskCreate payload into a full task record"""
+    task = dict(data)
+    task["list"] = task.get("list") or PROTECTED_LIST
+    task["tags"] = list(dict.fromkeys(task.get("tags") or []))
+    task["id"] = str(uuid.uuid4())
+    task["completed"] = bool(task.get("completed"))
+    task["created_at"] = datetime.now()
+    return task
+
+
+def apply_update(task: dict, changes: dict) -> dict:
+    """New record with a partial TaskUpdate applied; `task` is left untouched"""
+    changes = {
+        field: value for field, value in changes.items()
+        if value is not None or field not in NON_NULLABLE_FIELDS
+    }
+    if "tags" in changes:
+        changes["tags"] = list(dict.fromkeys(changes["tags"]))
+    return {**task, **changes}
+
+
+def open_store():
+    """Storage backend selected by the TODO_STORAGE environment variable"""
+    backend = os.getenv("TODO_STORAGE", "memory")
+    if backend == "memory":
+        if int(os.getenv("WEB_CONCURRENCY", 1)) > 1:
+            raise ValueError("Each worker would get its own in-memory store; use TODO_STORAGE=sqlite")
+        store = TaskStore(
+            preserialize=os.getenv("TODO_PRESERIALIZE", "") == "1",
+            engine=os.getenv("TODO_FILTER_ENGINE", "index"),
+            tombstone_limit=int(os.getenv("TODO_TOMBSTONES", TOMBSTONE_LIMIT)),
+        )
+        data_dir = os.getenv("TODO_DATA_DIR")
+        if data_dir:
+            from .journal import Journal
+            Journal(data_dir, snapshot_bytes=int(os.getenv("TODO_SNAPSHOT_BYTES", 64 * 1024 * 1024))).recover(store)
+        return store
+    if backend == "sqlite":
+        from .sqlite_store import SQLiteTaskStore
+        return SQLiteTaskStore(os.getenv("TODO_DB_PATH", "todo.db"),
+                               tombstone_limit=int(os.getenv("TODO_TOMBSTONES", TOMBSTONE_LIMIT)))
+    raise ValueError(f"Unknown TODO_STORAGE backend: {backend}")
+
+
+class Delta:
+    """What changed after a version: see changes_since()"""
+    __slots__ = ("version", "more", "tasks", "deleted", "lists", "deleted_lists")
+
+    def __init__(self, version: int, more: bool, tasks: list, deleted: List[str], lists: List[str],
+                 deleted_lists: List[str]):
+        # The version to pass as `since` next time
+        self.version = version
+        # Whether the page stopped short of the latest version
+        self.more = more
+        self.tasks = tasks
+        self.deleted = deleted
+        self.lists = lists
+        self.deleted_lists = deleted_lists
+
+
+class StoreListener:
+    """Receives every change a store commits; override the hooks you need"""
+
+    def task_changed(self, old: Optional[dict], new: Optional[dict]):
+        """A task was created (old is None), updated or deleted (new is None)"""
+
+    def list_changed(self, name: str):
+        """A list was created or deleted"""
+
+    def list_created(self, name: str):
+        """A list was created; defaults to list_changed"""
+        self.list_changed(name)
+
+    def list_deleted(self, name: str):
+        """A list was deleted; defaults to list_changed"""
+        self.list_changed(name)
+
+    def bulk_changed(self):
+        """Any number of tasks or lists changed at once (bulk delete, reset)"""
+
+
+class ChangeLog:
+    """Where a TaskStore records its writes; this base class keeps nothing.
+
+    The store calls each write hook while it holds its write lock, after
+    checking the write and before applying it, so entries are in the order
+    the changes were applied and a write the hook rejects changes nothing.
+    A hook returns a sequence number, and the store calls sync() with it
+    after releasing the lock, before the write returns. journal.Journal
+    keeps them on disk.
+    """
+
+    def put_task(self, task: TaskRecord) -> int:
+        """A task was created or updated"""
+        return 0
+
+    def put_tasks(self, tasks: List[TaskRecord]) -> int:
+        """put_task for each of `tasks`, all or none of them"""
+        return 0
+
+    def delete_task(self, uid: bytes) -> int:
+        return 0
+
+    def delete_tasks(self, completed: Optional[bool], tags: List[str], list_name: Optional[str]) -> int:
+        return 0
+
+    def reset(self) -> int:
+        return 0
+
+    def create_list(self, name: str) -> int:
+        return 0
+
+    def delete_list(self, name: str) -> int:
+        return 0
+
+    def sync(self, seq: int):
+        """Block until every entry up to `seq` is durable"""
+
+    def rotate(self) -> int:
+        """Start a new log segment; returns the number a snapshot of the state at this point takes"""
+        return 0
+
+    def write_snapshot(self, number: int, lists: List[str], tasks: List[TaskRecord]):
+        """Persist the state as of rotate() returning `number`; the log before it is no longer needed"""
+
+    def close(self):
+        pass
+
+
+class BaseStore:
+    """Behaviour shared by the storage backends: change listeners and JSON rendering"""
+
+    def __init__(self):
+        self._listeners: List[StoreListener] = []
+
+    def task_json(self, task: dict) -> bytes:
+        """`task` serialized as the API returns it"""
+        return task_json(task)
+
+    def add_listener(self, listener: StoreListener):
+        self._listeners.append(listener)
+
+    def poll_changes(self):
+        """Report changes made outside this process to the listeners; nothing can make any here"""
+
+    def _task_changed(self, old: Optional[dict], new: Optional[dict]):
+        for listener in self._listeners:
+            listener.task_changed(old, new)
+
+    def _list_created(self, name: str):
+        for listener in self._listeners:
+            listener.list_created(name)
+
+    def _list_deleted(self, name: str):
+        for listener in self._listeners:
+            listener.list_deleted(name)
+
+    def _bulk_changed(self):
+        for listener in self._listeners:
+            listener.bulk_changed()
+
+
+class TaskStore(BaseStore):
+    """In-memory store.
+
+    Tasks are held as compact TaskRecords keyed by their 16-byte id, and the
+    indexes hold those same id objects. With `preserialize` it also keeps
+    every task's JSON bytes, rendered once on create and again only on
+    update, so reads skip model validation and serialization entirely.
+
+    `engine` picks how filters are evaluated: "index" intersects the id sets
+    below, "numpy" runs vectorized masks over a ColumnarIndex (columnar.py).
+
+    The store is safe to share between threads. Writes hold an RWLock
+    exclusively, so checking a list and changing it (creating a task in it,
+    deleting it when empty) is atomic; reads share it, and long listings
+    take it once per chunk so streaming never holds off writers for long.
+    Records are built and rendered before the lock is taken where possible.
+
+    Every write is also recorded in `journal` (see ChangeLog), so that a
+    journal.Journal can make the store durable.
+
+    The full-text SearchIndex (search.py) is built by the first search and
+    maintained with the other indexes from then on.
+
+    Versions are not journaled. They start from the startup time in
+    microseconds, so they still grow across restarts, and a client asking
+    for changes since a version from before the restart is told to reload.
+    """
+
+    def __init__(self, preserialize: bool = False, engine: str = "index", journal: Optional[ChangeLog] = None,
+                 tombstone_limit: int = TOMBSTONE_LIMIT):
+        super().__init__()
+        self.preserialize = preserialize
+        self.journal = journal or ChangeLog()
+        if engine == "numpy":
+            from .columnar import ColumnarIndex
+            self._columns = ColumnarIndex()
+        elif engine == "index":
+            self._columns = None
+        else:
+            raise ValueError(f"Unknown filter engine: {engine}")
+        self._json: Dict[bytes, bytes] = {}
+        self.tasks: Dict[bytes, TaskRecord] = {}
+        # List name -> number of tasks in it, in creation order
+        self.lists: Dict[str, int] = dict.fromkeys(DEFAULT_LISTS, 0)
+        self._by_list: Dict[str, Set[bytes]] = {}
+        self._by_tag: Dict[str, Set[bytes]] = {}
+        self._by_completed: Dict[bool, Set[bytes]] = {True: set(), False: set()}
+        # Ids of the tasks that repeat, usually few, for expanding occurrences
+        self._recurring: Set[bytes] = set()
+        self._order: List[RecordKey] = []
+        self._due_order: List[DueRecordKey] = []
+        self._search: Optional[SearchIndex] = None
+        self.tombstone_limit = tombstone_limit
+        self.version = time.time_ns() // 1000
+        # Oldest version changes_since() can answer for
+        self._horizon = self.version
+        # Task uid or list name -> version of its last change, and of its
+        # deletion for tombstones; a changed key is moved to the end, so
+        # each dict stays in version order
+        self._versions: Dict[bytes, int] = {}
+        self._tombstones: Dict[bytes, int] = {}
+        self._list_versions: Dict[str, int] = dict.fromkeys(self.lists, self.version)
+        self._list_tombstones: Dict[str, int] = {}
+        self._lock = RWLock()
+
+    # --- INDEX MAINTENANCE ---
+
+    def _index(self, task: TaskRecord, body: Optional[bytes] = None):
+        uid = task.uid
+        if self.preserialize:
+            self._json[uid] = body if body is not None else task_json(task)
+        self._by_list.setdefault(task.list_name, set()).add(uid)
+        self.lists[task.list_name] += 1
+        for tag in task.tags:
+            self._by_tag.setdefault(tag, set()).add(uid)
+        self._by_completed[task.completed].add(uid)
+        if task.recurrence is not None:
+            self._recurring.add(uid)
+        if self._columns is not None:
+            self._columns.add(task)
+        if self._search is not None:
+            self._search.add(task)
+
+    def _unindex(self, task: TaskRecord):
+        uid = task.uid
+        self._json.pop(uid, None)
+        _discard(self._by_list, task.list_name, uid)
+        self.lists[task.list_name] -= 1
+        for tag in task.tags:
+            _discard(self._by_tag, tag, uid)
+        self._by_completed[task.completed].discard(uid)
+        self._recurring.discard(uid)
+        if self._columns is not None:
+            self._columns.remove(task)
+        if self._search is not None:
+            self._search.remove(task)
+
+    def _add(self, task: TaskRecord, body: Optional[bytes], version: int):
+        # Keys are computed before anything changes, so a task they fail on is never half-added
+        key, due_sort_key = task.key, task.due_sort_key
+        self.tasks[task.uid] = task
+        self._index(task, body)
+        insort(self._order, key)
+        insort(self._due_order, due_sort_key)
+        self._versions[task.uid] = version
+        self._task_changed(None, task)
+
+    def task_json(self, task: Mapping) -> bytes:
+        uid = getattr(task, "uid", None)
+        cached = self._json.get(uid) if self.preserialize else None
+        # A task replaced or deleted since it was read falls back to rendering
+        if cached is None or self.tasks.get(uid) is not task:
+            return task_json(task)
+        return cached
+
+    def _require_list(self, name: str):
+        if name not in self.lists:
+            raise StoreError(f"List '{name}' does not exist")
+
+    # --- TASKS ---
+
+    def _render(self, task: TaskRecord) -> Optional[bytes]:
+        return task_json(task) if self.preserialize else None
+
+    def create_task(self, data: dict) -> TaskRecord:
+        record = TaskRecord.from_task(new_task(data))
+        body = self._render(record)
+        with self._lock.write():
+            self._require_list(record.list_name)
+            seq = self.journal.put_task(record)
+            self._add(record, body, self._next_version())
+        self.journal.sync(seq)
+        return record
+
+    def create_tasks(self, items: List[dict]) -> List[Union[TaskRecord, StoreError]]:
+        """Create many tasks, checking each target list once per batch.
+
+        Returns one entry per item: the created task, or the StoreError that
+        rejected it.
+        """
+        records = [TaskRecord.from_task(new_task(data)) for data in items]
+        bodies = [self._render(record) for record in records]
+        with self._lock.write():
+            known = {name: name in self.lists for name in {record.list_name for record in records}}
+            results = [
+                record if known[record.list_name] else StoreError(f"List '{record.list_name}' does not exist")
+                for record in records
+            ]
+            seq = self.journal.put_tasks([record for record in results if isinstance(record, TaskRecord)])
+            version = self._next_version()
+            for result, body in zip(results, bodies):
+                if isinstance(result, TaskRecord):
+                    self._add(result, body, version)
+        self.journal.sync(seq)
+        return results
+
+    def get_task(self, task_id: str) -> TaskRecord:
+        task = self.tasks.get(uid_of(task_id))
+        if task is None:
+            raise NotFoundError(f"Task '{task_id}' not found")
+        return task
+
+    def update_task(self, task_id: str, changes: dict) -> TaskRecord:
+        with self._lock.write():
+            old = self.get_task(task_id)
+            # Records are replaced rather than mutated so readers never see a
+            # half-applied update.
+            task = apply_update(old, changes)
+            self._require_list(task["list"])
+            record = TaskRecord.from_task(task)
+            seq = self.journal.put_task(record)
+            self._replace(old, record, self._next_version())
+        self.journal.sync(seq)
+        return record
+
+    def update_tasks(
+        self,
+        changes: dict,
+        ids: Optional[List[str]] = None,
+        completed: Optional[bool] = None,
+        tags: Iterable[str] = (),
+        list_name: Optional[str] = None,
+        limit: Optional[int] = None,
+    ) -> List[Union[TaskRecord, StoreError]]:
+        """Apply one partial update to the tasks in `ids`, or else to every task matching the filters
+        (as in query), checking the target list once and taking the lock once.
+
+        With `ids`, returns one entry per id: the updated task, or the
+        NotFoundError for an unknown id. Otherwise returns the updated tasks
+        in (created_at, id) order, or raises TooLargeError without updating
+        any if more than `limit` match.
+        """
+        tags = list(tags)
+        with self._lock.write():
+            if changes.get("list") is not None:
+                self._require_list(changes["list"])
+            if ids is None:
+                matched = self._matching_ids(completed, tags, list_name)
+                if limit is not None and len(self.tasks if matched is None else matched) > limit:
+                    raise TooLargeError(f"More than {limit} tasks match")
+                uids = sorted(self.tasks if matched is None else matched, key=lambda uid: self.tasks[uid].key)
+            else:
+                uids = [uid for uid in dict.fromkeys(map(uid_of, ids)) if uid in self.tasks]
+            updated = {uid: TaskRecord.from_task(apply_update(self.tasks[uid], changes)) for uid in uids}
+            seq = self.journal.put_tasks(list(updated.values()))
+            version = self._next_version()
+            for uid, record in updated.items():
+                self._replace(self.tasks[uid], record, version)
+        self.journal.sync(seq)
+        if ids is None:
+            return list(updated.values())
+        return [updated.get(uid_of(task_id)) or NotFoundError(f"Task '{task_id}' not found") for task_id in ids]
+
+    def _replace(self, old: TaskRecord, record: TaskRecord, version: int):
+        old_key, new_key = old.due_sort_key, record.due_sort_key
+        self._unindex(old)
+        self.tasks[record.uid] = record
+        self._index(record)
+        if new_key != old_key:
+            del self._due_order[bisect_left(self._due_order, old_key)]
+            insort(self._due_order, new_key)
+        del self._versions[record.uid]
+        self._versions[record.uid] = version
+        self._task_changed(old, record)
+
+    def restore_task(self, record: TaskRecord):
+        """Create or replace a task exactly as recorded (journal replay), without checking its list"""
+        with self._lock.write():
+            seq = self.journal.put_task(record)
+            old = self.tasks.get(record.uid)
+            version = self._next_version()
+            if old is None:
+                self._add(record, self._render(record), version)
+            else:
+                self._replace(old, record, version)
+        self.journal.sync(seq)
+
+    def load(self, lists: List[str], records: List[TaskRecord]):
+        """Replace the whole state with a snapshot's, `records` in (created_at, id) order.
+
+        Builds the ordered indexes in one pass each instead of inserting
+        every task, so loading a large snapshot stays linear.
+        """
+        with self._lock.write():
+            self._clear_tasks()
+            self.lists = dict.fromkeys(lists, 0)
+            for record in records:
+                self.tasks[record.uid] = record
+                self._index(record)
+            self._order = [record.key for record in records]
+            self._due_order = sorted(record.due_sort_key for record in records)
+            self._forget_versions()
+            self._bulk_changed()
+
+    def checkpoint(self):
+        """Snapshot the state into the journal, so recovery only replays the log written after it"""
+        # Writers hold the lock exclusively while they log, so the read lock
+        # keeps the state and the log position consistent
+        with self._lock.read():
+            lists = list(self.lists)
+            tasks = [self.tasks[key[1]] for key in self._order]
+            number = self.journal.rotate()
+        self.journal.write_snapshot(number, lists, tasks)
+
+    def close(self):
+        self.journal.close()
+
+    def delete_task(self, task_id: str):
+        with self._lock.write():
+            task = self.get_task(task_id)
+            key, due_sort_key = task.key, task.due_sort_key
+            seq = self.journal.delete_task(task.uid)
+            self._unindex(task)
+            del self.tasks[task.uid]
+            del self._order[bisect_left(self._order, key)]
+            del self._due_order[bisect_left(self._due_order, due_sort_key)]
+            self._bury(task.uid, self._next_version())
+            self._compact()
+            self._task_changed(task, None)
+        self.journal.sync(seq)
+
+    def query(
+        self,
+        completed: Optional[bool] = None,
+        tags: Iterable[str] = (),
+        list_name: Optional[str] = None,
+        due_after: Optional[datetime] = None,
+        due_before: Optional[datetime] = None,
+        sort: str = "created_at",
+        after: Optional[SortKey] = None,
+        limit: Optional[int] = None,
+        recurring: bool = False,
+    ) -> Iterator[TaskRecord]:
+        """Tasks matching every given filter, in `sort` order: (created_at, id), or (due_date, created_at, id) with undated tasks last.
+
+        `tags` matches any of the tags and due_after/due_before bound the due
+        date as in due_range(). `recurring` keeps only tasks that repeat.
+        `after` resumes behind a cursor key of the same order and `limit`
+        caps the number of tasks yielded.
+        """
+        tags = list(tags)
+        due = None if due_after is None and due_before is None else due_range(due_after, due_before)
+        # Walks are lazy and lock per chunk; every other plan is computed here
+        with self._lock.read():
+            if sort == "due_date":
+                return self._query_by_due(completed, tags, list_name, due, after, limit, recurring)
+            return self._query_by_created(completed, tags, list_name, due, after, limit, recurring)
+
+    def _query_by_created(self, completed: Optional[bool], tags: List[str], list_name: Optional[str],
+                          due: Optional[DueRange], after: Optional[SortKey],
+                          limit: Optional[int], recurring: bool) -> Iterator[TaskRecord]:
+        """query() in (created_at, id) order"""
+        start = None if after is None else _record_key(after)
+        filtered = completed is not None or tags or list_name is not None
+        if self._columns is not None and not recurring and (filtered or due is not None):
+            return self._resolve(self._columns.keys(completed, tags, list_name, due, start, limit))
+        ids = self._matching_ids(completed, tags, list_name, recurring)
+        if due is not None:
+            ids = self._due_ids(ids, due)
+        if ids is None:
+            return self._walk("_order", start, limit)
+        return self._resolve(_smallest((self.tasks[uid].key for uid in ids), start, limit))
+
+    def _query_by_due(self, completed: Optional[bool], tags: List[str], list_name: Optional[str],
+                      due: Optional[DueRange], after: Optional[SortKey],
+                      limit: Optional[int], recurring: bool) -> Iterator[TaskRecord]:
+        """query() in (due_date, created_at, id) order, walking the due-date index"""
+        start = None if after is None else _due_record_key(after)
+        ids = self._matching_ids(completed, tags, list_name, recurring)
+        first, stop = (0, len(self._due_order)) if due is None else self._due_slice(due)
+        # Sorting the filter matches costs about len(ids); walking the range
+        # until `limit` of them turn up costs about limit * span / len(ids).
+        span = stop - first
+        if ids is not None and (len(ids) < span if limit is None else len(ids) ** 2 < limit * span):
+            keys = (self.tasks[uid].due_sort_key for uid in ids)
+            if due is not None:
+                keys = (key for key in keys if due[0] <= key[0] < due[1])
+            return self._resolve(_smallest(keys, start, limit))
+        if due is None:
+            return self._walk("_due_order", start, limit, ids)
+        if start is None or start < (due[0],):
+            start = (due[0],)
+        return self._walk("_due_order", start, limit, ids, stop=(due[1],))
+
+    def search(
+        self,
+        q: str,
+        completed: Optional[bool] = None,
+        tags: Iterable[str] = (),
+        list_name: Optional[str] = None,
+        limit: int = 20,
+    ) -> List[TaskRecord]:
+        """The `limit` tasks best matching the words of `q` (see search.py), filtered as in query()"""
+        words = tokenize(q)
+        if not words:
+            raise StoreError("Search query has no words")
+        tags = list(tags)
+        if self._search is None:
+            with self._lock.write():
+                if self._search is None:
+                    index = SearchIndex()
+                    for task in self.tasks.values():
+                        index.add(task)
+                    self._search = index
+        with self._lock.read():
+            ids = self._matching_ids(completed, tags, list_name)
+            hits = self._search.search(words, ids, limit, lambda uid: self.tasks[uid].key)
+            return [self.tasks[uid] for uid in hits]
+
+    def _due_slice(self, due: DueRange) -> Tuple[int, int]:
+        """Positions in the due-date index of the first task in, and first past, the range"""
+        return bisect_left(self._due_order, (due[0],)), bisect_left(self._due_order, (due[1],))
+
+    def _due_ids(self, ids: Optional[Set[bytes]], due: DueRange) -> Set[bytes]:
+        """`ids` (all tasks if None) narrowed to due dates in the range, scanning the smaller side"""
+        first, stop = self._due_slice(due)
+        if ids is not None and len(ids) < stop - first:
+            return {uid for uid in ids if due[0] <= self.tasks[uid].due_micros < due[1]}
+        in_range = {key[-1] for key in self._due_order[first:stop]}
+        return in_range if ids is None else in_range & ids
+
+    def _matching_ids(self, completed: Optional[bool], tags: Iterable[str],
+                      list_name: Optional[str], recurring: bool = False) -> Optional[Set[bytes]]:
+        """Ids matching the filters by intersecting index sets; None means no filter"""
+        candidates = [self._recurring] if recurring else []
+        if self._columns is not None:
+            matched = self._columns.matching(completed, tags, list_name)
+            if matched is not None:
+                candidates.append(matched)
+        else:
+            if list_name is not None:
+                candidates.append(self._by_list.get(list_name, set()))
+            if completed is not None:
+                candidates.append(self._by_completed[completed])
+            tags = list(tags)
+            if tags:
+                candidates.append(set().union(*(self._by_tag.get(tag, ()) for tag in tags)))
+
+        if not candidates:
+            return None
+        candidates.sort(key=len)
+        return candidates[0].intersection(*candidates[1:])
+
+    def delete_tasks(
+        self,
+        completed: Optional[bool] = None,
+        tags: Iterable[str] = (),
+        list_name: Optional[str] = None,
+    ) -> int:
+        """Delete every task matching the filters (as in query); returns the count"""
+        tags = list(tags)
+        with self._lock.write():
+            seq = self.journal.delete_tasks(completed, tags, list_name)
+            ids = self._matching_ids(completed, tags, list_name)
+            version = self._next_version()
+            for uid in self.tasks if ids is None else ids:
+                self._bury(uid, version)
+            self._compact()
+            if ids is None:
+                count = len(self.tasks)
+                self._clear_tasks()
+            else:
+                count = len(ids)
+                for uid in ids:
+                    self._unindex(self.tasks.pop(uid))
+                # One pass over the ordered index instead of a bisect-and-delete per task
+                self._order = [key for key in self._order if key[1] not in ids]
+                self._due_order = [key for key in self._due_order if key[2] not in ids]
+            self._bulk_changed()
+        self.journal.sync(seq)
+        return count
+
+    def reset(self):
+        """Delete all tasks and restore the default lists"""
+        with self._lock.write():
+            seq = self.journal.reset()
+            self._clear_tasks()
+            self.lists = dict.fromkeys(DEFAULT_LISTS, 0)
+            self._forget_versions()
+            self._bulk_changed()
+        self.journal.sync(seq)
+
+    def _clear_tasks(self):
+        self.tasks = {}
+        self._json = {}
+        self._by_list, self._by_tag = {}, {}
+        self.lists = dict.fromkeys(self.lists, 0)
+        self._by_completed = {True: set(), False: set()}
+        self._recurring = set()
+        self._order = []
+        self._due_order = []
+        if self._columns is not None:
+            self._columns.clear()
+        if self._search is not None:
+            self._search = SearchIndex()
+
+    def _walk(self, order: str, after: Optional[tuple], limit: Optional[int],
+              ids: Optional[Set[bytes]] = None, stop: Optional[tuple] = None) -> Iterator[TaskRecord]:
+        """Walk the ordered index named `order` in chunks so huge listings never copy it whole.
+
+        Only tasks in `ids` (all if None) are yielded, and the walk ends at
+        the first key not below `stop`.
+        """
+        remaining = limit
+        while remaining is None or remaining > 0:
+            step = SCAN_CHUNK if remaining is None or ids is not None else min(SCAN_CHUNK, remaining)
+            with self._lock.read():
+                keys = getattr(self, order)
+                start = 0 if after is None else bisect_right(keys, after)
+                chunk = keys[start:start + step]
+            last = len(chunk) < step
+            if stop is not None and chunk and chunk[-1] >= stop:
+                chunk = chunk[:bisect_left(chunk, stop)]
+                last = True
+            selected = chunk if ids is None else [key for key in chunk if key[-1] in ids]
+            for task in self._resolve(selected):
+                yield task
+                if remaining is not None:
+                    remaining -= 1
+                    if remaining == 0:
+                        return
+            if last:
+                return
+            after = chunk[-1]
+
+    def _resolve(self, keys: Iterable[tuple]) -> Iterator[TaskRecord]:
+        # Tasks deleted since their key was read are skipped
+        for key in keys:
+            task = self.tasks.get(key[-1])
+            if task is not None:
+                yield task
+
+    # --- VERSIONS ---
+
+    def _next_version(self) -> int:
+        self.version += 1
+        return self.version
+
+    def _bury(self, uid: bytes, version: int):
+        del self._versions[uid]
+        self._tombstones[uid] = version
+
+    def _compact(self):
+        """Drop the oldest half of the tombstones, task and list ones together, once there are more
+        than tombstone_limit"""
+        count = len(self._tombstones) + len(self._list_tombstones)
+        if count <= self.tombstone_limit:
+            return
+        # Both are in version order, as tombstones are only ever added at the newest version
+        versions = heapq.merge(self._tombstones.values(), self._list_tombstones.values())
+        self._horizon = next(itertools.islice(versions, count - self.tombstone_limit // 2 - 1, None))
+        for tombstones in (self._tombstones, self._list_tombstones):
+            for key in list(itertools.takewhile(lambda key: tombstones[key] <= self._horizon, tombstones)):
+                del tombstones[key]
+
+    def _forget_versions(self):
+        """Make every task and list new as of a fresh version, after the whole state was replaced"""
+        self._horizon = self._next_version()
+        self._versions = dict.fromkeys(self.tasks, self.version)
+        self._tombstones = {}
+        self._list_versions = dict.fromkeys(self.lists, self.version)
+        self._list_tombstones = {}
+
+    def changes_since(self, since: int, limit: Optional[int] = None) -> Delta:
+        """Tasks and lists created or changed after version `since`, and those deleted since.
+
+        since=0 returns every task and list. With `limit`, only the oldest
+        `limit` changes are returned (more if a single write made more, as a
+        page never splits one) and `more` says whether to ask again. Raises
+        ExpiredError if tombstones newer than `since` have been compacted.
+        """
+        with self._lock.read():
+            if since and not self._horizon <= since <= self.version:
+                raise ExpiredError(f"Changes since version {since} are no longer known; reload all tasks")
+            tasks = _newer(self._versions, since)
+            deleted = _newer(self._tombstones, since)
+            lists = _newer(self._list_versions, since)
+            deleted_lists = _newer(self._list_tombstones, since)
+            version, more = self.version, False
+            if limit is not None and len(tasks) + len(deleted) > limit:
+                versions = heapq.merge((v for v, _ in tasks), (v for v, _ in deleted))
+                cut = next(itertools.islice(versions, limit - 1, None))
+                if any(v > cut for v in versions):
+                    version, more = cut, True
+                    tasks, deleted, lists, deleted_lists = (
+                        [(v, key) for v, key in changes if v <= cut]
+                        for changes in (tasks, deleted, lists, deleted_lists)
+                    )
+            records = [self.tasks[uid] for _, uid in tasks]
+        return Delta(version, more, records, [str(uuid.UUID(bytes=uid)) for _, uid in deleted],
+                     [name for _, name in lists], [name for _, name in deleted_lists])
+
+    # --- LISTS ---
+
+    def get_lists(self) -> List[str]:
+        with self._lock.read():
+            return list(self.lists)
+
+    def list_counts(self) -> Dict[str, int]:
+        """Number of tasks in each list, in list order"""
+        with self._lock.read():
+            return dict(self.lists)
+
+    def create_list(self, name: str) -> str:
+        name = name.strip()
+        if not name:
+            raise StoreError("List name cannot be empty")
+        with self._lock.write():
+            if name in self.lists:
+                raise StoreError(f"List '{name}' already exists")
+            seq = self.journal.create_list(name)
+            self.lists[name] = 0
+            self._list_tombstones.pop(name, None)
+            self._list_versions[name] = self._next_version()
+            self._list_created(name)
+        self.journal.sync(seq)
+        return name
+
+    def delete_list(self, name: str):
+        if name == PROTECTED_LIST:
+            raise StoreError(f"The '{PROTECTED_LIST}' list cannot be deleted")
+        with self._lock.write():
+            if name not in self.lists:
+                raise NotFoundError(f"List '{name}' not found")
+            if self.lists[name]:
+                raise StoreError(f"List '{name}' still has tasks")
+            seq = self.journal.delete_list(name)
+            del self.lists[name]
+            del self._list_versions[name]
+            self._list_tombstones[name] = self._next_version()
+            self._compact()
+            self._list_deleted(name)
+        self.journal.sync(seq)
+
+
+def _record_key(key: SortKey) -> RecordKey:
+    """A (created_at, id) cursor key in the TaskRecord.key form"""
+    created_at, task_id = key
+    uid = uid_of(task_id)
+    if uid is None or created_at.tzinfo is not None:
+        raise StoreError("Invalid cursor")
+    return (to_micros(created_at), uid)
+
+
+def _due_record_key(key: SortKey) -> DueRecordKey:
+    """A (due_date, created_at, id) cursor key in the TaskRecord.due_sort_key form"""
+    due_date, created_at, task_id = key
+    return (due_key(due_date),) + _record_key((created_at, task_id))
+
+
+def _smallest(keys: Iterable[tuple], after: Optional[tuple], limit: Optional[int]) -> List[tuple]:
+    """The first `limit` (all if None) of `keys` past `after`, sorted"""
+    if after is not None:
+        keys = (key for key in keys if key > after)
+    return sorted(keys) if limit is None else heapq.nsmallest(limit, keys)
+
+
+def _newer(versions: dict, since: int) -> List[tuple]:
+    """(version, key) of the entries of a version-ordered dict newer than `since`, oldest first"""
+    newer = [(version, key) for key, version in
+             itertools.takewhile(lambda item: item[1] > since, reversed(versions.items()))]
+    newer.reverse()
+    return newer
+
+
+def _discard(index: Dict[str, Set[bytes]], key: str, uid: bytes):
+    ids = index.get(key)
+    if ids is not None:
+        ids.discard(uid)
+        if not ids:
+            del index[key]
@@ -0,0 +1,349 @@
+"""Load-testing harness for the To-Do API.
+
+Seeds a dataset, then drives every endpoint with a weighted operation mix at
+a fixed concurrency and reports requests/sec and latency histograms per
+operation. Results can be written as JSON and compared against an earlier
+run to catch regressions between backends or releases.
+
+    python testing/benchmark.py --dataset 50000 --concurrency 64 --mix read-heavy --output run.json
+    python testing/benchmark.py --mix filter-heavy --compare run.json
+    python testing/benchmark.py --in-process    # no server: calls the ASGI app directly
+    python testing/benchmark.py --in-process --app async --concurrency 1000
+"""
+import asyncio
+import json
+import os
+import random
+import sys
+import time
+from datetime import datetime
+from typing import Callable, Dict, List, Optional
+
+import httpx
+
+from create_tasks import API_BASE, percentile
+from synthetic_tasks import OBJECTS, VERBS, SyntheticConfig, generate_ndjson, tag_vocabulary
+
+BENCH_LISTS = {"Personal": 5.0, "Work": 4.0, "Bench": 1.0}
+SEED_BATCH_SIZE = 5000
+
+# Upper bounds (ms) of the latency histogram buckets; the last bucket is open-ended
+HISTOGRAM_BOUNDS_MS = [0.5, 1, 2, 5, 10, 20, 50, 100, 200, 500, 1000, 2000, 5000]
+
+READS = ["get_task", "list_page", "filter_list", "filter_tags", "filter_combined", "get_lists"]
+WRITES = ["create_task", "update_task", "delete_task", "bulk_create", "create_delete_list"]
+SEARCHES = ["search", "search_typeahead", "search_filtered"]
+
+MIXES: Dict[str, Dict[str, float]] = {
+    # 90% reads / 10% writes, spread evenly within each group
+    "read-heavy": {**{op: 90 / len(READS) for op in READS}, **{op: 10 / len(WRITES) for op in WRITES}},
+    "write-heavy": {**{op: 30 / len(READS) for op in READS}, **{op: 70 / len(WRITES) for op in WRITES}},
+    "filter-heavy": {"filter_list": 25, "filter_tags": 35, "filter_combined": 35, "list_page": 5},
+    "search-heavy": {"search": 30, "search_typeahead": 40, "search_filtered": 20, "create_task": 5, "update_task": 5},
+    "all": {op: 1 for op in READS + WRITES + SEARCHES},
+}
+
+
+class BenchState:
+    """Ids and names the operations draw from, shared by all workers"""
+
+    def __init__(self, rng: random.Random, config: SyntheticConfig):
+        self.rng = rng
+        self.task_ids: List[str] = []
+        self.tags = tag_vocabulary(config.tag_count)
+        self.lists = list(config.lists)
+        self.list_counter = 0
+
+    def random_task_id(self) -> Optional[str]:
+        return self.rng.choice(self.task_ids) if self.task_ids else None
+
+    def search_words(self) -> str:
+        """One or two words that occur in synthetic titles"""
+        words = [self.rng.choice(VERBS).lower(), self.rng.choice(OBJECTS).split()[0]]
+        return " ".join(words[:self.rng.randint(1, 2)])
+
+    def popular_tags(self) -> str:
+        # Bias towards the head of the Zipf distribution, as real filters would be
+        return ",".join(self.rng.sample(self.tags[:10], self.rng.randint(1, 3)))
+
+
+# --- OPERATIONS ---
+# Each takes (client, state) and returns the response of the request it made.
+
+async def op_get_task(client, state):
+    return await client.get(f"/tasks/{state.random_task_id()}")
+
+async def op_list_page(client, state):
+    return await client.get("/tasks", params={"limit": 50})
+
+async def op_filter_list(client, state):
+    return await client.get("/tasks", params={"list": state.rng.choice(state.lists), "limit": 100})
+
+async def op_filter_tags(client, state):
+    return await client.get("/tasks", params={"tags": state.popular_tags(), "limit": 100})
+
+async def op_filter_combined(client, state):
+    return await client.get("/tasks", params={
+        "list": state.rng.choice(state.lists),
+        "tags": state.popular_tags(),
+        "completed": state.rng.choice(["true", "false"]),
+        "limit": 100,
+    })
+
+async def op_search(client, state):
+    return await client.get("/tasks/search", params={"q": state.search_words()})
+
+async def op_search_typeahead(client, state):
+    # A word cut short, as a search box sends while the user is typing
+    words = state.search_words()
+    cut = state.rng.randint(max(1, len(words) - 4), len(words) - 1)
+    return await client.get("/tasks/search", params={"q": words[:cut]})
+
+async def op_search_filtered(client, state):
+    return await client.get("/tasks/search", params={
+        "q": state.search_words(),
+        "list": state.rng.choice(state.lists),
+        "completed": state.rng.choice(["true", "false"]),
+    })
+
+async def op_get_lists(client, state):
+    return await client.get("/lists")
+
+async def op_create_task(client, state):
+    res = await client.post("/tasks", json={
+        "title": "Benchmark task",
+        "tags": state.popular_tags().split(","),
+        "list": state.rng.choice(state.lists),
+    })
+    if res.status_code == 201:
+        state.task_ids.append(res.json()["id"])
+    return res
+
+async def op_update_task(client, state):
+    return await client.put(f"/tasks/{state.random_task_id()}", json={
+        "completed": state.rng.random() < 0.5,
+        "tags": state.popular_tags().split(","),
+    })
+
+async def op_delete_task(client, state):
+    if not state.task_ids:
+        return await op_create_task(client, state)
+    index = state.rng.randrange(len(state.task_ids))
+    # Swap-remove so the id cannot be picked again while the request is in flight
+    state.task_ids[index] = state.task_ids[-1]
+    task_id = state.task_ids.pop()
+    return await client.delete(f"/tasks/{task_id}")
+
+async def op_bulk_create(client, state):
+    res = await client.post("/tasks/bulk", json=[
+        {"title": f"Bulk benchmark task {i}", "list": state.rng.choice(state.lists)} for i in range(100)
+    ])
+    if res.status_code == 200:
+        state.task_ids.extend(item["task"]["id"] for item in res.json() if item["status"] == 201)
+    return res
+
+async def op_create_delete_list(client, state):
+    state.list_counter += 1
+    name = f"bench-{id(state)}-{state.list_counter}"
+    res = await client.post("/lists", json={"name": name})
+    if res.status_code != 201:
+        return res
+    return await client.delete(f"/lists/{name}")
+
+OPERATIONS: Dict[str, Callable] = {
+    name[3:]: func for name, func in globals().items() if name.startswith("op_")
+}
+
+
+# --- RUNNER ---
+
+class OpStats:
+    def __init__(self):
+        self.latencies: List[float] = []
+        self.errors = 0
+
+    def record(self, latency: float, ok: bool):
+        self.latencies.append(latency)
+        if not ok:
+            self.errors += 1
+
+    def summary(self, elapsed: float) -> dict:
+        latencies = sorted(self.latencies)
+        ms = [latency * 1000 for latency in latencies]
+        return {
+            "requests": len(ms),
+            "errors": self.errors,
+            "rps": len(ms) / elapsed if elapsed else 0.0,
+            "mean_ms": sum(ms) / len(ms) if ms else 0.0,
+            "p50_ms": percentile(ms, 50),
+            "p90_ms": percentile(ms, 90),
+            "p99_ms": percentile(ms, 99),
+            "max_ms": ms[-1] if ms else 0.0,
+            "histogram": histogram(ms),
+        }
+
+
+def histogram(ms: List[float]) -> List[int]:
+    """Counts per HISTOGRAM_BOUNDS_MS bucket, plus one overflow bucket"""
+    counts = [0] * (len(HISTOGRAM_BOUNDS_MS) + 1)
+    bucket = 0
+    for value in ms:  # sorted, so buckets only move forward
+        while bucket < len(HISTOGRAM_BOUNDS_MS) and value > HISTOGRAM_BOUNDS_MS[bucket]:
+            bucket += 1
+        counts[bucket] += 1
+    return counts
+
+
+async def seed(client: httpx.AsyncClient, state: BenchState, config: SyntheticConfig, count: int):
+    """Create the benchmark lists and `count` synthetic tasks through /tasks/bulk"""
+    existing = {list_obj["name"] for list_obj in (await client.get("/lists")).json()}
+    for name in config.lists:
+        if name not in existing:
+            await client.post("/lists", json={"name": name})
+    lines = generate_ndjson(config, count)
+    start = time.perf_counter()
+    while True:
+        batch = [line for _, line in zip(range(SEED_BATCH_SIZE), lines)]
+        if not batch:
+            break
+        res = await client.post("/tasks/bulk", content="".join(batch),
+                                headers={"Content-Type": "application/x-ndjson"})
+        res.raise_for_status()
+        state.task_ids.extend(item["task"]["id"] for item in res.json() if item["status"] == 201)
+    print(f"🌱 Seeded {len(state.task_ids)} tasks in {time.perf_counter() - start:.2f} seconds")
+
+
+async def run_mix(client: httpx.AsyncClient, state: BenchState, mix: Dict[str, float],
+                  concurrency: int, duration: float) -> Dict[str, OpStats]:
+    names = list(mix)
+    weights = [mix[name] for name in names]
+    stats = {name: OpStats() for name in names}
+    deadline = time.perf_counter() + duration
+
+    async def worker():
+        while time.perf_counter() < deadline:
+            name = state.rng.choices(names, weights)[0]
+            start = time.perf_counter()
+            try:
+                res = await OPERATIONS[name](client, state)
+                ok = res.status_code < 400
+            except httpx.HTTPError:
+                ok = False
+            stats[name].record(time.perf_counter() - start, ok)
+
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    return stats
+
+
+def make_client(concurrency: int, in_process: bool = False) -> httpx.AsyncClient:
+    if in_process:
+        from in_process import async_client, reset_store
+        reset_store()
+        return async_client(timeout=60)
+    limits = httpx.Limits(max_connections=concurrency, max_keepalive_connections=concurrency)
+    return httpx.AsyncClient(base_url=API_BASE, limits=limits, timeout=60)
+
+
+async def benchmark(args) -> dict:
+    rng = random.Random(args.seed)
+    config = SyntheticConfig(seed=args.seed, lists=BENCH_LISTS)
+    state = BenchState(rng, config)
+    async with make_client(args.concurrency, args.in_process) as client:
+        await seed(client, state, config, args.dataset)
+        if args.warmup:
+            await run_mix(client, state, MIXES[args.mix], args.concurrency, args.warmup)
+        start = time.perf_counter()
+        stats = await run_mix(client, state, MIXES[args.mix], args.concurrency, args.duration)
+        elapsed = time.perf_counter() - start
+
+    total = OpStats()
+    for op_stats in stats.values():
+        total.latencies.extend(op_stats.latencies)
+        total.errors += op_stats.errors
+    return {
+        "label": args.label,
+        "timestamp": datetime.now().isoformat(timespec="seconds"),
+        "config": {
+            "target": f"in-process {args.app} app" if args.in_process else API_BASE,
+            "mix": args.mix, "concurrency": args.concurrency,
+            "dataset": args.dataset, "duration": args.duration, "seed": args.seed,
+        },
+        "histogram_bounds_ms": HISTOGRAM_BOUNDS_MS,
+        "total": total.summary(elapsed),
+        "operations": {name: op_stats.summary(elapsed) for name, op_stats in stats.items()},
+    }
+
+
+# --- REPORTING ---
+
+def print_report(result: dict):
+    cfg = result["config"]
+    print(f"\n📋 {cfg['mix']} mix, concurrency {cfg['concurrency']}, {cfg['dataset']} seeded tasks, "
+          f"{cfg['duration']}s against {cfg['target']}")
+    print(f"\n{'operation':<20}{'requests':>10}{'errors':>8}{'rps':>10}{'p50 ms':>10}{'p90 ms':>10}"
+          f"{'p99 ms':>10}{'max ms':>10}")
+    rows = list(result["operations"].items()) + [("TOTAL", result["total"])]
+    for name, s in rows:
+        print(f"{name:<20}{s['requests']:>10}{s['errors']:>8}{s['rps']:>10.1f}{s['p50_ms']:>10.2f}"
+              f"{s['p90_ms']:>10.2f}{s['p99_ms']:>10.2f}{s['max_ms']:>10.2f}")
+
+    print("\n⏱️ Latency histogram (all operations):")
+    counts = result["total"]["histogram"]
+    peak = max(counts) or 1
+    labels = [f"≤{bound:g} ms" for bound in result["histogram_bounds_ms"]]
+    labels.append(f">{result['histogram_bounds_ms'][-1]:g} ms")
+    for label, count in zip(labels, counts):
+        if count:
+            print(f"  {label:>10} {count:>9} {'█' * max(1, round(40 * count / peak))}")
+
+
+def compare(result: dict, baseline: dict, threshold: float) -> bool:
+    """Print per-operation changes against a baseline; True if anything regressed"""
+    print(f"\n🔍 Compared with {baseline.get('label') or 'baseline'} ({baseline['timestamp']}):")
+    regressed = False
+    for name, s in list(result["operations"].items()) + [("TOTAL", result["total"])]:
+        base = baseline["total"] if name == "TOTAL" else baseline["operations"].get(name)
+        if not base or not base["requests"]:
+            continue
+        rps_change = (s["rps"] - base["rps"]) / base["rps"] if base["rps"] else 0.0
+        p99_change = (s["p99_ms"] - base["p99_ms"]) / base["p99_ms"] if base["p99_ms"] else 0.0
+        worse = rps_change < -threshold or p99_change > threshold
+        regressed |= worse
+        print(f"  {'❌' if worse else '✅'} {name:<20} rps {rps_change:+7.1%}   p99 {p99_change:+7.1%}")
+    return regressed
+
+
+if __name__ == "__main__":
+    import argparse
+    parser = argparse.ArgumentParser(description="Benchmark every To-Do API endpoint")
+    parser.add_argument("--mix", choices=sorted(MIXES), default="read-heavy")
+    parser.add_argument("--concurrency", type=int, default=32)
+    parser.add_argument("--dataset", type=int, default=10000, help="Tasks to seed before measuring")
+    parser.add_argument("--duration", type=float, default=10.0, help="Seconds to measure")
+    parser.add_argument("--warmup", type=float, default=2.0, help="Seconds to run before measuring")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--in-process", action="store_true",
+                        help="Benchmark reference_API through its ASGI interface instead of over HTTP")
+    parser.add_argument("--app", choices=["sync", "async"], default=os.getenv("TODO_APP", "sync"),
+                        help="App to load with --in-process: threadpool handlers or async handlers")
+    parser.add_argument("--label", default="", help="Name for this run, e.g. the backend")
+    parser.add_argument("--output", help="Write results as JSON to this file")
+    parser.add_argument("--compare", help="JSON results of an earlier run to compare against")
+    parser.add_argument("--threshold", type=float, default=0.10,
+                        help="Relative rps drop or p99 increase that counts as a regression")
+
+    args = parser.parse_args()
+    os.environ["TODO_APP"] = args.app
+    result = asyncio.run(benchmark(args))
+    print_report(result)
+
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(result, f, indent=2)
+        print(f"\n💾 Results written to {args.output}")
+
+    if args.compare:
+        with open(args.compare) as f:
+            baseline = json.load(f)
+        if compare(result, baseline, args.threshold):
+            sys.exit(1)
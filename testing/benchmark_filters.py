@@ -0,0 +1,93 @@
+"""Compare the in-memory store's filter engines on the same synthetic dataset.
+
+Loads one TaskStore per engine straight from synthetic_tasks.py (no server,
+no HTTP) and times GET /tasks-style queries, both fully drained and as a
+first page, so only filter evaluation and ordering are measured.
+
+    python testing/benchmark_filters.py --dataset 1000000
+"""
+import sys
+import time
+from typing import Callable, Dict, List
+
+from in_process import ROOT
+from synthetic_tasks import SyntheticConfig, generate_tasks, tag_vocabulary
+
+sys.path.insert(0, ROOT)
+from reference_API.models import TaskCreate  # noqa: E402
+from reference_API.store import TaskStore  # noqa: E402
+
+ENGINES = ["index", "numpy"]
+PAGE_SIZE = 50
+
+
+def load(engine: str, tasks: List[dict]) -> TaskStore:
+    store = TaskStore(engine=engine)
+    store.create_list("Bench")
+    store.create_tasks(tasks)
+    return store
+
+
+def queries(config: SyntheticConfig) -> Dict[str, dict]:
+    tags = tag_vocabulary(config.tag_count)
+    return {
+        "list": {"list_name": "Work"},
+        "completed": {"completed": False},
+        "one tag": {"tags": tags[:1]},
+        "rare tag": {"tags": tags[-1:]},
+        "three tags": {"tags": tags[:3]},
+        "list+completed+tag": {"list_name": "Personal", "completed": True, "tags": tags[1:2]},
+    }
+
+
+def time_query(run: Callable[[], object], min_seconds: float) -> float:
+    """Mean milliseconds per call, repeating until `min_seconds` have passed"""
+    calls, start = 0, time.perf_counter()
+    while True:
+        run()
+        calls += 1
+        elapsed = time.perf_counter() - start
+        if elapsed >= min_seconds:
+            return elapsed / calls * 1000
+
+
+def benchmark(dataset: int, seed: int, min_seconds: float) -> Dict[str, Dict[str, float]]:
+    config = SyntheticConfig(seed=seed, lists={"Personal": 5.0, "Work": 4.0, "Bench": 1.0})
+    tasks = [TaskCreate(**task).model_dump() for task in generate_tasks(config, dataset)]
+    results: Dict[str, Dict[str, float]] = {}
+    for engine in ENGINES:
+        try:
+            start = time.perf_counter()
+            store = load(engine, tasks)
+        except RuntimeError as e:
+            print(f"⚠️ Skipping {engine}: {e}")
+            continue
+        print(f"📦 {engine}: loaded {dataset} tasks in {time.perf_counter() - start:.2f} seconds")
+        for name, filters in queries(config).items():
+            results.setdefault(name, {})
+            results[name][f"{engine} all"] = time_query(lambda: sum(1 for _ in store.query(**filters)), min_seconds)
+            results[name][f"{engine} page"] = time_query(lambda: list(store.query(**filters, limit=PAGE_SIZE)),
+                                                         min_seconds)
+    return results
+
+
+def print_report(results: Dict[str, Dict[str, float]]):
+    columns = [f"{engine} {kind}" for kind in ("all", "page") for engine in ENGINES]
+    print(f"\n{'query':<20}" + "".join(f"{column + ' ms':>14}" for column in columns) + f"{'page speedup':>14}")
+    for name, timings in results.items():
+        row = "".join(f"{timings[c]:>14.2f}" if c in timings else f"{'-':>14}" for c in columns)
+        speedup = ""
+        if "numpy page" in timings:
+            speedup = f"{timings['index page'] / timings['numpy page']:.1f}x"
+        print(f"{name:<20}{row}{speedup:>14}")
+
+
+if __name__ == "__main__":
+    import argparse
+    parser = argparse.ArgumentParser(description="Compare the in-memory filter engines")
+    parser.add_argument("--dataset", type=int, default=200000, help="Tasks to load into each store")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--min-seconds", type=float, default=1.0, help="Time spent on each measurement")
+
+    args = parser.parse_args()
+    print_report(benchmark(args.dataset, args.seed, args.min_seconds))
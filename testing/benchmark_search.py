@@ -0,0 +1,97 @@
+"""Time full-text search on both storage backends over the same synthetic dataset.
+
+Loads a TaskStore and a SQLite store straight from synthetic_tasks.py (no
+server, no HTTP) and times GET /tasks/search-style queries: whole words,
+typeahead prefixes and searches combined with filters. Also reports how long
+the in-memory index takes to build on first use and what keeping it up to
+date adds to each task write.
+
+    python testing/benchmark_search.py --dataset 200000
+"""
+import os
+import sys
+import tempfile
+import time
+from typing import Dict, List
+
+from benchmark_filters import time_query
+from in_process import ROOT
+from synthetic_tasks import SyntheticConfig, generate_tasks
+
+sys.path.insert(0, ROOT)
+from reference_API.models import TaskCreate  # noqa: E402
+from reference_API.sqlite_store import SQLiteTaskStore  # noqa: E402
+from reference_API.store import TaskStore  # noqa: E402
+
+LIMIT = 20
+BATCH_SIZE = 5000
+WRITES = 2000
+
+QUERIES: Dict[str, dict] = {
+    "one word": {"q": "report"},
+    "two words": {"q": "review report"},
+    "description word": {"q": "team"},
+    "prefix (typeahead)": {"q": "dentist app"},
+    "short prefix": {"q": "b"},
+    "word + list": {"q": "budget", "list_name": "Work"},
+    "word + filters": {"q": "plan", "list_name": "Personal", "completed": False, "tags": ["work", "urgent"]},
+    "no match": {"q": "zebra"},
+}
+
+
+def load(store, tasks: List[dict]):
+    store.create_list("Bench")
+    for start in range(0, len(tasks), BATCH_SIZE):
+        store.create_tasks(tasks[start:start + BATCH_SIZE])
+    return store
+
+
+def write_cost(store, tasks: List[dict]) -> float:
+    """Mean milliseconds to create and then retitle one task"""
+    start = time.perf_counter()
+    for task in tasks[:WRITES]:
+        created = store.create_task(task)
+        store.update_task(created["id"], {"title": created["title"] + " again"})
+    return (time.perf_counter() - start) / WRITES * 1000
+
+
+def benchmark(dataset: int, seed: int, min_seconds: float) -> Dict[str, Dict[str, float]]:
+    config = SyntheticConfig(seed=seed, lists={"Personal": 5.0, "Work": 4.0, "Bench": 1.0})
+    tasks = [TaskCreate(**task).model_dump() for task in generate_tasks(config, dataset)]
+    stores = {
+        "memory": TaskStore(),
+        "sqlite": SQLiteTaskStore(os.path.join(tempfile.mkdtemp(prefix="todo-search-"), "todo.db")),
+    }
+    results: Dict[str, Dict[str, float]] = {}
+    for backend, store in stores.items():
+        start = time.perf_counter()
+        load(store, tasks)
+        print(f"📦 {backend}: loaded {dataset} tasks in {time.perf_counter() - start:.2f} seconds")
+        if backend == "memory":
+            unindexed = write_cost(store, tasks)
+            start = time.perf_counter()
+            store.search("warm up")
+            print(f"🔎 memory: built the search index in {time.perf_counter() - start:.2f} seconds")
+            indexed = write_cost(store, tasks)
+            print(f"✏️  memory: create + update costs {unindexed:.3f} ms without the index, {indexed:.3f} ms with it")
+        for name, params in QUERIES.items():
+            results.setdefault(name, {})[backend] = time_query(lambda: store.search(**params, limit=LIMIT), min_seconds)
+            results[name]["hits"] = len(store.search(**params, limit=LIMIT))
+    return results
+
+
+def print_report(results: Dict[str, Dict[str, float]]):
+    print(f"\n{'query':<22}{'hits':>6}{'memory ms':>12}{'sqlite ms':>12}")
+    for name, timings in results.items():
+        print(f"{name:<22}{timings['hits']:>6}{timings['memory']:>12.3f}{timings['sqlite']:>12.3f}")
+
+
+if __name__ == "__main__":
+    import argparse
+    parser = argparse.ArgumentParser(description="Time full-text search on both storage backends")
+    parser.add_argument("--dataset", type=int, default=200000, help="Tasks to load into each store")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--min-seconds", type=float, default=1.0, help="Time spent on each measurement")
+
+    args = parser.parse_args()
+    print_report(benchmark(args.dataset, args.seed, args.min_seconds))
@@ -0,0 +1,198 @@
+"""Check that a journaled in-memory store comes back from its data directory unchanged.
+
+Calls the storage layer directly (no server, no HTTP). Each check writes to a
+TaskStore with a Journal in a fresh directory, closes it, recovers a new store
+from the directory and compares the two states (tasks, their listing orders
+and the lists):
+
+1. Log replay: every kind of write, recovered from the log alone.
+2. Snapshot and log tail: a checkpoint, then more writes after it.
+3. Background snapshots: concurrent writers with a small TODO_SNAPSHOT_BYTES,
+   so the log rotates and snapshots are taken while writes go on.
+4. Torn tail: the last frame cut short, as by a crash mid-write.
+5. Rejected writes: a task that cannot be encoded, and a log that can no
+   longer be written, must leave both the store and the directory unchanged.
+
+Exits non-zero if any state differs.
+
+    python testing/check_journal.py
+"""
+import os
+import sys
+import tempfile
+import threading
+import time
+from datetime import date, datetime, timedelta, timezone
+from typing import List
+
+from in_process import ROOT
+
+sys.path.insert(0, ROOT)
+from reference_API.journal import Journal, JournalError  # noqa: E402
+from reference_API.store import TaskStore  # noqa: E402
+
+
+def open_journaled(directory: str, snapshot_bytes: int = 64 * 1024 * 1024) -> TaskStore:
+    store = TaskStore()
+    Journal(directory, snapshot_bytes=snapshot_bytes).recover(store)
+    return store
+
+
+def state(store: TaskStore):
+    return (
+        dict(store.list_counts()),
+        [dict(task) for task in store.query()],
+        [task["id"] for task in store.query(sort="due_date")],
+    )
+
+
+def task(title: str, list_name: str = "Personal", **fields) -> dict:
+    return {"title": title, "description": None, "tags": [], "list": list_name, "completed": False,
+            "due_date": None, "recurrence": None, "recurrence_end_date": None, **fields}
+
+
+def reopen_problems(name: str, directory: str, store: TaskStore) -> List[str]:
+    """Close `store`, recover a new one from `directory` and compare; returns the new store's problems"""
+    before = state(store)
+    store.close()
+    recovered = open_journaled(directory)
+    after = state(recovered)
+    recovered.close()
+    if after == before:
+        return []
+    return [f"{name}: recovered {len(after[1])} tasks and lists {after[0]}, "
+            f"expected {len(before[1])} tasks and lists {before[0]}"]
+
+
+def write_everything(store: TaskStore):
+    store.create_list("Errands")
+    aware = datetime(2030, 1, 2, 9, 30, tzinfo=timezone(timedelta(hours=5)))
+    first = store.create_task(task("first", tags=["x", "y"], due_date=aware, description="dé"))
+    weekly = store.create_task(task("weekly", "Errands", due_date=datetime(2030, 1, 1), recurrence="weekly",
+                                    recurrence_end_date=date(2030, 3, 1)))
+    store.create_tasks([task(f"bulk {i}", tags=[f"t{i % 3}"]) for i in range(100)])
+    # Aware due dates whose UTC time falls outside datetime's range
+    store.create_task(task("earliest", due_date=datetime(1, 1, 1, tzinfo=timezone(timedelta(hours=5)))))
+    store.create_task(task("latest", due_date=datetime(9999, 12, 31, 23, tzinfo=timezone(timedelta(hours=-5)))))
+    # Longer than a 16-bit length field could hold
+    store.create_task(task("long", description="d" * 70000, tags=["t" * 70000]))
+    store.update_task(first["id"], {"completed": True, "tags": ["z"]})
+    store.update_tasks({"tags": ["t9"]}, tags=["t2"])
+    store.delete_task(weekly["id"])
+    store.delete_tasks(tags=["t1"])
+    store.delete_list("Errands")
+
+
+def check_replay() -> List[str]:
+    directory = tempfile.mkdtemp(prefix="todo-journal-")
+    store = open_journaled(directory)
+    write_everything(store)
+    return reopen_problems("log replay", directory, store)
+
+
+def check_snapshot() -> List[str]:
+    directory = tempfile.mkdtemp(prefix="todo-journal-")
+    store = open_journaled(directory)
+    write_everything(store)
+    store.checkpoint()
+    store.create_task(task("after the snapshot"))
+    store.create_list("Later")
+    problems = reopen_problems("snapshot and log tail", directory, store)
+    if not any(name.startswith("snapshot-") for name in os.listdir(directory)):
+        problems.append("snapshot and log tail: no snapshot was written")
+    return problems
+
+
+def check_background_snapshots(threads: int = 8, per_thread: int = 300) -> List[str]:
+    directory = tempfile.mkdtemp(prefix="todo-journal-")
+    store = open_journaled(directory, snapshot_bytes=50000)
+
+    def worker(index: int):
+        for k in range(per_thread):
+            created = store.create_task(task(f"task {index}-{k}", tags=[f"w{index}"]))
+            if k % 10 == 0:
+                store.update_task(created["id"], {"completed": True})
+
+    workers = [threading.Thread(target=worker, args=(i,)) for i in range(threads)]
+    for thread in workers:
+        thread.start()
+    for thread in workers:
+        thread.join()
+    # Let a snapshot still being written finish before closing
+    while store.journal._snapshotting:
+        time.sleep(0.01)
+    return reopen_problems("background snapshots", directory, store)
+
+
+def check_torn_tail() -> List[str]:
+    directory = tempfile.mkdtemp(prefix="todo-journal-")
+    store = open_journaled(directory)
+    write_everything(store)
+    before = state(store)
+    store.create_task(task("torn"))
+    store.close()
+    log = max(name for name in os.listdir(directory) if name.startswith("log-"))
+    path = os.path.join(directory, log)
+    with open(path, "r+b") as f:
+        f.truncate(os.path.getsize(path) - 3)
+    recovered = open_journaled(directory)
+    after = state(recovered)
+    recovered.close()
+    return [] if after == before else ["torn tail: the intact writes before the torn frame were not all recovered"]
+
+
+def check_rejected_writes() -> List[str]:
+    problems = []
+    directory = tempfile.mkdtemp(prefix="todo-journal-")
+    store = open_journaled(directory)
+    kept = store.create_task(task("kept"))
+    before = state(store)
+    try:
+        # A lone surrogate cannot be encoded as UTF-8
+        store.update_task(kept["id"], {"title": "\ud800"})
+        problems.append("rejected writes: an unencodable update was accepted")
+    except UnicodeEncodeError:
+        pass
+    try:
+        store.create_tasks([task("fine"), task("\ud800")])
+        problems.append("rejected writes: an unencodable bulk create was accepted")
+    except UnicodeEncodeError:
+        pass
+    if state(store) != before:
+        problems.append("rejected writes: an unencodable write changed the store")
+
+    # Make the next write() fail, as a full or failing disk would
+    journal = store.journal
+    os.close(journal._fd)
+    journal._fd = os.open(os.devnull, os.O_RDONLY)
+    try:
+        store.create_task(task("lost"))
+        problems.append("rejected writes: a write that never reached the log returned")
+    except JournalError:
+        pass
+    failed = state(store)
+    try:
+        store.create_task(task("after the failure"))
+        problems.append("rejected writes: the store took a write after the log failed")
+    except JournalError:
+        pass
+    if state(store) != failed:
+        problems.append("rejected writes: a write after the log failed changed the store")
+    store.close()
+    recovered = open_journaled(directory)
+    if state(recovered) != before:
+        problems.append("rejected writes: the directory does not hold the state before the failure")
+    recovered.close()
+    return problems
+
+
+if __name__ == "__main__":
+    failures = []
+    for check in (check_replay, check_snapshot, check_background_snapshots, check_torn_tail, check_rejected_writes):
+        failures += check()
+    if failures:
+        print("❌ Recovered state differs:")
+        for failure in failures:
+            print(f"  - {failure}")
+        sys.exit(1)
+    print("✅ Every store recovered unchanged")
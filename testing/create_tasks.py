@@ -1,17 +1,22 @@
-from openai import OpenAI
 from dotenv import load_dotenv
 import os, json
+import asyncio
 import httpx
-from typing import List
+from typing import List, Optional
 import time
 
 load_dotenv()
-api_key = os.getenv("OPENAI_API_KEY")
-client = OpenAI(api_key=api_key)
 
 API_BASE = os.getenv("TODO_API_BASE_URL", "http://localhost:8000")
+BULK_BATCH_SIZE = 1000
+RETRY_ATTEMPTS = 5
+RETRY_BACKOFF = 0.1  # seconds, doubled after every failed attempt
 
 def generate_task_ideas(keywords: List[str], num_tasks: int, list_name: str = None) -> List[dict]:
+    # Imported here so the API helpers below work on machines without OpenAI access
+    from openai import OpenAI
+    client = OpenAI(api_key=os.getenv("OPENAI_API_KEY"))
+
     prompt = (
         f"Generate {num_tasks} realistic to-do tasks related to: {', '.join(keywords)}.\n"
         "Each task should be in JSON format like:\n"
@@ -42,51 +47,113 @@ def generate_task_ideas(keywords: List[str], num_tasks: int, list_name: str = No
         print(content)
         return []
 
-def post_tasks_to_api(tasks: List[dict]):
+def api_client() -> httpx.Client:
+    """Client for API_BASE; pass one to the helpers below so they share its connection pool"""
+    return httpx.Client(base_url=API_BASE, timeout=60)
+
+def post_tasks_to_api(client: httpx.Client, tasks: List[dict]):
+    """Post tasks through POST /tasks/bulk, BULK_BATCH_SIZE tasks per request"""
     start_time = time.time()
-    with httpx.Client() as client:
-        success = 0
-        for i, task in enumerate(tasks):
-            res = client.post(f"{API_BASE}/tasks", json=task)
-            if res.status_code == 201:
-                print(f"✅ Task {i+1}: {task['title']}")
+    success = 0
+    for offset in range(0, len(tasks), BULK_BATCH_SIZE):
+        batch = tasks[offset:offset + BULK_BATCH_SIZE]
+        res = client.post("/tasks/bulk", json=batch)
+        if res.status_code != 200:
+            print(f"❌ Tasks {offset+1}-{offset+len(batch)} failed: {res.status_code} {res.text}")
+            continue
+        for item in res.json():
+            i = offset + item["index"]
+            if item["status"] == 201:
+                print(f"✅ Task {i+1}: {tasks[i]['title']}")
                 success += 1
             else:
-                print(f"❌ Task {i+1} failed: {res.status_code} {res.text}")
-        elapsed_time = time.time() - start_time
-        print(f"\n📊 {success}/{len(tasks)} tasks posted successfully in {elapsed_time:.2f} seconds.")
+                print(f"❌ Task {i+1} failed: {item['status']} {item['detail']}")
+    elapsed_time = time.time() - start_time
+    print(f"\n📊 {success}/{len(tasks)} tasks posted successfully in {elapsed_time:.2f} seconds.")
+
+def percentile(sorted_values: List[float], pct: float) -> float:
+    """Nearest-rank percentile of an already sorted list"""
+    if not sorted_values:
+        return 0.0
+    rank = max(0, min(len(sorted_values) - 1, round(pct / 100 * len(sorted_values)) - 1))
+    return sorted_values[rank]
+
+async def post_task_with_retry(client: httpx.AsyncClient, semaphore: asyncio.Semaphore,
+                               task: dict, latencies: List[float]) -> Optional[httpx.Response]:
+    """POST one task, retrying with exponential backoff on 5xx or connection errors"""
+    res = None
+    for attempt in range(RETRY_ATTEMPTS):
+        # Only the request itself holds a slot; backoff sleeps do not
+        async with semaphore:
+            start = time.perf_counter()
+            try:
+                res = await client.post("/tasks", json=task)
+            except httpx.TransportError:
+                res = None
+            latencies.append(time.perf_counter() - start)
+        if res is not None and res.status_code < 500:
+            return res
+        if attempt < RETRY_ATTEMPTS - 1:
+            await asyncio.sleep(RETRY_BACKOFF * 2 ** attempt)
+    return res
+
+async def post_tasks_concurrently(tasks: List[dict], concurrency: int):
+    """Post tasks one per request with up to `concurrency` requests in flight"""
+    start_time = time.time()
+    semaphore = asyncio.Semaphore(concurrency)
+    latencies: List[float] = []
+    limits = httpx.Limits(max_connections=concurrency, max_keepalive_connections=concurrency)
+    async with httpx.AsyncClient(base_url=API_BASE, limits=limits, timeout=30) as client:
+        responses = await asyncio.gather(
+            *(post_task_with_retry(client, semaphore, task, latencies) for task in tasks)
+        )
+
+    success = 0
+    for i, (task, res) in enumerate(zip(tasks, responses)):
+        if res is not None and res.status_code == 201:
+            print(f"✅ Task {i+1}: {task['title']}")
+            success += 1
+        elif res is not None:
+            print(f"❌ Task {i+1} failed: {res.status_code} {res.text}")
+        else:
+            print(f"❌ Task {i+1} failed: connection error")
 
-def get_all_lists():
+    elapsed_time = time.time() - start_time
+    latencies.sort()
+    p50, p95, p99 = (percentile(latencies, pct) * 1000 for pct in (50, 95, 99))
+    print(f"\n📊 {success}/{len(tasks)} tasks posted successfully in {elapsed_time:.2f} seconds "
+          f"({len(tasks) / elapsed_time:.1f} tasks/sec).")
+    print(f"⏱️ Request latency: p50 {p50:.1f} ms, p95 {p95:.1f} ms, p99 {p99:.1f} ms "
+          f"over {len(latencies)} requests")
+
+def get_all_lists(client: httpx.Client):
     """Fetch all available lists from the API"""
-    with httpx.Client() as client:
-        res = client.get(f"{API_BASE}/lists")
-        if res.status_code == 200:
-            return res.json()
-        else:
-            print(f"❌ Failed to get lists: {res.status_code}")
-            return []
+    res = client.get("/lists")
+    if res.status_code == 200:
+        return res.json()
+    else:
+        print(f"❌ Failed to get lists: {res.status_code}")
+        return []
 
-def create_list(name: str):
+def create_list(client: httpx.Client, name: str):
     """Create a new list with the given name"""
-    with httpx.Client() as client:
-        res = client.post(f"{API_BASE}/lists", json={"name": name})
-        if res.status_code == 201:
-            print(f"✅ Created list: {name}")
-            return True
-        else:
-            print(f"❌ Failed to create list: {res.status_code} {res.text}")
-            return False
+    res = client.post("/lists", json={"name": name})
+    if res.status_code == 201:
+        print(f"✅ Created list: {name}")
+        return True
+    else:
+        print(f"❌ Failed to create list: {res.status_code} {res.text}")
+        return False
 
-def delete_list(name: str):
+def delete_list(client: httpx.Client, name: str):
     """Delete a list with the given name"""
-    with httpx.Client() as client:
-        res = client.delete(f"{API_BASE}/lists/{name}")
-        if res.status_code == 204:
-            print(f"✅ Deleted list: {name}")
-            return True
-        else:
-            print(f"❌ Failed to delete list: {res.status_code} {res.text}")
-            return False
+    res = client.delete(f"/lists/{name}")
+    if res.status_code == 204:
+        print(f"✅ Deleted list: {name}")
+        return True
+    else:
+        print(f"❌ Failed to delete list: {res.status_code} {res.text}")
+        return False
 
 if __name__ == "__main__":
     import argparse
@@ -98,58 +165,65 @@ if __name__ == "__main__":
     parser.add_argument("--create-list", help="Create a new list with given name")
     parser.add_argument("--delete-list", help="Delete a list with given name")
     parser.add_argument("--show-lists", action="store_true", help="Show all available lists")
+    parser.add_argument("--concurrency", type=int, default=0,
+                        help="Post tasks individually with N concurrent requests instead of via /tasks/bulk")
 
     args = parser.parse_args()
-
-    # Handle list management
-    if args.show_lists:
-        lists = get_all_lists()
-        print("📋 Available lists:")
-        for list_obj in lists:
-            print(f" - {list_obj['name']}")
-        exit(0)
+    # Every synchronous request below shares this client's connections
+    with api_client() as client:
+        # Handle list management
+        if args.show_lists:
+            lists = get_all_lists(client)
+            print("📋 Available lists:")
+            for list_obj in lists:
+                print(f" - {list_obj['name']}")
+            exit(0)
     
-    if args.create_list:
-        if create_list(args.create_list):
-            print("✅ List created successfully")
-        exit(0)
+        if args.create_list:
+            if create_list(client, args.create_list):
+                print("✅ List created successfully")
+            exit(0)
     
-    if args.delete_list:
-        if delete_list(args.delete_list):
-            print("✅ List deleted successfully")
-        exit(0)
-
-    # Ensure keywords are provided for task generation
-    if not args.keywords:
-        parser.error("--keywords are required for task generation")
-
-    keywords = [k.strip() for k in args.keywords.split(",")]
-    count = args.count
-    list_name = args.list
-
-    # Validate list existence
-    if list_name and not args.dry_run:
-        lists = get_all_lists()
-        list_names = [list_obj['name'] for list_obj in lists]
-        if list_name not in list_names:
-            print(f"⚠️ List '{list_name}' doesn't exist. Creating it now...")
-            if not create_list(list_name):
-                print("❌ Failed to create list. Tasks will use default list.")
-                list_name = None
-
-    # Start timing total execution
-    total_start_time = time.time()
-    print(f"🧠 Generating {count} tasks for: {keywords}...")
-    tasks = generate_task_ideas(keywords, count, list_name)
-
-    if not tasks:
-        print("❌ No tasks generated.")
-    elif args.dry_run:
-        print("📋 Tasks (dry run):")
-        print(json.dumps(tasks, indent=2))
-        total_elapsed = time.time() - total_start_time
-        print(f"\n⏱️ Total execution time: {total_elapsed:.2f} seconds")
-    else:
-        post_tasks_to_api(tasks)
-        total_elapsed = time.time() - total_start_time
-        print(f"⏱️ Total execution time: {total_elapsed:.2f} seconds")
+        if args.delete_list:
+            if delete_list(client, args.delete_list):
+                print("✅ List deleted successfully")
+            exit(0)
+
+        # Ensure keywords are provided for task generation
+        if not args.keywords:
+            parser.error("--keywords are required for task generation")
+
+        keywords = [k.strip() for k in args.keywords.split(",")]
+        count = args.count
+        list_name = args.list
+
+        # Validate list existence
+        if list_name and not args.dry_run:
+            lists = get_all_lists(client)
+            list_names = [list_obj['name'] for list_obj in lists]
+            if list_name not in list_names:
+                print(f"⚠️ List '{list_name}' doesn't exist. Creating it now...")
+                if not create_list(client, list_name):
+                    print("❌ Failed to create list. Tasks will use default list.")
+                    list_name = None
+
+        # Start timing total execution
+        total_start_time = time.time()
+        print(f"🧠 Generating {count} tasks for: {keywords}...")
+        tasks = generate_task_ideas(keywords, count, list_name)
+
+        if not tasks:
+            print("❌ No tasks generated.")
+        elif args.dry_run:
+            print("📋 Tasks (dry run):")
+            print(json.dumps(tasks, indent=2))
+            total_elapsed = time.time() - total_start_time
+            print(f"\n⏱️ Total execution time: {total_elapsed:.2f} seconds")
+        elif args.concurrency > 0:
+            asyncio.run(post_tasks_concurrently(tasks, args.concurrency))
+            total_elapsed = time.time() - total_start_time
+            print(f"⏱️ Total execution time: {total_elapsed:.2f} seconds")
+        else:
+            post_tasks_to_api(client, tasks)
+            total_elapsed = time.time() - total_start_time
+            print(f"⏱️ Total execution time: {total_elapsed:.2f} seconds")
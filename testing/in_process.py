@@ -0,0 +1,61 @@
+"""Run the reference API inside the test process, with no server or socket.
+
+Requests go straight to the ASGI app, so tests and benchmarks measure only
+handler and serialization cost, and every test can start from fresh state.
+"""
+import os
+import sys
+import tempfile
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+IN_PROCESS_URL = "http://testserver"
+
+
+def use_temp_storage():
+    """Point TODO_DB_PATH (TODO_STORAGE=sqlite) or a set TODO_DATA_DIR at a new temporary directory"""
+    if os.getenv("TODO_STORAGE", "memory") == "sqlite":
+        os.environ["TODO_DB_PATH"] = os.path.join(tempfile.mkdtemp(prefix="todo-api-"), "todo.db")
+    elif os.getenv("TODO_DATA_DIR"):
+        os.environ["TODO_DATA_DIR"] = tempfile.mkdtemp(prefix="todo-api-")
+
+
+def load_api():
+    """The app module under test, importable from testing/.
+
+    reference_API.api_skeleton by default; TODO_APP=async selects
+    reference_API.async_api instead. The import opens the app's store, so
+    the first one does it on temporary storage rather than todo.db in the
+    working directory.
+    """
+    if ROOT not in sys.path:
+        sys.path.insert(0, ROOT)
+    if not any(name in sys.modules for name in ("reference_API.api_skeleton", "reference_API.async_api")):
+        use_temp_storage()
+    if os.getenv("TODO_APP", "sync") == "async":
+        from reference_API import async_api
+        return async_api
+    from reference_API import api_skeleton
+    return api_skeleton
+
+
+def reset_store():
+    """Give the app a fresh, empty store of the configured TODO_STORAGE backend (and TODO_DATA_DIR)"""
+    api = load_api()
+    from reference_API.store import open_store
+    old = api.store
+    use_temp_storage()
+    api.use_store(open_store())
+    if hasattr(old, "close"):
+        old.close()
+
+
+def sync_client():
+    """httpx.Client-compatible client bound to the in-process app"""
+    from fastapi.testclient import TestClient
+    return TestClient(load_api().app, base_url=IN_PROCESS_URL)
+
+
+def async_client(**kwargs):
+    import httpx
+    transport = httpx.ASGITransport(app=load_api().app)
+    return httpx.AsyncClient(transport=transport, base_url=IN_PROCESS_URL, **kwargs)
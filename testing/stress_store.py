@@ -0,0 +1,255 @@
+"""Hammer a store from many threads and check its invariants afterwards.
+
+Calls the storage layer directly (no server, no HTTP), the way FastAPI's
+threadpool does for the sync handlers, in two phases:
+
+1. Races: threads create the same list names at once (exactly one create
+   per name may win), and create tasks in lists that other threads keep
+   deleting and recreating (no task may end up in a missing list).
+2. Throughput: a mixed read/write workload at each thread count, to show
+   how the store scales.
+
+Afterwards the per-list counts, listings and lists are checked against each
+other. Exits non-zero if any invariant is broken.
+
+With --processes N (SQLite only) the races run in N processes at once, each
+with its own store on the same database file, as `uvicorn --workers N`
+would.
+
+    python testing/stress_store.py --threads 1,2,4,8 --seconds 3
+    TODO_STORAGE=sqlite python testing/stress_store.py
+    TODO_STORAGE=sqlite python testing/stress_store.py --processes 4
+"""
+import multiprocessing
+import os
+import random
+import sys
+import tempfile
+import threading
+import time
+from collections import Counter
+from typing import Callable, List
+
+from in_process import ROOT
+
+sys.path.insert(0, ROOT)
+from reference_API.store import StoreError, open_store  # noqa: E402
+
+RACE_LISTS = 20
+RACE_ROUNDS = 200
+
+
+def fresh_store():
+    if os.getenv("TODO_STORAGE", "memory") == "sqlite":
+        os.environ["TODO_DB_PATH"] = os.path.join(tempfile.mkdtemp(prefix="todo-stress-"), "todo.db")
+    return open_store()
+
+
+def run_threads(count: int, target: Callable[[int], None]):
+    # Start everyone at once so the calls actually overlap
+    barrier = threading.Barrier(count)
+    errors: List[BaseException] = []
+
+    def worker(index: int):
+        barrier.wait()
+        try:
+            target(index)
+        except BaseException as e:  # noqa: BLE001 - reported below
+            errors.append(e)
+
+    threads = [threading.Thread(target=worker, args=(i,)) for i in range(count)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    if errors:
+        raise errors[0]
+
+
+def task(title: str, list_name: str, tags=()) -> dict:
+    return {"title": title, "description": "", "tags": list(tags), "list": list_name, "completed": False,
+            "due_date": None, "recurrence": None, "recurrence_end_date": None}
+
+
+def race_create_list(store, threads: int) -> Counter:
+    """Every thread creates the same names; returns how many creates of each name succeeded"""
+    wins = Counter()
+    lock = threading.Lock()
+
+    def worker(_):
+        for k in range(RACE_LISTS):
+            try:
+                store.create_list(f"Race-{k}")
+            except StoreError:
+                continue
+            with lock:
+                wins[k] += 1
+
+    run_threads(threads, worker)
+    return wins
+
+
+def create_list_problems(wins: Counter) -> List[str]:
+    """Exactly one create per name may succeed"""
+    return [f"list Race-{k} created {wins[k]} times" for k in range(RACE_LISTS) if wins[k] != 1]
+
+
+def race_process(path: str, threads: int, start, results):
+    """Both races on a store of its own over the shared database at `path`"""
+    os.environ["TODO_DB_PATH"] = path
+    store = open_store()
+    start.wait()
+    wins = race_create_list(store, threads)
+    start.wait()
+    race_insert_delete(store, threads)
+    results.put(wins)
+    store.close()
+
+
+def race_processes(processes: int, threads: int) -> List[str]:
+    store = fresh_store()
+    start = multiprocessing.Barrier(processes)
+    results = multiprocessing.Queue()
+    workers = [
+        multiprocessing.Process(target=race_process, args=(os.environ["TODO_DB_PATH"], threads, start, results))
+        for _ in range(processes)
+    ]
+    for worker in workers:
+        worker.start()
+    wins = sum((results.get() for _ in workers), Counter())
+    for worker in workers:
+        worker.join()
+    failures = [f"a race process exited with {w.exitcode}" for w in workers if w.exitcode]
+    return failures + create_list_problems(wins) + check_invariants(store)
+
+
+def race_insert_delete(store, threads: int):
+    """Half the threads add tasks to the Race lists while the rest empty, delete and recreate them"""
+    names = [f"Race-{k}" for k in range(RACE_LISTS)]
+
+    def worker(index: int):
+        rng = random.Random(index)
+        for i in range(RACE_ROUNDS):
+            name = rng.choice(names)
+            if index % 2 == 0:
+                try:
+                    created = store.create_task(task(f"race {index}/{i}", name))
+                except StoreError:
+                    continue
+                if rng.random() < 0.5:
+                    try:
+                        store.delete_task(created["id"])
+                    except StoreError:
+                        pass  # already removed by a delete_tasks() on its list
+            else:
+                store.delete_tasks(list_name=name)
+                try:
+                    store.delete_list(name)
+                except StoreError:
+                    pass  # a task slipped in, or another thread deleted it first
+                try:
+                    store.create_list(name)
+                except StoreError:
+                    pass
+
+    run_threads(threads, worker)
+
+
+def check_invariants(store) -> List[str]:
+    problems = []
+    lists = store.get_lists()
+    counts = store.list_counts()
+    tasks = list(store.query())
+    if list(counts) != lists:
+        problems.append(f"list_counts() lists {list(counts)} but get_lists() {lists}")
+    if len(set(lists)) != len(lists):
+        problems.append("duplicate list names")
+    if "Personal" not in lists:
+        problems.append("the Personal list is gone")
+    ids = [t["id"] for t in tasks]
+    if len(set(ids)) != len(ids):
+        problems.append("a task is listed twice")
+    keys = [(t["created_at"], t["id"]) for t in tasks]
+    if keys != sorted(keys):
+        problems.append("listing is out of (created_at, id) order")
+    actual = Counter(t["list"] for t in tasks)
+    for name in actual.keys() - set(lists):
+        problems.append(f"{actual[name]} tasks in missing list {name!r}")
+    for name in lists:
+        if counts.get(name) != actual[name]:
+            problems.append(f"list {name!r} counts {counts.get(name)} tasks but has {actual[name]}")
+        listed = sum(1 for _ in store.query(list_name=name))
+        if listed != actual[name]:
+            problems.append(f"filtering on list {name!r} finds {listed} of its {actual[name]} tasks")
+    return problems
+
+
+def throughput(store, threads: int, seconds: float) -> float:
+    """Operations per second of a mixed workload (70% reads) across `threads`"""
+    store.create_list("Stress")
+    seed = [store.create_task(task(f"seed {i}", "Stress", [f"t{i % 10}"]))["id"] for i in range(1000)]
+    done = [0] * threads
+    deadline = time.perf_counter() + seconds
+
+    def worker(index: int):
+        rng = random.Random(index)
+        ops = 0
+        mine: List[str] = []
+        while time.perf_counter() < deadline:
+            roll = rng.random()
+            if roll < 0.3:
+                store.get_task(rng.choice(seed))
+            elif roll < 0.5:
+                list(store.query(tags=[f"t{rng.randrange(10)}"], limit=50))
+            elif roll < 0.7:
+                list(store.query(list_name="Stress", limit=50))
+            elif roll < 0.85 or not mine:
+                mine.append(store.create_task(task(f"w{index}", "Stress", [f"t{rng.randrange(10)}"]))["id"])
+            elif roll < 0.95:
+                store.update_task(rng.choice(mine), {"completed": True})
+            else:
+                store.delete_task(mine.pop())
+            ops += 1
+        done[index] = ops
+
+    run_threads(threads, worker)
+    return sum(done) / seconds
+
+
+if __name__ == "__main__":
+    import argparse
+    parser = argparse.ArgumentParser(description="Concurrency stress test for the reference store")
+    parser.add_argument("--threads", default="1,2,4,8", help="Comma-separated thread counts")
+    parser.add_argument("--seconds", type=float, default=2.0, help="Length of each throughput run")
+    parser.add_argument("--processes", type=int, default=1,
+                        help="Run the races in this many processes sharing one database (SQLite only)")
+    args = parser.parse_args()
+    thread_counts = [int(n) for n in args.threads.split(",")]
+    if args.processes > 1 and os.getenv("TODO_STORAGE", "memory") != "sqlite":
+        parser.error("--processes needs TODO_STORAGE=sqlite: processes cannot share an in-memory store")
+
+    failures = []
+    for threads in thread_counts:
+        if args.processes > 1:
+            failures += race_processes(args.processes, max(threads, 2))
+            continue
+        store = fresh_store()
+        failures += create_list_problems(race_create_list(store, max(threads, 2)))
+        race_insert_delete(store, max(threads, 2))
+        failures += check_invariants(store)
+
+    print(f"{'threads':>8}{'ops/sec':>12}{'scaling':>10}")
+    baseline = None
+    for threads in thread_counts:
+        store = fresh_store()
+        rate = throughput(store, threads, args.seconds)
+        failures += check_invariants(store)
+        baseline = baseline or rate
+        print(f"{threads:>8}{rate:>12.0f}{rate / baseline:>9.2f}x")
+
+    if failures:
+        print("\n❌ Invariants broken:")
+        for failure in failures:
+            print(f"  - {failure}")
+        sys.exit(1)
+    print("\n✅ All invariants held")
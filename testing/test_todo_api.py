@@ -1,12 +1,53 @@
+import asyncio
 import httpx
 import json
+import os
+import threading
 import uuid
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime, date, timedelta
 
 BASE_URL = "http://localhost:8000"
+client = httpx.Client(timeout=30)
 results = []
 
-def run_test(group, name, func):
+# Called before every test; set by use_in_process_app() to isolate tests
+before_each = None
+
+# Tombstones the app keeps for GET /tasks?since= before compacting; known only in process
+tombstone_limit = None
+
+# The ASGI app under test, set by use_in_process_app(); the change feed tests need it
+app_under_test = None
+
+# Sent as X-Admin-Token to the reference API's /admin routes, which need the server's TODO_ADMIN_TOKEN
+ADMIN_HEADERS = {"X-Admin-Token": os.getenv("TODO_ADMIN_TOKEN", "")}
+
+# Per-thread prefix for list names created by tests, so parallel workers
+# (or several suites against one server) never touch each other's lists
+_worker = threading.local()
+
+def ns(name):
+    """Namespace a list name to the current worker"""
+    return getattr(_worker, "prefix", "") + name
+
+def use_in_process_app():
+    """Run the suite against the app in this process instead of a server"""
+    global BASE_URL, client, before_each, tombstone_limit, app_under_test
+    # Small enough that a test can reach it; each fresh store reads it
+    tombstone_limit = 50
+    os.environ["TODO_TOMBSTONES"] = str(tombstone_limit)
+    if not ADMIN_HEADERS["X-Admin-Token"]:
+        ADMIN_HEADERS["X-Admin-Token"] = os.environ["TODO_ADMIN_TOKEN"] = uuid.uuid4().hex
+    from in_process import IN_PROCESS_URL, load_api, reset_store, sync_client
+    BASE_URL = IN_PROCESS_URL
+    app_under_test = load_api().app
+    client = sync_client()
+    before_each = reset_store
+
+def run_test(group, name, func, results=results):
+    if before_each:
+        before_each()
     try:
         func()
         print(f"  ✅ {name}")
@@ -20,21 +61,27 @@ def run_test(group, name, func):
 
 def cleanup():
     """Attempt to reset the API to a clean state for testing"""
-    # Get all tasks and delete them
     try:
-        r = httpx.get(f"{BASE_URL}/tasks")
+        # The reference API resets in one call; other implementations fall
+        # through to deleting tasks and lists one by one
+        r = client.post(f"{BASE_URL}/admin/reset", headers=ADMIN_HEADERS)
+        if r.status_code == 204:
+            return
+
+        # Get all tasks and delete them
+        r = client.get(f"{BASE_URL}/tasks")
         if r.status_code == 200:
             tasks = r.json()
             for task in tasks:
-                httpx.delete(f"{BASE_URL}/tasks/{task['id']}")
+                client.delete(f"{BASE_URL}/tasks/{task['id']}")
         
         # Get all lists and delete non-default ones
-        r = httpx.get(f"{BASE_URL}/lists")
+        r = client.get(f"{BASE_URL}/lists")
         if r.status_code == 200:
             lists = r.json()
             for list_obj in lists:
                 if list_obj["name"] not in ["Personal", "Work"]:
-                    httpx.delete(f"{BASE_URL}/lists/{list_obj['name']}")
+                    client.delete(f"{BASE_URL}/lists/{list_obj['name']}")
     except Exception as e:
         print(f"Warning: Cleanup failed: {e}")
 
@@ -46,7 +93,7 @@ class TaskTests:
     def test_create_minimal_task():
         """Create a task with only required fields (title)"""
         payload = {"title": "Minimal Task"}
-        r = httpx.post(f"{BASE_URL}/tasks", json=payload)
+        r = client.post(f"{BASE_URL}/tasks", json=payload)
         assert r.status_code == 201, f"Expected 201, got {r.status_code}: {r.text}"
         data = r.json()
         assert data["title"] == "Minimal Task"
@@ -72,7 +119,7 @@ class TaskTests:
             "list": "Work"
         }
         
-        r = httpx.post(f"{BASE_URL}/tasks", json=payload)
+        r = client.post(f"{BASE_URL}/tasks", json=payload)
         assert r.status_code == 201, f"Expected 201, got {r.status_code}: {r.text}"
         data = r.json()
         
@@ -93,15 +140,15 @@ class TaskTests:
     def test_create_task_validation():
         """Test validation rules for task creation"""
         # Missing required field (title)
-        r = httpx.post(f"{BASE_URL}/tasks", json={"description": "No title"})
+        r = client.post(f"{BASE_URL}/tasks", json={"description": "No title"})
         assert r.status_code == 422, f"Expected 422 for missing title, got {r.status_code}"
         
         # Invalid recurrence value
-        r = httpx.post(f"{BASE_URL}/tasks", json={"title": "Invalid Recurrence", "recurrence": "yearly"})
+        r = client.post(f"{BASE_URL}/tasks", json={"title": "Invalid Recurrence", "recurrence": "yearly"})
         assert r.status_code == 422, f"Expected 422 for invalid recurrence, got {r.status_code}"
         
         # Non-existent list
-        r = httpx.post(f"{BASE_URL}/tasks", json={"title": "Invalid List", "list": "NonExistent"})
+        r = client.post(f"{BASE_URL}/tasks", json={"title": "Invalid List", "list": "NonExistent"})
         assert r.status_code == 400, f"Expected 400 for non-existent list, got {r.status_code}"
     
     @staticmethod
@@ -111,14 +158,14 @@ class TaskTests:
         task_id = TaskTests.test_create_minimal_task()
         
         # Get the task by ID
-        r = httpx.get(f"{BASE_URL}/tasks/{task_id}")
+        r = client.get(f"{BASE_URL}/tasks/{task_id}")
         assert r.status_code == 200, f"Expected 200, got {r.status_code}: {r.text}"
         data = r.json()
         assert data["id"] == task_id
         assert data["title"] == "Minimal Task"
         
         # Test non-existent task ID
-        r = httpx.get(f"{BASE_URL}/tasks/{uuid.uuid4()}")
+        r = client.get(f"{BASE_URL}/tasks/{uuid.uuid4()}")
         assert r.status_code == 404, f"Expected 404 for non-existent task, got {r.status_code}"
     
     @staticmethod
@@ -132,7 +179,7 @@ class TaskTests:
             "title": "Updated Title",
             "description": "New description"
         }
-        r = httpx.put(f"{BASE_URL}/tasks/{task_id}", json=update_payload)
+        r = client.put(f"{BASE_URL}/tasks/{task_id}", json=update_payload)
         assert r.status_code == 200, f"Expected 200, got {r.status_code}: {r.text}"
         data = r.json()
         assert data["title"] == "Updated Title"
@@ -140,17 +187,17 @@ class TaskTests:
         
         # Update completion status
         update_payload = {"completed": True}
-        r = httpx.put(f"{BASE_URL}/tasks/{task_id}", json=update_payload)
+        r = client.put(f"{BASE_URL}/tasks/{task_id}", json=update_payload)
         assert r.status_code == 200
         assert r.json()["completed"] is True
         
         # Try to update to a non-existent list
         update_payload = {"list": "NonExistent"}
-        r = httpx.put(f"{BASE_URL}/tasks/{task_id}", json=update_payload)
+        r = client.put(f"{BASE_URL}/tasks/{task_id}", json=update_payload)
         assert r.status_code == 400, f"Expected 400 for non-existent list, got {r.status_code}"
         
         # Try to update non-existent task
-        r = httpx.put(f"{BASE_URL}/tasks/{uuid.uuid4()}", json={"title": "Won't Work"})
+        r = client.put(f"{BASE_URL}/tasks/{uuid.uuid4()}", json={"title": "Won't Work"})
         assert r.status_code == 404, f"Expected 404 for non-existent task, got {r.status_code}"
     
     @staticmethod
@@ -160,26 +207,26 @@ class TaskTests:
         task_id = TaskTests.test_create_minimal_task()
         
         # Delete the task
-        r = httpx.delete(f"{BASE_URL}/tasks/{task_id}")
+        r = client.delete(f"{BASE_URL}/tasks/{task_id}")
         assert r.status_code == 204, f"Expected 204, got {r.status_code}"
         
         # Verify it's gone
-        r = httpx.get(f"{BASE_URL}/tasks/{task_id}")
+        r = client.get(f"{BASE_URL}/tasks/{task_id}")
         assert r.status_code == 404, f"Expected 404 after deletion, got {r.status_code}"
         
         # Try to delete it again
-        r = httpx.delete(f"{BASE_URL}/tasks/{task_id}")
+        r = client.delete(f"{BASE_URL}/tasks/{task_id}")
         assert r.status_code == 404, f"Expected 404 for already deleted task, got {r.status_code}"
     
     @staticmethod
     def test_list_tasks_no_filters():
         """Test listing all tasks without filters"""
         # Create a few tasks
-        httpx.post(f"{BASE_URL}/tasks", json={"title": "Task One"})
-        httpx.post(f"{BASE_URL}/tasks", json={"title": "Task Two"})
+        client.post(f"{BASE_URL}/tasks", json={"title": "Task One"})
+        client.post(f"{BASE_URL}/tasks", json={"title": "Task Two"})
         
         # List all tasks
-        r = httpx.get(f"{BASE_URL}/tasks")
+        r = client.get(f"{BASE_URL}/tasks")
         assert r.status_code == 200, f"Expected 200, got {r.status_code}: {r.text}"
         data = r.json()
         assert isinstance(data, list)
@@ -191,21 +238,21 @@ class TaskTests:
     def test_filter_tasks_by_completion():
         """Test filtering tasks by completion status"""
         # Create completed and non-completed tasks
-        r1 = httpx.post(f"{BASE_URL}/tasks", json={"title": "Completed Task"})
+        r1 = client.post(f"{BASE_URL}/tasks", json={"title": "Completed Task"})
         completed_id = r1.json()["id"]
-        httpx.put(f"{BASE_URL}/tasks/{completed_id}", json={"completed": True})
+        client.put(f"{BASE_URL}/tasks/{completed_id}", json={"completed": True})
         
-        httpx.post(f"{BASE_URL}/tasks", json={"title": "Not Completed Task"})
+        client.post(f"{BASE_URL}/tasks", json={"title": "Not Completed Task"})
         
         # Get only completed tasks
-        r = httpx.get(f"{BASE_URL}/tasks", params={"completed": "true"})
+        r = client.get(f"{BASE_URL}/tasks", params={"completed": "true"})
         assert r.status_code == 200
         data = r.json()
         assert all(task["completed"] is True for task in data)
         assert any(task["title"] == "Completed Task" for task in data)
         
         # Get only non-completed tasks
-        r = httpx.get(f"{BASE_URL}/tasks", params={"completed": "false"})
+        r = client.get(f"{BASE_URL}/tasks", params={"completed": "false"})
         assert r.status_code == 200
         data = r.json()
         assert all(task["completed"] is False for task in data)
@@ -215,18 +262,18 @@ class TaskTests:
     def test_filter_tasks_by_list():
         """Test filtering tasks by list"""
         # Create tasks in different lists
-        httpx.post(f"{BASE_URL}/tasks", json={"title": "Personal Task", "list": "Personal"})
-        httpx.post(f"{BASE_URL}/tasks", json={"title": "Work Task", "list": "Work"})
+        client.post(f"{BASE_URL}/tasks", json={"title": "Personal Task", "list": "Personal"})
+        client.post(f"{BASE_URL}/tasks", json={"title": "Work Task", "list": "Work"})
         
         # Filter by Personal list
-        r = httpx.get(f"{BASE_URL}/tasks", params={"list": "Personal"})
+        r = client.get(f"{BASE_URL}/tasks", params={"list": "Personal"})
         assert r.status_code == 200
         data = r.json()
         assert all(task["list"] == "Personal" for task in data)
         assert any(task["title"] == "Personal Task" for task in data)
         
         # Filter by Work list
-        r = httpx.get(f"{BASE_URL}/tasks", params={"list": "Work"})
+        r = client.get(f"{BASE_URL}/tasks", params={"list": "Work"})
         assert r.status_code == 200
         data = r.json()
         assert all(task["list"] == "Work" for task in data)
@@ -236,12 +283,12 @@ class TaskTests:
     def test_filter_tasks_by_tags():
         """Test filtering tasks by tags"""
         # Create tasks with different tags
-        httpx.post(f"{BASE_URL}/tasks", json={"title": "Project Task", "tags": ["project", "important"]})
-        httpx.post(f"{BASE_URL}/tasks", json={"title": "Meeting Task", "tags": ["meeting", "important"]})
-        httpx.post(f"{BASE_URL}/tasks", json={"title": "No Tags Task"})
+        client.post(f"{BASE_URL}/tasks", json={"title": "Project Task", "tags": ["project", "important"]})
+        client.post(f"{BASE_URL}/tasks", json={"title": "Meeting Task", "tags": ["meeting", "important"]})
+        client.post(f"{BASE_URL}/tasks", json={"title": "No Tags Task"})
         
         # Filter by single tag
-        r = httpx.get(f"{BASE_URL}/tasks", params={"tags": "project"})
+        r = client.get(f"{BASE_URL}/tasks", params={"tags": "project"})
         assert r.status_code == 200
         data = r.json()
         assert all("project" in task["tags"] for task in data if "tags" in task and task["tags"])
@@ -249,7 +296,7 @@ class TaskTests:
         assert not any(task["title"] == "Meeting Task" for task in data)
         
         # Filter by multiple tags (should return tasks with any of these tags)
-        r = httpx.get(f"{BASE_URL}/tasks", params={"tags": "project,meeting"})
+        r = client.get(f"{BASE_URL}/tasks", params={"tags": "project,meeting"})
         assert r.status_code == 200
         data = r.json()
         titles = [task["title"] for task in data]
@@ -258,7 +305,7 @@ class TaskTests:
         assert "No Tags Task" not in titles
         
         # Test with whitespace in tag parameter
-        r = httpx.get(f"{BASE_URL}/tasks", params={"tags": "project, important"})
+        r = client.get(f"{BASE_URL}/tasks", params={"tags": "project, important"})
         assert r.status_code == 200
         data = r.json()
         assert any(task["title"] == "Project Task" for task in data)
@@ -267,42 +314,42 @@ class TaskTests:
     def test_combined_filters():
         """Test combining multiple filter parameters"""
         # Create tasks with different combinations of properties
-        httpx.post(f"{BASE_URL}/tasks", json={
+        client.post(f"{BASE_URL}/tasks", json={
             "title": "Important Work Meeting",
             "tags": ["meeting", "important"],
             "list": "Work"
         })
         
-        r1 = httpx.post(f"{BASE_URL}/tasks", json={
+        r1 = client.post(f"{BASE_URL}/tasks", json={
             "title": "Completed Personal Task",
             "tags": ["important"],
             "list": "Personal"
         })
         completed_id = r1.json()["id"]
-        httpx.put(f"{BASE_URL}/tasks/{completed_id}", json={"completed": True})
+        client.put(f"{BASE_URL}/tasks/{completed_id}", json={"completed": True})
         
         # Filter by list AND tag
-        r = httpx.get(f"{BASE_URL}/tasks", params={"list": "Work", "tags": "meeting"})
+        r = client.get(f"{BASE_URL}/tasks", params={"list": "Work", "tags": "meeting"})
         assert r.status_code == 200
         data = r.json()
         assert all(task["list"] == "Work" and "meeting" in task["tags"] for task in data)
         assert any(task["title"] == "Important Work Meeting" for task in data)
         
         # Filter by list AND completion status
-        r = httpx.get(f"{BASE_URL}/tasks", params={"list": "Personal", "completed": "true"})
+        r = client.get(f"{BASE_URL}/tasks", params={"list": "Personal", "completed": "true"})
         assert r.status_code == 200
         data = r.json()
         assert all(task["list"] == "Personal" and task["completed"] is True for task in data)
         assert any(task["title"] == "Completed Personal Task" for task in data)
         
         # Filter by tag AND completion status
-        r = httpx.get(f"{BASE_URL}/tasks", params={"tags": "important", "completed": "true"})
+        r = client.get(f"{BASE_URL}/tasks", params={"tags": "important", "completed": "true"})
         assert r.status_code == 200
         data = r.json()
         assert all("important" in task["tags"] and task["completed"] is True for task in data)
         
         # All three filters combined
-        r = httpx.get(f"{BASE_URL}/tasks", params={
+        r = client.get(f"{BASE_URL}/tasks", params={
             "list": "Personal", 
             "tags": "important", 
             "completed": "true"
@@ -333,7 +380,7 @@ class TaskTests:
                 "due_date": tomorrow
             }
             
-            r = httpx.post(f"{BASE_URL}/tasks", json=payload)
+            r = client.post(f"{BASE_URL}/tasks", json=payload)
             assert r.status_code == 201, f"Expected 201 for {rec_type} recurrence, got {r.status_code}: {r.text}"
             data = r.json()
             assert data["recurrence"] == rec_type
@@ -342,7 +389,7 @@ class TaskTests:
             
             # Verify it can be retrieved
             task_id = data["id"]
-            r = httpx.get(f"{BASE_URL}/tasks/{task_id}")
+            r = client.get(f"{BASE_URL}/tasks/{task_id}")
             assert r.status_code == 200
             data = r.json()
             assert data["recurrence"] == rec_type
@@ -352,7 +399,7 @@ class TaskTests:
     def test_update_recurrence_fields():
         """Test updating recurrence fields of a task"""
         # First create a non-recurring task
-        r = httpx.post(f"{BASE_URL}/tasks", json={"title": "Regular Task"})
+        r = client.post(f"{BASE_URL}/tasks", json={"title": "Regular Task"})
         assert r.status_code == 201
         task_id = r.json()["id"]
         
@@ -366,7 +413,7 @@ class TaskTests:
             "due_date": tomorrow
         }
         
-        r = httpx.put(f"{BASE_URL}/tasks/{task_id}", json=update_payload)
+        r = client.put(f"{BASE_URL}/tasks/{task_id}", json=update_payload)
         assert r.status_code == 200, f"Expected 200, got {r.status_code}: {r.text}"
         data = r.json()
         assert data["recurrence"] == "weekly"
@@ -374,7 +421,7 @@ class TaskTests:
         
         # 2. Change recurrence type
         update_payload = {"recurrence": "monthly"}
-        r = httpx.put(f"{BASE_URL}/tasks/{task_id}", json=update_payload)
+        r = client.put(f"{BASE_URL}/tasks/{task_id}", json=update_payload)
         assert r.status_code == 200
         data = r.json()
         assert data["recurrence"] == "monthly"
@@ -382,7 +429,7 @@ class TaskTests:
         
         # 3. Remove recurrence end date
         update_payload = {"recurrence_end_date": None}
-        r = httpx.put(f"{BASE_URL}/tasks/{task_id}", json=update_payload)
+        r = client.put(f"{BASE_URL}/tasks/{task_id}", json=update_payload)
         assert r.status_code == 200
         data = r.json()
         assert data["recurrence"] == "monthly"  # Still has recurrence type
@@ -391,14 +438,14 @@ class TaskTests:
         # 4. Add back recurrence end date
         new_end_date = (datetime.now() + timedelta(days=60)).date().isoformat()
         update_payload = {"recurrence_end_date": new_end_date}
-        r = httpx.put(f"{BASE_URL}/tasks/{task_id}", json=update_payload)
+        r = client.put(f"{BASE_URL}/tasks/{task_id}", json=update_payload)
         assert r.status_code == 200
         data = r.json()
         assert data["recurrence_end_date"] == new_end_date
         
         # 5. Remove recurrence completely
         update_payload = {"recurrence": None}
-        r = httpx.put(f"{BASE_URL}/tasks/{task_id}", json=update_payload)
+        r = client.put(f"{BASE_URL}/tasks/{task_id}", json=update_payload)
         assert r.status_code == 200
         data = r.json()
         assert data["recurrence"] is None
@@ -411,7 +458,7 @@ class ListTests:
     @staticmethod
     def test_get_default_lists():
         """Test retrieving default lists"""
-        r = httpx.get(f"{BASE_URL}/lists")
+        r = client.get(f"{BASE_URL}/lists")
         assert r.status_code == 200, f"Expected 200, got {r.status_code}: {r.text}"
         data = r.json()
         assert isinstance(data, list)
@@ -426,73 +473,76 @@ class ListTests:
     def test_create_list():
         """Test creating a new list"""
         # Create a new list
-        r = httpx.post(f"{BASE_URL}/lists", json={"name": "Study"})
+        study = ns("Study")
+        r = client.post(f"{BASE_URL}/lists", json={"name": study})
         assert r.status_code == 201, f"Expected 201, got {r.status_code}: {r.text}"
         data = r.json()
-        assert data["name"] == "Study"
+        assert data["name"] == study
         
         # Verify it exists
-        r = httpx.get(f"{BASE_URL}/lists")
+        r = client.get(f"{BASE_URL}/lists")
         list_names = [list_obj["name"] for list_obj in r.json()]
-        assert "Study" in list_names, f"Newly created list not found in lists: {list_names}"
+        assert study in list_names, f"Newly created list not found in lists: {list_names}"
     
     @staticmethod
     def test_create_list_validation():
         """Test validation rules for list creation"""
         # Try to create a list with an empty name
-        r = httpx.post(f"{BASE_URL}/lists", json={"name": ""})
+        r = client.post(f"{BASE_URL}/lists", json={"name": ""})
         assert r.status_code == 400, f"Expected 400 for empty list name, got {r.status_code}"
         
         # Try to create a list with just whitespace
-        r = httpx.post(f"{BASE_URL}/lists", json={"name": "  "})
+        r = client.post(f"{BASE_URL}/lists", json={"name": "  "})
         assert r.status_code == 400, f"Expected 400 for whitespace list name, got {r.status_code}"
         
         # Try to create a duplicate list
-        httpx.post(f"{BASE_URL}/lists", json={"name": "Unique"})
-        r = httpx.post(f"{BASE_URL}/lists", json={"name": "Unique"})
+        client.post(f"{BASE_URL}/lists", json={"name": ns("Unique")})
+        r = client.post(f"{BASE_URL}/lists", json={"name": ns("Unique")})
         assert r.status_code == 400, f"Expected 400 for duplicate list name, got {r.status_code}"
     
     @staticmethod
     def test_delete_list():
         """Test deleting a list"""
         # Create a list to delete
-        httpx.post(f"{BASE_URL}/lists", json={"name": "ToDelete"})
+        to_delete = ns("ToDelete")
+        client.post(f"{BASE_URL}/lists", json={"name": to_delete})
         
         # Delete the list
-        r = httpx.delete(f"{BASE_URL}/lists/ToDelete")
+        r = client.delete(f"{BASE_URL}/lists/{to_delete}")
         assert r.status_code == 204, f"Expected 204, got {r.status_code}"
         
         # Verify it's gone
-        r = httpx.get(f"{BASE_URL}/lists")
+        r = client.get(f"{BASE_URL}/lists")
         list_names = [list_obj["name"] for list_obj in r.json()]
-        assert "ToDelete" not in list_names, f"List was not deleted: {list_names}"
+        assert to_delete not in list_names, f"List was not deleted: {list_names}"
         
         # Try to delete it again
-        r = httpx.delete(f"{BASE_URL}/lists/ToDelete")
+        r = client.delete(f"{BASE_URL}/lists/{to_delete}")
         assert r.status_code == 404, f"Expected 404 for already deleted list, got {r.status_code}"
     
     @staticmethod
     def test_delete_list_restrictions():
         """Test restrictions on list deletion"""
         # Try to delete Personal (not allowed)
-        r = httpx.delete(f"{BASE_URL}/lists/Personal")
+        r = client.delete(f"{BASE_URL}/lists/Personal")
         assert r.status_code == 400, f"Expected 400 for attempting to delete Personal, got {r.status_code}"
         
         # Create a list and add a task to it
-        httpx.post(f"{BASE_URL}/lists", json={"name": "ListWithTask"})
-        httpx.post(f"{BASE_URL}/tasks", json={"title": "Task in list", "list": "ListWithTask"})
+        with_task = ns("ListWithTask")
+        client.post(f"{BASE_URL}/lists", json={"name": with_task})
+        client.post(f"{BASE_URL}/tasks", json={"title": "Task in list", "list": with_task})
         
         # Try to delete the list with a task (should fail)
-        r = httpx.delete(f"{BASE_URL}/lists/ListWithTask")
+        r = client.delete(f"{BASE_URL}/lists/{with_task}")
         assert r.status_code == 400, f"Expected 400 for list with tasks, got {r.status_code}"
         
         # Delete the task
-        r = httpx.get(f"{BASE_URL}/tasks", params={"list": "ListWithTask"})
+        r = client.get(f"{BASE_URL}/tasks", params={"list": with_task})
         task_id = r.json()[0]["id"]
-        httpx.delete(f"{BASE_URL}/tasks/{task_id}")
+        client.delete(f"{BASE_URL}/tasks/{task_id}")
         
         # Now should be able to delete the list
-        r = httpx.delete(f"{BASE_URL}/lists/ListWithTask")
+        r = client.delete(f"{BASE_URL}/lists/{with_task}")
         assert r.status_code == 204, f"Expected 204 after removing tasks, got {r.status_code}"
 
 # =====================================================================
@@ -506,7 +556,7 @@ class GeneralTests:
             "Origin": "http://example.com",
             "Access-Control-Request-Method": "POST"
         }
-        r = httpx.options(f"{BASE_URL}/tasks", headers=headers)
+        r = client.options(f"{BASE_URL}/tasks", headers=headers)
         assert "access-control-allow-origin" in r.headers.keys(), "CORS headers missing"
         assert r.headers.get("access-control-allow-origin") == "*", "CORS origin should be '*'"
     
@@ -527,7 +577,7 @@ class GeneralTests:
             "list": "Personal"
         }
         
-        r = httpx.post(f"{BASE_URL}/tasks", json=payload)
+        r = client.post(f"{BASE_URL}/tasks", json=payload)
         assert r.status_code == 201
         data = r.json()
         
@@ -552,6 +602,934 @@ class GeneralTests:
         assert isinstance(data["list"], str)
         assert isinstance(data["created_at"], str)
 
+# =====================================================================
+# REFERENCE API EXTRAS TESTS
+# =====================================================================
+# Endpoints the reference API adds beyond the specification; skip them with
+# --skip-extras when testing your own implementation
+def walk_pages(params, between=None):
+    """Every page of GET /tasks with `params`, following X-Next-Cursor; calls `between` after each page"""
+    pages = []
+    cursor = None
+    while True:
+        r = client.get(f"{BASE_URL}/tasks", params={**params, **({"cursor": cursor} if cursor else {})})
+        assert r.status_code == 200, f"Expected 200, got {r.status_code}: {r.text}"
+        pages.append(r.json())
+        cursor = r.headers.get("x-next-cursor")
+        if cursor is None:
+            return pages
+        assert len(pages) < 100, "Paging did not end"
+        if between:
+            between()
+
+def parse_events(text):
+    """The server-sent events in `text` as dicts of id, event and (JSON-decoded) data; comments skipped"""
+    events = []
+    for block in text.split("\n\n"):
+        fields = dict(line.split(": ", 1) for line in block.splitlines() if line and not line.startswith(":"))
+        if fields:
+            events.append({"id": fields.get("id"), "event": fields.get("event"),
+                           "data": json.loads(fields["data"]) if "data" in fields else None})
+    return events
+
+def read_changes(count, params=None, headers=None, during=None, resyncs=False, lists=False, timeout=10.0):
+    """The events of GET /changes after `ready` up to the `count`th task (or list) event, with `during`
+    called (in a thread) once the stream is ready.
+
+    The ASGI transport only returns a response once the app finishes, so
+    the endless stream is cut off there, or after `timeout` seconds.
+    Resync events, which other workers' bulk writes also cause, are not
+    counted and are left out unless `resyncs` is set; list events, which
+    pass any tag filter, are left out unless `lists` is set.
+    """
+    def wanted(events):
+        return [e for e in events if e["event"] != "ready" and (resyncs or e["event"] != "resync")
+                and (lists or not e["event"].startswith("list."))]
+
+    def counted(events):
+        return [e for e in wanted(events) if e["event"] != "resync"]
+
+    async def main():
+        ready, enough = asyncio.Event(), asyncio.Event()
+        seen = []
+
+        async def app_until_enough(scope, receive, send):
+            finished = False
+
+            async def forward(message):
+                nonlocal finished
+                await send(message)
+                if message["type"] == "http.response.body":
+                    finished = not message.get("more_body", False)
+                    seen.extend(parse_events(message.get("body", b"").decode()))
+                    if seen:
+                        ready.set()
+                    if len(counted(seen)) >= count:
+                        enough.set()
+
+            app = asyncio.ensure_future(app_under_test(scope, receive, forward))
+            stop = asyncio.ensure_future(enough.wait())
+            await asyncio.wait([app, stop], timeout=timeout, return_when=asyncio.FIRST_COMPLETED)
+            for task in (app, stop):
+                task.cancel()
+            await asyncio.gather(app, stop, return_exceptions=True)
+            if not finished:
+                await send({"type": "http.response.body", "body": b"", "more_body": False})
+
+        transport = httpx.ASGITransport(app=app_until_enough)
+        async with httpx.AsyncClient(transport=transport, base_url=BASE_URL) as stream_client:
+            request = asyncio.ensure_future(stream_client.get("/changes", params=params, headers=headers))
+            started = asyncio.ensure_future(ready.wait())
+            await asyncio.wait([request, started], timeout=timeout, return_when=asyncio.FIRST_COMPLETED)
+            started.cancel()
+            try:
+                if during and ready.is_set():
+                    await asyncio.to_thread(during)
+            except BaseException:
+                enough.set()
+                await request
+                raise
+            return await request
+
+    r = asyncio.run(main())
+    assert r.status_code == 200, f"Expected 200 from /changes, got {r.status_code}: {r.text}"
+    assert r.headers["content-type"].startswith("text/event-stream"), "Expected an event stream"
+    events = parse_events(r.text)
+    assert events and events[0]["event"] == "ready", f"Expected a ready event first, got {events[:1]}"
+    events = wanted(events)
+    if len(counted(events)) > count:
+        events = events[:events.index(counted(events)[count])]
+    return events
+
+class ExtrasTests:
+    @staticmethod
+    def test_paging():
+        """Test GET /tasks?limit= pages chained through X-Next-Cursor"""
+        tag = f"page-{uuid.uuid4().hex[:8]}"
+        start = datetime.now() + timedelta(days=1)
+        for i in range(7):
+            # Due dates in reverse creation order, so the two sort orders differ
+            due = (start + timedelta(hours=7 - i)).isoformat().split(".")[0]
+            client.post(f"{BASE_URL}/tasks", json={"title": f"Page {i}", "tags": [tag], "due_date": due})
+        everything = client.get(f"{BASE_URL}/tasks", params={"tags": tag}).json()
+        assert [task["title"] for task in everything] == [f"Page {i}" for i in range(7)], "Expected creation order"
+
+        pages = walk_pages({"tags": tag, "limit": 3})
+        assert [len(page) for page in pages] == [3, 3, 1], f"Expected pages of 3, 3 and 1, got {pages}"
+        assert [task for page in pages for task in page] == everything, "Pages do not add up to the full listing"
+
+        pages = walk_pages({"tags": tag, "limit": 2, "sort": "due_date"})
+        titles = [task["title"] for page in pages for task in page]
+        assert titles == [f"Page {i}" for i in reversed(range(7))], f"Expected due date order, got {titles}"
+
+        r = client.get(f"{BASE_URL}/tasks", params={"tags": tag, "limit": 7})
+        assert len(r.json()) == 7 and "x-next-cursor" not in r.headers, "An exact last page should have no cursor"
+        for limit in (0, 1001):
+            r = client.get(f"{BASE_URL}/tasks", params={"limit": limit})
+            assert r.status_code == 422, f"Expected 422 for limit={limit}, got {r.status_code}"
+
+    @staticmethod
+    def test_streaming():
+        """Test GET /tasks?stream=true sending the same tasks, in the same order, as the JSON listing"""
+        tag = f"stream-{uuid.uuid4().hex[:8]}"
+        start = datetime.now() + timedelta(days=1)
+        for i in range(6):
+            due = (start + timedelta(hours=6 - i)).isoformat().split(".")[0]
+            task = {"title": f"Stream {i}", "tags": [tag], "due_date": due, "list": "Work" if i % 3 == 0 else "Personal"}
+            task_id = client.post(f"{BASE_URL}/tasks", json=task).json()["id"]
+            if i % 2:
+                client.put(f"{BASE_URL}/tasks/{task_id}", json={"completed": True})
+        r = client.get(f"{BASE_URL}/tasks", params={"tags": tag, "sort": "due_date", "limit": 2})
+        cursor = r.headers["x-next-cursor"]
+        for params in [{}, {"completed": "false"}, {"list": "Work"}, {"sort": "due_date"}, {"limit": 4},
+                       {"sort": "due_date", "limit": 3, "cursor": cursor}]:
+            params = {"tags": tag, **params}
+            listed = client.get(f"{BASE_URL}/tasks", params=params).json()
+            r = client.get(f"{BASE_URL}/tasks", params={**params, "stream": "true"})
+            assert r.status_code == 200, f"Expected 200 for {params}, got {r.status_code}: {r.text}"
+            assert r.headers["content-type"].startswith("application/x-ndjson"), "Expected NDJSON"
+            assert r.text.endswith("\n"), "Every streamed task should end with a newline"
+            streamed = [json.loads(line) for line in r.text.splitlines()]
+            assert streamed == listed, f"Streamed tasks differ from the listing for {params}"
+        assert len(listed) == 3 and [task["title"] for task in listed] == ["Stream 3", "Stream 2", "Stream 1"]
+        r = client.get(f"{BASE_URL}/tasks", params={"tags": "no-such-tag", "stream": "true"})
+        assert r.status_code == 200 and r.text == "", "An empty stream should have no lines"
+
+    @staticmethod
+    def test_due_range():
+        """Test GET /tasks?due_after=&due_before=: bounds, undated tasks and time zones"""
+        tag = f"due-{uuid.uuid4().hex[:8]}"
+        dues = {
+            "Nine": "2031-03-01T09:00:00",
+            # 08:00 UTC; naive times are taken as UTC
+            "Eight UTC": "2031-03-01T10:00:00+02:00",
+            "Noon": "2031-03-01T12:00:00",
+            "Undated": None,
+            # 0000-12-31T19:00 UTC, before the first naive datetime
+            "Earliest": "0001-01-01T00:00:00+05:00",
+        }
+        for title, due in dues.items():
+            r = client.post(f"{BASE_URL}/tasks", json={"title": title, "tags": [tag], "due_date": due})
+            assert r.status_code == 201, f"Expected 201 for due date {due}, got {r.status_code}: {r.text}"
+
+        def titles(**params):
+            r = client.get(f"{BASE_URL}/tasks", params={"tags": tag, **params})
+            assert r.status_code == 200, f"Expected 200 for {params}, got {r.status_code}: {r.text}"
+            return [task["title"] for task in r.json()]
+
+        assert titles(due_after="2031-03-01T09:00:00") == ["Nine", "Noon"], "due_after should be inclusive"
+        assert titles(due_before="2031-03-01T09:00:00") == ["Eight UTC", "Earliest"], "due_before should be exclusive"
+        assert titles(due_after="2031-03-01T08:00:00", due_before="2031-03-01T09:00:00") == ["Eight UTC"], \
+            "An aware due date should compare in UTC"
+        assert titles(due_after="2031-03-01T11:00:00+02:00") == ["Nine", "Noon"], "An aware bound should compare in UTC"
+        assert titles(due_after="0001-01-01T00:00:00") == ["Nine", "Eight UTC", "Noon"]
+        assert "Undated" not in titles(due_before="9999-12-31T23:59:59"), "Undated tasks should match no range"
+        assert titles(due_before="0001-01-01T00:00:00+04:00") == ["Earliest"]
+        assert titles(due_before="0001-01-01T00:00:00+14:00") == []
+        assert titles(sort="due_date") == ["Earliest", "Eight UTC", "Nine", "Noon", "Undated"]
+
+    @staticmethod
+    def test_paging_bad_cursor():
+        """Test GET /tasks rejecting cursors it did not issue"""
+        for cursor in ("not-a-cursor", "bm90fGF8Y3Vyc29y"):
+            r = client.get(f"{BASE_URL}/tasks", params={"limit": 2, "cursor": cursor})
+            assert r.status_code == 400, f"Expected 400 for cursor {cursor!r}, got {r.status_code}"
+        for i in range(3):
+            client.post(f"{BASE_URL}/tasks", json={"title": f"Cursor {i}"})
+        cursor = client.get(f"{BASE_URL}/tasks", params={"limit": 1}).headers["x-next-cursor"]
+        r = client.get(f"{BASE_URL}/tasks", params={"limit": 1, "cursor": cursor, "sort": "due_date"})
+        assert r.status_code == 400, f"Expected 400 for a cursor from another sort order, got {r.status_code}"
+
+    @staticmethod
+    def test_paging_during_writes():
+        """Test that paging sees every task once while tasks are being created"""
+        tag = f"walk-{uuid.uuid4().hex[:8]}"
+        for i in range(10):
+            client.post(f"{BASE_URL}/tasks", json={"title": f"Before {i}", "tags": [tag]})
+        created = []
+
+        def create_more():
+            for _ in range(2):
+                created.append(f"During {len(created)}")
+                client.post(f"{BASE_URL}/tasks", json={"title": created[-1], "tags": [tag]})
+
+        pages = walk_pages({"tags": tag, "limit": 3}, between=create_more)
+        titles = [task["title"] for page in pages for task in page]
+        assert len(titles) == len(set(titles)), f"A task was returned twice: {titles}"
+        assert titles[:10] == [f"Before {i}" for i in range(10)], f"Tasks before the walk were missed: {titles}"
+        # Tasks created during the walk sort after the cursor, so later pages pick them all up
+        assert titles[10:] == created, f"Expected the tasks created during the walk, got {titles[10:]}"
+
+    @staticmethod
+    def test_etag_not_modified():
+        """Test that listings carry an ETag and answer a matching If-None-Match with 304"""
+        tag = f"etag-{uuid.uuid4().hex[:8]}"
+        client.post(f"{BASE_URL}/tasks", json={"title": "Cached", "tags": [tag]})
+        # Listings only this test writes to, so parallel workers cannot change them in between
+        for path, params in [("/tasks", {"tags": tag}), ("/tasks/search", {"q": "cached", "tags": tag})]:
+            r = client.get(f"{BASE_URL}{path}", params=params)
+            assert r.status_code == 200, f"Expected 200 from {path}, got {r.status_code}: {r.text}"
+            etag = r.headers.get("etag")
+            assert etag, f"Missing ETag on {path}"
+            for if_none_match in (etag, f"W/{etag}", f'"other", {etag}'):
+                r = client.get(f"{BASE_URL}{path}", params=params, headers={"If-None-Match": if_none_match})
+                assert r.status_code == 304, f"Expected 304 from {path} for {if_none_match}, got {r.status_code}"
+                assert r.content == b"", "A 304 must not have a body"
+                assert r.headers.get("etag") == etag
+            r = client.get(f"{BASE_URL}{path}", params=params, headers={"If-None-Match": '"other"'})
+            assert r.status_code == 200, f"Expected 200 from {path} for another ETag, got {r.status_code}"
+
+    @staticmethod
+    def test_etag_invalidation():
+        """Test that a cached listing changes after a write, a list move and a tag change"""
+        def etag_of(params):
+            return client.get(f"{BASE_URL}/tasks", params=params).headers["etag"]
+
+        def refetch(params, etag):
+            r = client.get(f"{BASE_URL}/tasks", params=params, headers={"If-None-Match": etag})
+            assert r.status_code == 200, f"Expected a fresh listing for {params}, got {r.status_code}"
+            return [task["title"] for task in r.json()]
+
+        tag, other_tag = f"inv-{uuid.uuid4().hex[:8]}", f"inv-{uuid.uuid4().hex[:8]}"
+        errands = ns("ETag Errands")
+        client.post(f"{BASE_URL}/lists", json={"name": errands})
+        task_id = client.post(f"{BASE_URL}/tasks", json={"title": "Old", "tags": [tag], "list": errands}).json()["id"]
+
+        # A write to a task in the listing
+        etag = etag_of({"tags": tag})
+        client.put(f"{BASE_URL}/tasks/{task_id}", json={"title": "New"})
+        assert refetch({"tags": tag}, etag) == ["New"]
+
+        # A move out of the listed list, and the list counts
+        etag = etag_of({"list": errands})
+        counts = client.get(f"{BASE_URL}/lists", params={"with_counts": "true"}).headers["etag"]
+        client.put(f"{BASE_URL}/tasks/{task_id}", json={"list": "Work"})
+        assert refetch({"list": errands}, etag) == []
+        r = client.get(f"{BASE_URL}/lists", params={"with_counts": "true"}, headers={"If-None-Match": counts})
+        assert r.status_code == 200, f"Expected fresh list counts after a move, got {r.status_code}"
+        assert {item["name"]: item["count"] for item in r.json()}[errands] == 0
+
+        # A tag change, seen by the old tag's listing and the new one's
+        etag, other_etag = etag_of({"tags": tag}), etag_of({"tags": other_tag})
+        client.put(f"{BASE_URL}/tasks/{task_id}", json={"tags": [other_tag]})
+        assert refetch({"tags": tag}, etag) == []
+        assert refetch({"tags": other_tag}, other_etag) == ["New"]
+
+    @staticmethod
+    def test_delta_sync():
+        """Test GET /tasks?since= returning only what changed after a version"""
+        gone = ns("Delta Gone")
+        client.post(f"{BASE_URL}/lists", json={"name": gone})
+        r = client.get(f"{BASE_URL}/tasks", params={"since": 0})
+        assert r.status_code == 200, f"Expected 200, got {r.status_code}: {r.text}"
+        data = r.json()
+        assert set(data) == {"version", "more", "tasks", "deleted", "lists", "deleted_lists"}, f"Got {set(data)}"
+        assert data["more"] is False and gone in data["lists"] and "Personal" in data["lists"]
+        start = data["version"]
+
+        errands = ns("Delta Errands")
+        client.post(f"{BASE_URL}/lists", json={"name": errands})
+        kept = client.post(f"{BASE_URL}/tasks", json={"title": "Kept"}).json()
+        dropped = client.post(f"{BASE_URL}/tasks", json={"title": "Dropped"}).json()
+        client.put(f"{BASE_URL}/tasks/{kept['id']}", json={"title": "Kept and changed"})
+        client.delete(f"{BASE_URL}/tasks/{dropped['id']}")
+        client.delete(f"{BASE_URL}/lists/{gone}")
+
+        data = client.get(f"{BASE_URL}/tasks", params={"since": start}).json()
+        assert data["version"] > start, "Expected a newer version"
+        changed = {task["id"]: task for task in data["tasks"]}
+        assert changed.get(kept["id"], {}).get("title") == "Kept and changed", "Missing the changed task"
+        assert dropped["id"] not in changed and dropped["id"] in data["deleted"], "Expected the deleted task's id"
+        assert errands in data["lists"] and gone in data["deleted_lists"], "Expected the list changes"
+        assert gone not in data["lists"] and "Personal" not in data["lists"], "Unchanged lists were sent"
+
+        data = client.get(f"{BASE_URL}/tasks", params={"since": data["version"]}).json()
+        assert kept["id"] not in [task["id"] for task in data["tasks"]], "A change was sent twice"
+        assert dropped["id"] not in data["deleted"] and gone not in data["deleted_lists"]
+
+        for params in ({"list": "Work"}, {"cursor": "x"}, {"sort": "due_date"}, {"stream": "true"}):
+            r = client.get(f"{BASE_URL}/tasks", params={"since": start, **params})
+            assert r.status_code == 400, f"Expected 400 for since with {params}, got {r.status_code}"
+        r = client.get(f"{BASE_URL}/tasks", params={"since": -1})
+        assert r.status_code == 422, f"Expected 422 for a negative version, got {r.status_code}"
+
+    @staticmethod
+    def test_delta_sync_paging():
+        """Test GET /tasks?since=&limit= paging through the changes with `more`"""
+        version = client.get(f"{BASE_URL}/tasks", params={"since": 0}).json()["version"]
+        ids = [client.post(f"{BASE_URL}/tasks", json={"title": f"Delta {i}"}).json()["id"] for i in range(5)]
+        client.delete(f"{BASE_URL}/tasks/{ids[0]}")
+
+        seen, deleted, pages = [], [], []
+        while True:
+            page = client.get(f"{BASE_URL}/tasks", params={"since": version, "limit": 2}).json()
+            pages.append(page)
+            assert page["version"] > version or not page["tasks"] + page["deleted"], "Paging went backwards"
+            seen += [task["id"] for task in page["tasks"]]
+            deleted += page["deleted"]
+            version = page["version"]
+            if not page["more"]:
+                break
+            assert len(pages) < 100, "Paging did not end"
+        assert pages[0]["more"] is True, "Expected more than one page of changes"
+        assert len(seen) == len(set(seen)), "A task was sent on two pages"
+        assert set(ids[1:]) <= set(seen) and ids[0] in deleted, "Paging missed changes"
+        assert ids[0] not in seen, "A deleted task was also sent as changed"
+
+    @staticmethod
+    def test_delta_sync_expired():
+        """Test GET /tasks?since= answering 410 Gone once the changes since a version are forgotten"""
+        r = client.get(f"{BASE_URL}/tasks", params={"since": 10 ** 18})
+        assert r.status_code == 410, f"Expected 410 for a version from the future, got {r.status_code}"
+        if tombstone_limit is None:
+            # The server's limit is unknown, so compaction itself cannot be reached
+            return
+        start = client.get(f"{BASE_URL}/tasks", params={"since": 0}).json()["version"]
+        ids = [client.post(f"{BASE_URL}/tasks", json={"title": f"Tombstone {i}"}).json()["id"]
+               for i in range(tombstone_limit + 1)]
+        for task_id in ids:
+            client.delete(f"{BASE_URL}/tasks/{task_id}")
+        r = client.get(f"{BASE_URL}/tasks", params={"since": start})
+        assert r.status_code == 410, f"Expected 410 once tombstones were compacted, got {r.status_code}"
+        r = client.get(f"{BASE_URL}/tasks", params={"since": 0})
+        assert r.status_code == 200 and not set(ids) & {task["id"] for task in r.json()["tasks"]}
+
+        # List tombstones count towards the limit too
+        start = client.get(f"{BASE_URL}/tasks", params={"since": 0}).json()["version"]
+        for i in range(tombstone_limit + 1):
+            client.post(f"{BASE_URL}/lists", json={"name": ns(f"Tombstone {i}")})
+            client.delete(f"{BASE_URL}/lists/{ns(f'Tombstone {i}')}")
+        r = client.get(f"{BASE_URL}/tasks", params={"since": start})
+        assert r.status_code == 410, f"Expected 410 once list tombstones were compacted, got {r.status_code}"
+
+    @staticmethod
+    def test_change_feed():
+        """Test GET /changes sending task and list events in commit order, filtered by list"""
+        if app_under_test is None:
+            # Needs the app in process to cut the endless stream short
+            return
+        errands = ns(f"Feed {uuid.uuid4().hex[:8]}")
+        ids = {}
+
+        def write():
+            client.post(f"{BASE_URL}/lists", json={"name": errands})
+            ids["a"] = client.post(f"{BASE_URL}/tasks", json={"title": "A", "list": errands}).json()["id"]
+            client.put(f"{BASE_URL}/tasks/{ids['a']}", json={"completed": True})
+            # Outside the list until it is moved in
+            ids["b"] = client.post(f"{BASE_URL}/tasks", json={"title": "B"}).json()["id"]
+            client.put(f"{BASE_URL}/tasks/{ids['b']}", json={"list": errands})
+            client.delete(f"{BASE_URL}/tasks/{ids['a']}")
+            client.delete(f"{BASE_URL}/tasks/{ids['b']}")
+            client.delete(f"{BASE_URL}/lists/{errands}")
+
+        events = read_changes(7, params={"list": errands}, during=write, lists=True)
+        kinds = [event["event"] for event in events]
+        assert kinds == ["list.created", "task.created", "task.updated", "task.updated", "task.deleted",
+                         "task.deleted", "list.deleted"], f"Unexpected events {kinds}"
+        assert events[0]["data"] == {"name": errands} and events[6]["data"] == {"name": errands}
+        assert events[1]["data"]["title"] == "A" and events[1]["data"]["completed"] is False
+        assert events[2]["data"]["id"] == ids["a"] and events[2]["data"]["completed"] is True
+        assert events[3]["data"]["id"] == ids["b"] and events[3]["data"]["list"] == errands
+        assert [event["data"] for event in events[4:6]] == [{"id": ids["a"]}, {"id": ids["b"]}]
+        feed_ids = {event["id"].split(":")[0] for event in events}
+        seqs = [int(event["id"].split(":")[1]) for event in events]
+        assert len(feed_ids) == 1 and seqs == sorted(seqs) and len(set(seqs)) == 7, "Event ids should increase"
+
+    @staticmethod
+    def test_change_feed_tags():
+        """Test GET /changes?tags= sending changes of tasks that had a tag before or after"""
+        if app_under_test is None:
+            return
+        tag = f"feed-{uuid.uuid4().hex[:8]}"
+
+        def write():
+            x = client.post(f"{BASE_URL}/tasks", json={"title": "X", "tags": [tag]}).json()["id"]
+            y = client.post(f"{BASE_URL}/tasks", json={"title": "Y"}).json()["id"]
+            client.put(f"{BASE_URL}/tasks/{y}", json={"tags": [tag]})
+            client.put(f"{BASE_URL}/tasks/{x}", json={"tags": []})
+            # Neither before nor after
+            client.put(f"{BASE_URL}/tasks/{x}", json={"title": "X again"})
+            client.post(f"{BASE_URL}/tasks", json={"title": "Z", "tags": ["other", tag]})
+
+        events = read_changes(4, params={"tags": f"{tag},unused"}, during=write)
+        sent = [(event["event"], event["data"]["title"], event["data"]["tags"]) for event in events]
+        assert sent == [("task.created", "X", [tag]), ("task.updated", "Y", [tag]), ("task.updated", "X", []),
+                        ("task.created", "Z", ["other", tag])], f"Unexpected events {sent}"
+
+    @staticmethod
+    def test_change_feed_resume():
+        """Test GET /changes resuming after an event id given as after or as Last-Event-ID"""
+        if app_under_test is None:
+            return
+        tag = f"resume-{uuid.uuid4().hex[:8]}"
+
+        def create(*titles):
+            for title in titles:
+                client.post(f"{BASE_URL}/tasks", json={"title": title, "tags": [tag]})
+
+        def resumed(count, **kwargs):
+            """The events sent on resuming, or None if other workers' writes pushed the id out of reach"""
+            events = read_changes(count, resyncs=True, timeout=10.0 if before_each else 2.0, **kwargs)
+            if events and events[0]["event"] == "resync" and before_each is None:
+                return None
+            return [event for event in events if event["event"] != "resync"]
+
+        first, second = read_changes(2, params={"tags": tag}, during=lambda: create("A", "B"))
+        # Written while no client is connected
+        create("C", "D")
+        events = resumed(3, params={"tags": tag, "after": first["id"]})
+        if events is not None:
+            assert [event["data"]["title"] for event in events] == ["B", "C", "D"], f"Unexpected events {events}"
+            assert events[0]["id"] == second["id"], "A resumed event should keep its id"
+        events = resumed(2, params={"tags": tag}, headers={"Last-Event-ID": second["id"]})
+        if events is not None:
+            assert [event["data"]["title"] for event in events] == ["C", "D"], f"Unexpected events {events}"
+
+    @staticmethod
+    def test_change_feed_resync():
+        """Test GET /changes sending resync for event ids it cannot resume from, then going on"""
+        if app_under_test is None:
+            return
+        tag = f"resync-{uuid.uuid4().hex[:8]}"
+        for params, headers in [({"after": "not-an-id"}, None), ({"after": "0badfeed:1"}, None),
+                                ({}, {"Last-Event-ID": "0badfeed:1"})]:
+            title = f"After {params or headers}"
+            events = read_changes(1, params={"tags": tag, **params}, headers=headers, resyncs=True,
+                                  during=lambda: client.post(f"{BASE_URL}/tasks", json={"title": title, "tags": [tag]}))
+            # Other workers' bulk writes may add more resync events
+            assert events[0]["event"] == "resync" and events[-1]["event"] == "task.created", \
+                f"Expected resync for {params or headers}, got {events}"
+            assert events[-1]["data"]["title"] == title
+
+    @staticmethod
+    def test_change_feed_behind():
+        """Test GET /changes sending resync to a client more than TODO_FEED_QUEUE changes behind"""
+        if app_under_test is None:
+            return
+        tag = f"behind-{uuid.uuid4().hex[:8]}"
+        queue_size = int(os.getenv("TODO_FEED_QUEUE", 1000))
+        last, = read_changes(1, params={"tags": tag},
+                             during=lambda: client.post(f"{BASE_URL}/tasks", json={"title": "Seen", "tags": [tag]}))
+        items = [{"title": f"Missed {i}", "tags": [tag]} for i in range(queue_size + 1)]
+        for start in range(0, len(items), 10000):
+            r = client.post(f"{BASE_URL}/tasks/bulk", json=items[start:start + 10000])
+            assert r.status_code == 200, f"Bulk create failed: {r.status_code}"
+        events = read_changes(1, params={"tags": tag, "after": last["id"]}, resyncs=True)
+        assert events[0]["event"] == "resync", f"Expected resync {queue_size + 1} changes behind, got {events}"
+
+    @staticmethod
+    def test_bulk_create_json():
+        """Test POST /tasks/bulk with a JSON array of tasks"""
+        tag = f"bulk-{uuid.uuid4().hex[:8]}"
+        items = [{"title": f"Bulk {i}", "tags": [tag], "list": "Work" if i % 2 else "Personal"} for i in range(5)]
+        r = client.post(f"{BASE_URL}/tasks/bulk", json=items)
+        assert r.status_code == 200, f"Expected 200, got {r.status_code}: {r.text}"
+        data = r.json()
+        assert [item["index"] for item in data] == list(range(5)), "Expected one result per item, in order"
+        assert all(item["status"] == 201 for item in data), f"Expected every item created, got {data}"
+        assert [item["task"]["title"] for item in data] == [f"Bulk {i}" for i in range(5)]
+        r = client.get(f"{BASE_URL}/tasks", params={"tags": tag})
+        assert sorted(task["id"] for task in r.json()) == sorted(item["task"]["id"] for item in data)
+
+    @staticmethod
+    def test_bulk_create_ndjson():
+        """Test POST /tasks/bulk with an NDJSON body, one task per line"""
+        tag = f"ndjson-{uuid.uuid4().hex[:8]}"
+        lines = [json.dumps({"title": f"Line {i}", "tags": [tag]}) for i in range(3)]
+        body = "\n".join(lines[:2]) + "\n\n" + lines[2] + "\n"
+        r = client.post(f"{BASE_URL}/tasks/bulk", content=body, headers={"Content-Type": "application/x-ndjson"})
+        assert r.status_code == 200, f"Expected 200, got {r.status_code}: {r.text}"
+        data = r.json()
+        assert [item["status"] for item in data] == [201, 201, 201], f"Blank lines should be skipped, got {data}"
+        r = client.get(f"{BASE_URL}/tasks", params={"tags": tag})
+        assert sorted(task["title"] for task in r.json()) == ["Line 0", "Line 1", "Line 2"]
+
+    @staticmethod
+    def test_bulk_create_mixed():
+        """Test that POST /tasks/bulk reports each invalid item and still creates the valid ones"""
+        tag = f"mixed-{uuid.uuid4().hex[:8]}"
+        items = [
+            {"title": "Valid", "tags": [tag]},
+            {"description": "No title", "tags": [tag]},
+            {"title": "No such list", "tags": [tag], "list": "NonExistent"},
+            {"title": "Bad recurrence", "tags": [tag], "recurrence": "yearly"},
+            {"title": "Also valid", "tags": [tag], "list": "Work"},
+        ]
+        r = client.post(f"{BASE_URL}/tasks/bulk", json=items)
+        assert r.status_code == 200, f"Expected 200, got {r.status_code}: {r.text}"
+        statuses = [item["status"] for item in r.json()]
+        assert statuses == [201, 422, 400, 422, 201], f"Unexpected per-item statuses {statuses}"
+        assert all(item.get("detail") for item in r.json() if item["status"] != 201), "Failures need a detail"
+        r = client.get(f"{BASE_URL}/tasks", params={"tags": tag})
+        assert sorted(task["title"] for task in r.json()) == ["Also valid", "Valid"]
+
+        good = json.dumps({"title": "Good line", "tags": [tag]}).encode()
+        body = good + b"\n{not json\n" + b'{"title": "Not UTF-8 \xff"}\n' + good + b"\n"
+        r = client.post(f"{BASE_URL}/tasks/bulk", content=body, headers={"Content-Type": "application/x-ndjson"})
+        assert r.status_code == 200, f"Expected 200, got {r.status_code}: {r.text}"
+        assert [item["status"] for item in r.json()] == [201, 422, 422, 201], "A bad NDJSON line should fail alone"
+
+    @staticmethod
+    def test_bulk_create_limits():
+        """Test the 400 and 413 responses of POST /tasks/bulk"""
+        for body in ('{"title": "Not an array"}', "[not json", b'[{"title": "Not UTF-8 \xff"}]'):
+            r = client.post(f"{BASE_URL}/tasks/bulk", content=body, headers={"Content-Type": "application/json"})
+            assert r.status_code == 400, f"Expected 400 for {body!r}, got {r.status_code}"
+        tag = f"limit-{uuid.uuid4().hex[:8]}"
+        r = client.post(f"{BASE_URL}/tasks/bulk", json=[{"title": "Too many", "tags": [tag]}] * 10001)
+        assert r.status_code == 413, f"Expected 413 for 10001 tasks, got {r.status_code}"
+        assert client.get(f"{BASE_URL}/tasks", params={"tags": tag}).json() == [], "A refused bulk created tasks"
+
+    @staticmethod
+    def test_search_ranking():
+        """Test GET /tasks/search matching every word and ranking title matches first"""
+        word = f"zq{uuid.uuid4().hex[:8]}"
+        client.post(f"{BASE_URL}/tasks", json={"title": "Unrelated", "description": f"Mentions {word} once, in passing"})
+        client.post(f"{BASE_URL}/tasks", json={"title": f"{word} report"})
+        client.post(f"{BASE_URL}/tasks", json={"title": f"{word} budget", "description": "Unrelated"})
+        client.post(f"{BASE_URL}/tasks", json={"title": "Nothing to see"})
+
+        r = client.get(f"{BASE_URL}/tasks/search", params={"q": word})
+        assert r.status_code == 200, f"Expected 200, got {r.status_code}: {r.text}"
+        titles = [task["title"] for task in r.json()]
+        assert len(titles) == 3, f"Expected the 3 tasks containing the word, got {titles}"
+        assert titles[-1] == "Unrelated", f"A description match should rank below title matches: {titles}"
+
+        r = client.get(f"{BASE_URL}/tasks/search", params={"q": f"{word} REPORT"})
+        assert [task["title"] for task in r.json()] == [f"{word} report"], "Every word must match, in any case"
+        r = client.get(f"{BASE_URL}/tasks/search", params={"q": word, "limit": 2})
+        assert len(r.json()) == 2, "Expected limit to cap the results"
+        r = client.get(f"{BASE_URL}/tasks/search", params={"q": ""})
+        assert r.status_code == 422, f"Expected 422 for an empty query, got {r.status_code}"
+
+    @staticmethod
+    def test_search_prefix():
+        """Test that the last word of a search also matches as a prefix, and accents are folded"""
+        word = f"zq{uuid.uuid4().hex[:8]}"
+        for suffix in ("garden", "gardening", "garage"):
+            client.post(f"{BASE_URL}/tasks", json={"title": f"{word}{suffix} Café"})
+
+        def titles(q):
+            return sorted(task["title"] for task in client.get(f"{BASE_URL}/tasks/search", params={"q": q}).json())
+
+        assert titles(f"{word}gard") == [f"{word}garden Café", f"{word}gardening Café"]
+        assert titles(f"{word}ga") == sorted(f"{word}{suffix} Café" for suffix in ("garden", "gardening", "garage"))
+        assert titles(f"cafe {word}gard") == [f"{word}garden Café", f"{word}gardening Café"], "Accents should fold"
+        # Only the last word is a prefix
+        assert titles(f"{word}garden caf") == [f"{word}garden Café"]
+        assert titles(f"caf {word}garden") == [], "A word before the last must match whole"
+
+    @staticmethod
+    def test_search_filters():
+        """Test GET /tasks/search with the list, tags and completed filters"""
+        word = f"zq{uuid.uuid4().hex[:8]}"
+        errands = ns("Search Errands")
+        client.post(f"{BASE_URL}/lists", json={"name": errands})
+        client.post(f"{BASE_URL}/tasks", json={"title": f"{word} one", "list": errands, "tags": ["red"]})
+        two = client.post(f"{BASE_URL}/tasks", json={"title": f"{word} two", "list": errands, "tags": ["blue"]})
+        client.post(f"{BASE_URL}/tasks", json={"title": f"{word} three", "tags": ["red"]})
+        client.put(f"{BASE_URL}/tasks/{two.json()['id']}", json={"completed": True})
+
+        def titles(**params):
+            r = client.get(f"{BASE_URL}/tasks/search", params={"q": word, **params})
+            assert r.status_code == 200, f"Expected 200, got {r.status_code}: {r.text}"
+            return sorted(task["title"] for task in r.json())
+
+        assert titles(list=errands) == [f"{word} one", f"{word} two"]
+        assert titles(tags="red") == [f"{word} one", f"{word} three"]
+        assert titles(tags="red,blue") == [f"{word} one", f"{word} three", f"{word} two"]
+        assert titles(completed="true") == [f"{word} two"]
+        assert titles(list=errands, completed="false", tags="red") == [f"{word} one"]
+
+    @staticmethod
+    def test_search_follows_writes():
+        """Test that updates and deletes reach the search index"""
+        word, other = f"zq{uuid.uuid4().hex[:8]}", f"zq{uuid.uuid4().hex[:8]}"
+        task_id = client.post(f"{BASE_URL}/tasks", json={"title": f"{word} draft"}).json()["id"]
+
+        def ids(q):
+            return [task["id"] for task in client.get(f"{BASE_URL}/tasks/search", params={"q": q}).json()]
+
+        # Search once first, so an index built on demand exists before the writes
+        assert ids(word) == [task_id]
+        client.put(f"{BASE_URL}/tasks/{task_id}", json={"title": "Renamed", "description": f"Now about {other}"})
+        assert ids(word) == [], "The old title is still found"
+        assert ids(other) == [task_id], "The new description is not found"
+        found = client.get(f"{BASE_URL}/tasks/search", params={"q": other}).json()
+        assert found[0]["title"] == "Renamed", "Search returned a stale task"
+        client.put(f"{BASE_URL}/tasks/{task_id}", json={"completed": True})
+        assert ids(other) == [task_id] and client.get(
+            f"{BASE_URL}/tasks/search", params={"q": other, "completed": "true"}).json()[0]["id"] == task_id
+        client.delete(f"{BASE_URL}/tasks/{task_id}")
+        assert ids(other) == [], "A deleted task is still found"
+
+    @staticmethod
+    def test_occurrences():
+        """Test GET /occurrences expanding recurring tasks into a window, in time order"""
+        tag = f"occ-{uuid.uuid4().hex[:8]}"
+
+        def create(title, **fields):
+            r = client.post(f"{BASE_URL}/tasks", json={"title": title, "tags": [tag], **fields})
+            assert r.status_code == 201, f"Expected 201, got {r.status_code}: {r.text}"
+
+        create("Daily", due_date="2031-01-01T09:00:00", recurrence="daily", recurrence_end_date="2031-01-05")
+        create("Weekly", due_date="2030-12-01T10:00:00", recurrence="weekly")
+        create("Once", due_date="2031-01-04T12:00:00")
+        create("Once, earlier", due_date="2030-12-31T12:00:00")
+        create("Monthly", due_date="2030-10-31T08:00:00", recurrence="monthly")
+        create("Undated", recurrence="daily")
+
+        def occurrences(start, end, **params):
+            r = client.get(f"{BASE_URL}/occurrences", params={"start": start, "end": end, "tags": tag, **params})
+            assert r.status_code == 200, f"Expected 200, got {r.status_code}: {r.text}"
+            return [(item["occurs_at"], item["title"]) for item in map(json.loads, r.text.splitlines())]
+
+        assert occurrences("2031-01-03T00:00:00", "2031-01-10T00:00:00") == [
+            ("2031-01-03T09:00:00", "Daily"),
+            ("2031-01-04T09:00:00", "Daily"),
+            ("2031-01-04T12:00:00", "Once"),
+            ("2031-01-05T09:00:00", "Daily"),
+            ("2031-01-05T10:00:00", "Weekly"),
+        ]
+        # Monthly repeats keep the day, clamped in shorter months
+        assert occurrences("2031-02-01T00:00:00", "2031-03-01T00:00:00") == [
+            ("2031-02-02T10:00:00", "Weekly"),
+            ("2031-02-09T10:00:00", "Weekly"),
+            ("2031-02-16T10:00:00", "Weekly"),
+            ("2031-02-23T10:00:00", "Weekly"),
+            ("2031-02-28T08:00:00", "Monthly"),
+        ]
+        # Start is inclusive, end exclusive
+        assert occurrences("2031-01-04T12:00:00", "2031-01-05T09:00:00") == [("2031-01-04T12:00:00", "Once")]
+        assert occurrences("2030-01-01T00:00:00", "2030-10-01T00:00:00") == [], "Nothing occurs before its due date"
+
+        item = json.loads(client.get(f"{BASE_URL}/occurrences", params={
+            "start": "2031-01-04T12:00:00", "end": "2031-01-04T13:00:00", "tags": tag}).text)
+        assert set(item) == {"task_id", "title", "list", "completed", "occurs_at"}, f"Got {set(item)}"
+
+    @staticmethod
+    def test_occurrences_filters():
+        """Test GET /occurrences with the GET /tasks filters and a bad window"""
+        tag = f"occ-{uuid.uuid4().hex[:8]}"
+        errands = ns("Occurrence Errands")
+        client.post(f"{BASE_URL}/lists", json={"name": errands})
+        for title, list_name in (("Here", errands), ("There", "Work")):
+            client.post(f"{BASE_URL}/tasks", json={"title": title, "tags": [tag], "list": list_name,
+                                                   "due_date": "2031-03-01T09:00:00", "recurrence": "daily"})
+        done = client.post(f"{BASE_URL}/tasks", json={"title": "Done", "tags": [tag], "list": errands,
+                                                      "due_date": "2031-03-02T09:00:00"}).json()
+        client.put(f"{BASE_URL}/tasks/{done['id']}", json={"completed": True})
+        window = {"start": "2031-03-02T00:00:00", "end": "2031-03-04T00:00:00"}
+
+        def titles(**params):
+            r = client.get(f"{BASE_URL}/occurrences", params={**window, **params})
+            assert r.status_code == 200, f"Expected 200, got {r.status_code}: {r.text}"
+            return [json.loads(line)["title"] for line in r.text.splitlines()]
+
+        assert titles(tags=tag) == ["Here", "There", "Done", "Here", "There"]
+        assert titles(list=errands) == ["Here", "Done", "Here"]
+        assert titles(list=errands, completed="false") == ["Here", "Here"]
+        assert titles(tags=tag, completed="true") == ["Done"]
+
+        r = client.get(f"{BASE_URL}/occurrences", params={"start": window["end"], "end": window["start"]})
+        assert r.status_code == 400, f"Expected 400 for an end before the start, got {r.status_code}"
+        r = client.get(f"{BASE_URL}/occurrences", params={"start": window["start"]})
+        assert r.status_code == 422, f"Expected 422 without an end, got {r.status_code}"
+
+    @staticmethod
+    def test_admin_delete():
+        """Test DELETE /admin/tasks: the admin token, filters, and all=true for deleting everything"""
+        tag = f"admin-{uuid.uuid4().hex[:8]}"
+        r = client.delete(f"{BASE_URL}/admin/tasks", params={"tags": tag}, headers={"X-Admin-Token": "wrong"})
+        if not ADMIN_HEADERS["X-Admin-Token"]:
+            assert r.status_code in (403, 404), f"Expected admin routes to be refused, got {r.status_code}"
+            return
+        assert r.status_code == 403, f"Expected 403 for a wrong admin token, got {r.status_code}"
+        for method, path in (("DELETE", "/admin/tasks"), ("POST", "/admin/reset")):
+            r = client.request(method, f"{BASE_URL}{path}", params={"tags": tag})
+            assert r.status_code == 403, f"Expected 403 for {method} {path} without a token, got {r.status_code}"
+
+        ids = [client.post(f"{BASE_URL}/tasks", json={"title": f"Admin {i}", "tags": [tag]}).json()["id"]
+               for i in range(3)]
+        client.put(f"{BASE_URL}/tasks/{ids[0]}", json={"completed": True})
+        r = client.delete(f"{BASE_URL}/admin/tasks", headers=ADMIN_HEADERS)
+        assert r.status_code == 400, f"Expected 400 for a delete without filters, got {r.status_code}"
+        r = client.delete(f"{BASE_URL}/admin/tasks", params={"tags": " , "}, headers=ADMIN_HEADERS)
+        assert r.status_code == 400, f"Expected 400 for blank tags, got {r.status_code}"
+        assert len(client.get(f"{BASE_URL}/tasks", params={"tags": tag}).json()) == 3, "A refused delete deleted"
+
+        r = client.delete(f"{BASE_URL}/admin/tasks", params={"tags": tag, "completed": "true"}, headers=ADMIN_HEADERS)
+        assert r.status_code == 200 and r.json() == {"deleted": 1}, f"Expected 1 deleted, got {r.text}"
+        remaining = [task["id"] for task in client.get(f"{BASE_URL}/tasks", params={"tags": tag}).json()]
+        assert sorted(remaining) == sorted(ids[1:]), "Deleted the wrong tasks"
+
+        if before_each is None:
+            # Deleting everything would pull tasks from under other workers or a shared server
+            return
+        r = client.delete(f"{BASE_URL}/admin/tasks", params={"all": "true"}, headers=ADMIN_HEADERS)
+        assert r.status_code == 200 and r.json()["deleted"] >= 2, f"Expected every task deleted, got {r.text}"
+        assert client.get(f"{BASE_URL}/tasks").json() == [], "all=true left tasks behind"
+
+    @staticmethod
+    def test_batch_update_by_ids():
+        """Test PATCH /tasks applying one update to a list of ids"""
+        ids = [client.post(f"{BASE_URL}/tasks", json={"title": f"Batch {i}"}).json()["id"] for i in range(3)]
+        missing = str(uuid.uuid4())
+        r = client.patch(f"{BASE_URL}/tasks", json={"ids": ids + [missing], "update": {"completed": True}})
+        assert r.status_code == 200, f"Expected 200, got {r.status_code}: {r.text}"
+        data = r.json()
+        assert [item["id"] for item in data] == ids + [missing], "Expected one result per id, in order"
+        assert all(item["status"] == 200 and item["task"]["completed"] is True for item in data[:3])
+        assert data[3]["status"] == 404, f"Expected 404 for an unknown id, got {data[3]}"
+        for task_id in ids:
+            assert client.get(f"{BASE_URL}/tasks/{task_id}").json()["completed"] is True
+
+    @staticmethod
+    def test_batch_update_by_filter():
+        """Test PATCH /tasks applying one update to every task matching a filter"""
+        tag = f"batch-{uuid.uuid4().hex[:8]}"
+        done = ns("Batch Done")
+        client.post(f"{BASE_URL}/lists", json={"name": done})
+        for i in range(3):
+            client.post(f"{BASE_URL}/tasks", json={"title": f"Tagged {i}", "tags": [tag], "list": "Work"})
+        other = client.post(f"{BASE_URL}/tasks", json={"title": "Untagged", "list": "Work"}).json()
+
+        r = client.patch(f"{BASE_URL}/tasks", json={"filter": {"list": "Work", "tags": [tag]},
+                                                     "update": {"list": done}})
+        assert r.status_code == 200, f"Expected 200, got {r.status_code}: {r.text}"
+        data = r.json()
+        assert len(data) == 3, f"Expected 3 updated tasks, got {len(data)}"
+        assert all(item["status"] == 200 and item["task"]["list"] == done for item in data)
+        assert other["id"] not in [item["id"] for item in data], "A task outside the filter was updated"
+
+        r = client.get(f"{BASE_URL}/tasks", params={"list": done})
+        assert sorted(task["title"] for task in r.json()) == ["Tagged 0", "Tagged 1", "Tagged 2"]
+        r = client.get(f"{BASE_URL}/lists", params={"with_counts": "true"})
+        counts = {item["name"]: item["count"] for item in r.json()}
+        assert counts[done] == 3, f"Expected the list count to follow the move, got {counts[done]}"
+
+    @staticmethod
+    def test_batch_update_count_only():
+        """Test PATCH /tasks?count_only=true returning only the number updated"""
+        tag = f"count-{uuid.uuid4().hex[:8]}"
+        for i in range(4):
+            client.post(f"{BASE_URL}/tasks", json={"title": f"Count {i}", "tags": [tag]})
+        r = client.patch(f"{BASE_URL}/tasks", params={"count_only": "true"},
+                         json={"filter": {"tags": [tag]}, "update": {"completed": True}})
+        assert r.status_code == 200, f"Expected 200, got {r.status_code}: {r.text}"
+        assert r.json() == {"updated": 4}, f"Expected {{'updated': 4}}, got {r.json()}"
+
+        r = client.patch(f"{BASE_URL}/tasks", params={"count_only": "true"},
+                         json={"ids": [str(uuid.uuid4())], "update": {"completed": True}})
+        assert r.json() == {"updated": 0}, f"Unknown ids should not count, got {r.json()}"
+
+    @staticmethod
+    def test_batch_update_validation():
+        """Test the 4xx responses of PATCH /tasks"""
+        task_id = client.post(f"{BASE_URL}/tasks", json={"title": "Validated"}).json()["id"]
+        update = {"completed": True}
+        for body, what in [
+            ({"update": update}, "neither ids nor filter"),
+            ({"ids": [task_id], "filter": {}, "update": update}, "both ids and filter"),
+            ({"ids": [task_id]}, "no update"),
+            ({"ids": [task_id], "update": {"recurrence": "yearly"}}, "an invalid update"),
+            ({"filter": {"completed": "maybe"}, "update": update}, "an invalid filter"),
+        ]:
+            r = client.patch(f"{BASE_URL}/tasks", json=body)
+            assert r.status_code == 422, f"Expected 422 for {what}, got {r.status_code}"
+
+        r = client.patch(f"{BASE_URL}/tasks", json={"ids": [task_id], "update": {"list": "NonExistent"}})
+        assert r.status_code == 400, f"Expected 400 for a non-existent list, got {r.status_code}"
+        assert client.get(f"{BASE_URL}/tasks/{task_id}").json()["completed"] is False, "A refused batch changed a task"
+
+        r = client.patch(f"{BASE_URL}/tasks", json={"ids": [str(uuid.uuid4()) for _ in range(10001)], "update": update})
+        assert r.status_code == 413, f"Expected 413 for more than 10000 ids, got {r.status_code}"
+
+        for task_filter in ({}, {"tags": []}, {"completed": None, "all": False}):
+            r = client.patch(f"{BASE_URL}/tasks", json={"filter": task_filter, "update": update})
+            assert r.status_code == 400, f"Expected 400 for the empty filter {task_filter}, got {r.status_code}"
+        assert client.get(f"{BASE_URL}/tasks/{task_id}").json()["completed"] is False, "An empty filter changed a task"
+        if before_each is None:
+            # Updating everything would change tasks under other workers or on a shared server
+            return
+        r = client.patch(f"{BASE_URL}/tasks", params={"count_only": "true"},
+                         json={"filter": {"all": True}, "update": update})
+        assert r.status_code == 200 and r.json()["updated"] >= 1, f"Expected every task updated, got {r.text}"
+        assert client.get(f"{BASE_URL}/tasks/{task_id}").json()["completed"] is True, "all: true missed a task"
+
+    @staticmethod
+    def test_batch_update_filter_cap():
+        """Test PATCH /tasks refusing to list more than 10000 matches unless count_only is set"""
+        tag = f"cap-{uuid.uuid4().hex[:8]}"
+        items = [{"title": f"Capped {i}", "tags": [tag]} for i in range(10001)]
+        for start in range(0, len(items), 5000):
+            r = client.post(f"{BASE_URL}/tasks/bulk", json=items[start:start + 5000])
+            assert r.status_code == 200, f"Bulk create failed: {r.status_code}"
+        body = {"filter": {"tags": [tag]}, "update": {"completed": True}}
+        r = client.patch(f"{BASE_URL}/tasks", json=body)
+        assert r.status_code == 413, f"Expected 413 for a filter matching 10001 tasks, got {r.status_code}"
+        r = client.get(f"{BASE_URL}/tasks", params={"tags": tag, "completed": "true", "limit": 1})
+        assert r.json() == [], "A refused batch changed tasks"
+        r = client.patch(f"{BASE_URL}/tasks", params={"count_only": "true"}, json=body)
+        assert r.json() == {"updated": 10001}, f"Expected {{'updated': 10001}}, got {r.json()}"
+
+# =====================================================================
+# TEST PLAN & RUNNERS
+# =====================================================================
+GROUP_TITLES = {
+    "Tasks": "/tasks Endpoint Tests",
+    "Lists": "/lists Endpoint Tests",
+    "General": "General API Tests",
+    "Extras": "Reference API Extras Tests",
+}
+
+TEST_PLAN = {
+    "Tasks": [
+        ("Create minimal task", TaskTests.test_create_minimal_task),
+        ("Create fully-populated task", TaskTests.test_create_full_task),
+        ("Create task validation", TaskTests.test_create_task_validation),
+        ("Get task by ID", TaskTests.test_get_task_by_id),
+        ("Update task", TaskTests.test_update_task),
+        ("Delete task", TaskTests.test_delete_task),
+        ("List tasks (no filters)", TaskTests.test_list_tasks_no_filters),
+        ("Filter tasks by completion", TaskTests.test_filter_tasks_by_completion),
+        ("Filter tasks by list", TaskTests.test_filter_tasks_by_list),
+        ("Filter tasks by tags", TaskTests.test_filter_tasks_by_tags),
+        ("Combined filters", TaskTests.test_combined_filters),
+        ("Recurrence fields", TaskTests.test_recurrence_fields),
+        ("Update recurrence fields", TaskTests.test_update_recurrence_fields),
+    ],
+    "Lists": [
+        ("Get default lists", ListTests.test_get_default_lists),
+        ("Create list", ListTests.test_create_list),
+        ("Create list validation", ListTests.test_create_list_validation),
+        ("Delete list", ListTests.test_delete_list),
+        ("Delete list restrictions", ListTests.test_delete_list_restrictions),
+    ],
+    "General": [
+        # ("CORS headers", GeneralTests.test_cors_headers),
+        ("API interface consistency", GeneralTests.test_api_interface_consistency),
+    ],
+    "Extras": [
+        ("Admin bulk delete", ExtrasTests.test_admin_delete),
+        ("Occurrences", ExtrasTests.test_occurrences),
+        ("Occurrences filters", ExtrasTests.test_occurrences_filters),
+        ("Search ranking", ExtrasTests.test_search_ranking),
+        ("Search prefix matching", ExtrasTests.test_search_prefix),
+        ("Search filters", ExtrasTests.test_search_filters),
+        ("Search follows writes", ExtrasTests.test_search_follows_writes),
+        ("Bulk create (JSON)", ExtrasTests.test_bulk_create_json),
+        ("Bulk create (NDJSON)", ExtrasTests.test_bulk_create_ndjson),
+        ("Bulk create with invalid items", ExtrasTests.test_bulk_create_mixed),
+        ("Bulk create limits", ExtrasTests.test_bulk_create_limits),
+        ("Delta sync", ExtrasTests.test_delta_sync),
+        ("Delta sync paging", ExtrasTests.test_delta_sync_paging),
+        ("Delta sync after compaction", ExtrasTests.test_delta_sync_expired),
+        ("Change feed", ExtrasTests.test_change_feed),
+        ("Change feed tag filter", ExtrasTests.test_change_feed_tags),
+        ("Change feed resume", ExtrasTests.test_change_feed_resume),
+        ("Change feed resync", ExtrasTests.test_change_feed_resync),
+        ("Change feed client behind", ExtrasTests.test_change_feed_behind),
+        ("ETag and 304 Not Modified", ExtrasTests.test_etag_not_modified),
+        ("ETag invalidation", ExtrasTests.test_etag_invalidation),
+        ("Paging", ExtrasTests.test_paging),
+        ("Streaming", ExtrasTests.test_streaming),
+        ("Due date range", ExtrasTests.test_due_range),
+        ("Paging with a bad cursor", ExtrasTests.test_paging_bad_cursor),
+        ("Paging during writes", ExtrasTests.test_paging_during_writes),
+        ("Batch update by ids", ExtrasTests.test_batch_update_by_ids),
+        ("Batch update by filter", ExtrasTests.test_batch_update_by_filter),
+        ("Batch update count only", ExtrasTests.test_batch_update_count_only),
+        ("Batch update validation", ExtrasTests.test_batch_update_validation),
+        ("Batch update filter cap", ExtrasTests.test_batch_update_filter_cap),
+    ],
+}
+
+def run_parallel(workers):
+    """Run every test of TEST_PLAN on a pool of workers and merge the results.
+
+    Each worker namespaces the lists it creates, so tests never see each
+    other's lists. Results are merged back in plan order for the summary.
+    """
+    run_id = uuid.uuid4().hex[:6]
+    worker_ids = iter(range(workers))
+
+    def init_worker():
+        _worker.prefix = f"w{next(worker_ids)}-{run_id}-"
+
+    def run_one(group, name, func):
+        outcome = []
+        run_test(group, name, func, results=outcome)
+        return outcome
+
+    with ThreadPoolExecutor(max_workers=workers, initializer=init_worker) as pool:
+        futures = [
+            pool.submit(run_one, group, name, func)
+            for group, tests in TEST_PLAN.items() for name, func in tests
+        ]
+        for future in futures:
+            results.extend(future.result())
+
 def summary():
     print("\n📋 Test Summary:")
     
@@ -579,6 +1557,8 @@ def summary():
             print("\n== /lists Endpoint Tests ==")
         elif category == "General":
             print("\n== General API Tests ==")
+        elif category == "Extras":
+            print("\n== Reference API Extras Tests ==")
             
         print(f"{category}: {stats['passed']}/{stats['total']} passed ({pass_pct}%)")
         
@@ -603,39 +1583,40 @@ def summary():
                 print(f"  - {group}: {name}\n    {message}")
 
 if __name__ == "__main__":
+    import argparse
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--in-process", action="store_true",
+                        help="Test reference_API in this process, with fresh state per test")
+    parser.add_argument("--parallel", type=int, default=1, metavar="N",
+                        help="Run tests on N concurrent workers with namespaced lists")
+    parser.add_argument("--skip-extras", action="store_true",
+                        help="Skip the tests of endpoints only the reference API has")
+    args = parser.parse_args()
+    if args.skip_extras:
+        del TEST_PLAN["Extras"]
+
     print("🔧 Running To-Do API Test Suite...\n")
+
+    if args.in_process:
+        use_in_process_app()
+        if args.parallel > 1:
+            # Workers share the app, so start from one fresh store instead of one per test
+            before_each()
+            before_each = None
+            # Compacting tombstones on purpose would expire other workers' versions
+            tombstone_limit = None
+    elif args.parallel <= 1:
+        # First clean up any existing data; parallel runs rely on namespacing instead
+        cleanup()
     
-    # First clean up any existing data
-    cleanup()
-    
-    print("\n== Running /tasks Endpoint Tests ==")
-    # Task Endpoint Tests
-    run_test("Tasks", "Create minimal task", TaskTests.test_create_minimal_task)
-    run_test("Tasks", "Create fully-populated task", TaskTests.test_create_full_task)
-    run_test("Tasks", "Create task validation", TaskTests.test_create_task_validation)
-    run_test("Tasks", "Get task by ID", TaskTests.test_get_task_by_id)
-    run_test("Tasks", "Update task", TaskTests.test_update_task)
-    run_test("Tasks", "Delete task", TaskTests.test_delete_task)
-    run_test("Tasks", "List tasks (no filters)", TaskTests.test_list_tasks_no_filters)
-    run_test("Tasks", "Filter tasks by completion", TaskTests.test_filter_tasks_by_completion)
-    run_test("Tasks", "Filter tasks by list", TaskTests.test_filter_tasks_by_list)
-    run_test("Tasks", "Filter tasks by tags", TaskTests.test_filter_tasks_by_tags)
-    run_test("Tasks", "Combined filters", TaskTests.test_combined_filters)
-    run_test("Tasks", "Recurrence fields", TaskTests.test_recurrence_fields)
-    run_test("Tasks", "Update recurrence fields", TaskTests.test_update_recurrence_fields)
-    
-    print("\n== Running /lists Endpoint Tests ==")
-    # List Endpoint Tests
-    run_test("Lists", "Get default lists", ListTests.test_get_default_lists)
-    run_test("Lists", "Create list", ListTests.test_create_list)
-    run_test("Lists", "Create list validation", ListTests.test_create_list_validation)
-    run_test("Lists", "Delete list", ListTests.test_delete_list)
-    run_test("Lists", "Delete list restrictions", ListTests.test_delete_list_restrictions)
-    
-    print("\n== Running General API Tests ==")
-    # General API Tests
-    # run_test("General", "CORS headers", GeneralTests.test_cors_headers)
-    run_test("General", "API interface consistency", GeneralTests.test_api_interface_consistency)
+    if args.parallel > 1:
+        print(f"\n== Running all tests on {args.parallel} workers ==")
+        run_parallel(args.parallel)
+    else:
+        for group, tests in TEST_PLAN.items():
+            print(f"\n== Running {GROUP_TITLES[group]} ==")
+            for name, func in tests:
+                run_test(group, name, func)
     
     # Print summary
     summary()
\ No newline at end of file